@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class InterpreterAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'interpreter_app'
+
+    def ready(self):
+        # Keep the process-local caches in sync with KPI edits
+        from interpreter_app import signals  # noqa: F401
@@ -0,0 +1,234 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+from interpreter_app.interpreter_engine import (
+    BytecodeProgram, DIV, MINUS, MUL, OP_CONST, OP_FAIL, OP_LOAD, OP_MATCH, OP_REGEX, PLUS, POWER,
+    _BINARY_OPERATORS, _coerce_operand, regex_cache, regex_match,
+)
+
+###############################################################################
+# VECTORIZED BATCH EVALUATION                                                 #
+###############################################################################
+
+_ARRAY_OPERATORS = {
+    PLUS: np.add,
+    MINUS: np.subtract,
+    MUL: np.multiply,
+    DIV: np.divide,
+    POWER: np.power,
+}
+
+
+class _Unvectorizable(Exception):
+    """Raised when a program step has no exact NumPy equivalent for the current rows."""
+
+
+class BatchEvaluationError(Exception):
+    def __init__(self, message, position):
+        super().__init__(message)
+        self.position = position
+
+
+def coerce_values(values):
+    """Applies the Ingester's ``float(value)`` coercion to a whole column.
+
+    Returns a float64 array when every value converts, otherwise an object
+    array holding floats for convertible values and the original strings.
+    """
+    array = np.asarray(values, dtype=object) if not isinstance(values, np.ndarray) else values
+    if array.dtype.kind in 'biuf':
+        return array.astype(np.float64, copy=False)
+    try:
+        return array.astype(np.float64)
+    except (TypeError, ValueError):
+        pass
+    coerced = np.empty(len(array), dtype=object)
+    for i, value in enumerate(array):
+        try:
+            coerced[i] = float(value)
+        except (TypeError, ValueError):
+            coerced[i] = value
+    return coerced
+
+
+def _is_numeric(operand):
+    if isinstance(operand, np.ndarray):
+        return operand.dtype.kind in 'biuf'
+    return isinstance(operand, (int, float))
+
+
+class VectorizedProgram:
+    """Runs a ``BytecodeProgram`` with NumPy arrays on the stack instead of scalars."""
+
+    def __init__(self, program, variable='ATTR'):
+        self.program = program
+        self.variable = variable
+
+    def run(self, column):
+        """Evaluates every row of ``column``; returns ``(output, error_mask, error_message, scalar_mask)``.
+
+        ``scalar_mask`` marks rows whose NumPy result differs from Python's
+        (a power that overflows, divides by zero or goes complex), which the
+        caller must evaluate again with the scalar VM.
+        """
+        size = len(column)
+        error_mask = np.zeros(size, dtype=bool)
+        scalar_mask = np.zeros(size, dtype=bool)
+        error_message = None
+        stack = []
+        for opcode, arg in self.program.instructions:
+            if opcode == OP_LOAD:
+                if arg != self.variable:
+                    raise _Unvectorizable(arg)
+                stack.append(column)
+            elif opcode == OP_CONST:
+                stack.append(arg)
+            elif opcode == OP_FAIL:
+                raise _Unvectorizable(arg)
+            elif opcode == OP_MATCH:
+                stack.append(self._regex(stack.pop(), arg))
+            elif opcode == OP_REGEX:
+                pattern = stack.pop()
+                value = stack.pop()
+                stack.append(self._regex(value, pattern))
+            else:
+                right = stack.pop()
+                left = stack.pop()
+                if isinstance(left, str):
+                    left = _coerce_operand(left)
+                if isinstance(right, str):
+                    right = _coerce_operand(right)
+                if not (_is_numeric(left) and _is_numeric(right)):
+                    raise _Unvectorizable(opcode)
+                if not isinstance(left, np.ndarray) and not isinstance(right, np.ndarray):
+                    # Constant subexpression: keep Python's scalar semantics (e.g. 2 ** -1)
+                    if opcode == DIV and right == 0:
+                        raise _Unvectorizable(opcode)
+                    stack.append(left / right if opcode == DIV else _BINARY_OPERATORS[opcode](left, right))
+                    continue
+                if opcode == DIV:
+                    zero = np.asarray(right) == 0
+                    if zero.any():
+                        error_mask |= np.broadcast_to(zero, error_mask.shape)
+                        error_message = "Division by zero"
+                        right = np.where(zero, 1, right)
+                with np.errstate(over='ignore', invalid='ignore', divide='ignore'):
+                    result = _ARRAY_OPERATORS[opcode](left, right)
+                if opcode == POWER:
+                    # Python raises OverflowError or ZeroDivisionError, or returns a complex, where NumPy gives inf/nan
+                    diverged = np.isfinite(left) & np.isfinite(right) & ~np.isfinite(result)
+                    scalar_mask |= np.broadcast_to(diverged, scalar_mask.shape)
+                stack.append(result)
+        result = stack[-1]
+        if not isinstance(result, np.ndarray):
+            result = np.full(size, result, dtype=object if isinstance(result, str) else None)
+        return result, error_mask, error_message, scalar_mask
+
+    @staticmethod
+    def _regex(value, pattern):
+        try:
+            # Guarded and compiled once; rejected or invalid patterns report per row
+            pattern = pattern if isinstance(pattern, re.Pattern) else regex_cache.get(pattern)
+        except Exception:
+            raise _Unvectorizable(OP_REGEX) from None
+        if isinstance(value, str):
+            return regex_match(pattern, value)
+        if not isinstance(value, np.ndarray) or value.dtype != object:
+            raise _Unvectorizable(OP_REGEX)
+        matches = pd.Series(value).str.contains(pattern, regex=True, na=None)
+        if matches.isna().any():
+            # Non-string rows raise inside re.search; leave those to the scalar path
+            raise _Unvectorizable(OP_REGEX)
+        return matches.to_numpy(dtype=bool)
+
+
+def _evaluate_rows(program, column, variable):
+    """Scalar fallback with the exact per-row semantics of ``BytecodeProgram``."""
+    output = np.empty(len(column), dtype=object)
+    errors = np.full(len(column), None, dtype=object)
+    # tolist() hands the VM Python floats; np.float64 would keep NumPy's overflow and power semantics
+    for i, value in enumerate(column.tolist()):
+        try:
+            output[i] = program({variable: value})
+        except Exception as e:
+            errors[i] = str(e)
+    if all(isinstance(value, float) for value in output):
+        output = output.astype(np.float64)
+    return output, errors
+
+
+def _merge_scalar_rows(result, row_errors, program, part, rows, scalar_rows, variable):
+    """Replaces ``scalar_rows`` of a vectorized ``result`` with the scalar VM's values and errors."""
+    values, errors = _evaluate_rows(program, part[scalar_rows], variable)
+    row_errors[rows[scalar_rows]] = errors
+    succeeded = pd.isna(errors)
+    values = values[succeeded]
+    if not all(isinstance(value, float) for value in values):
+        result = result.astype(object)
+    result[scalar_rows[succeeded]] = values
+    return result
+
+
+def evaluate_batch(program, values, variable='ATTR', errors='raise'):
+    """Evaluates a compiled KPI over a NumPy array or pandas Series of ATTR values.
+
+    Numeric columns run each instruction once over the whole array; string
+    columns vectorize ``Regex`` through pandas' string methods. Rows the
+    vectorized path cannot reproduce exactly fall back to the scalar VM.
+
+    ``errors='raise'`` raises ``BatchEvaluationError`` for the first failing
+    row, with the same message the Interpreter would give; ``errors='coerce'``
+    returns NaN (or None for non-numeric output) for failing rows instead.
+    """
+    if errors not in ('raise', 'coerce'):
+        raise ValueError("errors must be 'raise' or 'coerce'")
+    if not isinstance(program, BytecodeProgram):
+        raise TypeError('evaluate_batch expects a BytecodeProgram')
+
+    index = values.index if isinstance(values, pd.Series) else None
+    column = coerce_values(values.to_numpy() if index is not None else values)
+    vectorized = VectorizedProgram(program, variable)
+
+    if column.dtype == object:
+        # Mixed columns: vectorize the numeric rows and the string rows separately
+        is_number = np.fromiter((isinstance(value, float) for value in column), dtype=bool, count=len(column))
+        parts = [np.flatnonzero(is_number), np.flatnonzero(~is_number)]
+    else:
+        parts = [np.arange(len(column))]
+
+    output = None
+    row_errors = np.full(len(column), None, dtype=object)
+    for rows in parts:
+        if not len(rows):
+            continue
+        part = column[rows]
+        if part.dtype == object and all(isinstance(value, float) for value in part):
+            part = part.astype(np.float64)
+        try:
+            result, error_mask, error_message, scalar_mask = vectorized.run(part)
+            row_errors[rows[error_mask]] = error_message
+            if scalar_mask.any():
+                result = _merge_scalar_rows(result, row_errors, program, part, rows, np.flatnonzero(scalar_mask), variable)
+        except _Unvectorizable:
+            result, row_errors[rows] = _evaluate_rows(program, part, variable)
+        if output is None:
+            output = np.empty(len(column), dtype=result.dtype)
+        elif output.dtype != result.dtype:
+            output = output.astype(object)
+        output[rows] = result
+    if output is None:
+        output = np.empty(0, dtype=np.float64)
+
+    failed = np.flatnonzero(pd.notna(row_errors))
+    if len(failed):
+        if errors == 'raise':
+            raise BatchEvaluationError(row_errors[failed[0]], int(failed[0]))
+        if output.dtype.kind == 'f':
+            output[failed] = np.nan
+        else:
+            output = output.astype(object)
+            output[failed] = None
+
+    return pd.Series(output, index=index) if index is not None else output
@@ -0,0 +1,94 @@
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+
+from interpreter_app.interpreter_engine import (
+    BytecodeProgram, SimpleInterpreterFactory, expression_hash, get_interpreter_factory,
+)
+
+
+###############################################################################
+# COMPILED EXPRESSION CACHE                                                   #
+###############################################################################
+
+class CompiledExpressionCache:
+    """Process-local LRU of compiled KPI expressions.
+
+    Entries are keyed by ``(kpi_id, sha1(expression))`` so an edited expression
+    never hits a stale program, and each program is a ``program(context)``
+    callable built from a context-free tree, so one entry serves every
+    incoming message for that KPI.
+    """
+
+    def __init__(self, maxsize=1024, interpreter_factory=None):
+        self.maxsize = maxsize
+        self.interpreter_factory = interpreter_factory or SimpleInterpreterFactory()
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(kpi_id, expression):
+        return kpi_id, expression_hash(expression)
+
+    def compile(self, expression, bytecode=None):
+        # Stored bytecode skips the lexer and parser, but only if it was built from this exact expression
+        if bytecode:
+            try:
+                program = BytecodeProgram.loads(bytecode)
+            except Exception:
+                program = None
+            if program is not None and program.source_hash == expression_hash(expression):
+                return self.interpreter_factory.load_bytecode(program)
+        return self.interpreter_factory.compile(expression)
+
+    def get(self, kpi_id, expression, bytecode=None):
+        key = self.make_key(kpi_id, expression)
+        with self._lock:
+            program = self._entries.get(key)
+            if program is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return program
+            self.misses += 1
+
+        # Compile outside the lock; a failing expression is never cached
+        program = self.compile(expression, bytecode)
+
+        with self._lock:
+            self._entries[key] = program
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return program
+
+    def invalidate(self, kpi_id):
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == kpi_id]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        return {"size": len(self._entries), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+
+expression_cache = CompiledExpressionCache(
+    maxsize=getattr(settings, 'KPI_EXPRESSION_CACHE_SIZE', 1024),
+    interpreter_factory=get_interpreter_factory(
+        getattr(settings, 'KPI_INTERPRETER_BACKEND', 'tree'),
+        lexer=getattr(settings, 'KPI_INTERPRETER_LEXER', 'char'),
+    ),
+)
@@ -1,5 +1,16 @@
 from abc import ABC, abstractmethod
+from collections import OrderedDict
+import hashlib
+import json
+import operator
 import re
+import threading
+
+try:
+    from re import _constants as sre_constants, _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_constants
+    import sre_parse
 
 ###############################################################################
 # TOKEN TYPES AND FACTORIES                                                   #
@@ -11,6 +22,17 @@ INTEGER, PLUS, MINUS, MUL, DIV, LPAREN, RPAREN, EOF, REGEX, COMMA, STRING, ID, P
 )
 
 
+class ParseError(Exception):
+    """Raised by the lexers and parsers for text that is not a valid expression."""
+
+
+def _parse_number(text):
+    try:
+        return float(text) if '.' in text else int(text)
+    except ValueError:
+        raise ParseError(f'Invalid number: {text}') from None
+
+
 class Token:
     def __init__(self, type_, value):
         self.type = type_
@@ -33,6 +55,26 @@ class SimpleTokenFactory(TokenFactory):
         return Token(type_, value)
 
 
+class SlotToken:
+    """A Token without a per-instance ``__dict__``."""
+
+    __slots__ = ('type', 'value')
+
+    def __init__(self, type_, value):
+        self.type = type_
+        self.value = value
+
+    def __str__(self):
+        return f'Token({self.type}, {repr(self.value)})'
+
+    __repr__ = __str__
+
+
+class SlotTokenFactory(TokenFactory):
+    def create_token(self, type_, value):
+        return SlotToken(type_, value)
+
+
 ###############################################################################
 # LEXER                                                                       #
 ###############################################################################
@@ -45,7 +87,7 @@ class Lexer:
         self.token_factory = token_factory
 
     def error(self):
-        raise Exception(f'Invalid character: {self.current_char}')
+        raise ParseError(f'Invalid character: {self.current_char}')
 
     def advance(self):
         self.pos += 1
@@ -60,7 +102,7 @@ class Lexer:
         while self.current_char is not None and (self.current_char.isdigit() or self.current_char == '.'):
             result += self.current_char
             self.advance()
-        return float(result) if '.' in result else int(result)
+        return _parse_number(result)
 
     def _id(self):
         result = ''
@@ -120,6 +162,277 @@ class Lexer:
         return self.token_factory.create_token(EOF, None)
 
 
+class RegexLexer:
+    """Drop-in Lexer that scans with one compiled master pattern.
+
+    Tokens are produced lazily from a generator, so errors surface at the
+    same point of parsing and with the same messages as ``Lexer``.
+    """
+
+    MASTER_PATTERN = re.compile(r'''
+        \s*(?:
+            (?P<NUMBER>\d[\d.]*)
+          | (?P<NAME>\w+)
+          | "(?P<STRING>[^"]*)"
+          | (?P<OP>\*\*|[-+*/(),])
+          | (?P<MISMATCH>\S)
+          | $
+        )
+    ''', re.VERBOSE)
+
+    OPERATORS = {'+': PLUS, '-': MINUS, '*': MUL, '**': POWER, '/': DIV, '(': LPAREN, ')': RPAREN, ',': COMMA}
+
+    def __init__(self, text, token_factory):
+        self.text = text
+        self.token_factory = token_factory
+        self.tokens = self.tokenize()
+
+    def error(self, char):
+        raise ParseError(f'Invalid character: {char}')
+
+    def tokenize(self):
+        create_token = self.token_factory.create_token
+        operators = self.OPERATORS
+        for m in self.MASTER_PATTERN.finditer(self.text):
+            kind = m.lastgroup
+            if kind is None:
+                break  # Trailing whitespace / end of text
+            value = m.group(kind)
+            if kind == 'OP':
+                yield create_token(operators[value], value)
+            elif kind == 'NAME':
+                if not (value[0].isalpha() or value[0] == '_'):
+                    self.error(value[0])  # e.g. '½': word character but not a letter
+                yield create_token(REGEX if value == 'Regex' else ID, value)
+            elif kind == 'NUMBER':
+                yield create_token(INTEGER, _parse_number(value))
+            elif kind == 'STRING':
+                yield create_token(STRING, value)
+            else:
+                # An unterminated string runs to the end of the text, like Lexer.string()
+                self.error(None if value == '"' else value)
+        while True:
+            yield create_token(EOF, None)
+
+    def get_next_token(self):
+        return next(self.tokens)
+
+
+###############################################################################
+# REGEX CACHE AND GUARD                                                       #
+###############################################################################
+
+_REPEAT_OPS = (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT)
+
+
+# Bounded repeats above this count are treated like unbounded ones: ``(a?){25}`` backtracks 2**25 ways
+MAX_BOUNDED_REPEAT = 10
+
+# First characters are tracked over Latin-1; other code points only matter through classes that already cover it
+_ALPHABET = frozenset(range(256))
+_CATEGORY_CHARS = {
+    items[0][1]: frozenset(c for c in _ALPHABET if re.match(escape, chr(c)))
+    for escape, (op, items) in sre_parse.CATEGORIES.items()
+    if op == sre_constants.IN and items[0][0] == sre_constants.CATEGORY
+}
+
+
+def _is_large_repeat(min_repeat, max_repeat):
+    return max_repeat == sre_constants.MAXREPEAT or max_repeat > MAX_BOUNDED_REPEAT
+
+
+def _charset_items(items):
+    """The character set of each item of an ``IN`` class, and whether the class is negated."""
+    negate = False
+    sets = []
+    for op, av in items:
+        if op == sre_constants.NEGATE:
+            negate = True
+        elif op == sre_constants.LITERAL:
+            sets.append(frozenset((av,)))
+        elif op == sre_constants.RANGE:
+            sets.append(frozenset(range(av[0], min(av[1], 255) + 1)))
+        elif op == sre_constants.CATEGORY:
+            sets.append(_CATEGORY_CHARS.get(av, _ALPHABET))
+        else:
+            sets.append(_ALPHABET)
+    return sets, negate
+
+
+def _first_chars(items):
+    """Returns ``(chars, nullable)``: the characters a match of ``items`` can start with, and
+    whether it can match the empty string. Over-approximates anything it cannot follow."""
+    chars = set()
+    for op, av in items:
+        if op == sre_constants.LITERAL:
+            first, nullable = {av}, False
+        elif op == sre_constants.NOT_LITERAL:
+            first, nullable = _ALPHABET - {av}, False
+        elif op == sre_constants.ANY:
+            first, nullable = _ALPHABET, False
+        elif op == sre_constants.IN:
+            sets, negate = _charset_items(av)
+            first = set().union(*sets)
+            first, nullable = (_ALPHABET - first if negate else first), False
+        elif op == sre_constants.SUBPATTERN:
+            first, nullable = _first_chars(av[-1])
+        elif op in _REPEAT_OPS:
+            first, nullable = _first_chars(av[2])
+            nullable = nullable or av[0] == 0
+        elif op == sre_constants.BRANCH:
+            firsts = [_first_chars(branch) for branch in av[1]]
+            first = set().union(*(branch_first for branch_first, _ in firsts))
+            nullable = any(branch_nullable for _, branch_nullable in firsts)
+        elif op in (sre_constants.AT, sre_constants.ASSERT, sre_constants.ASSERT_NOT):
+            first, nullable = set(), True
+        else:
+            first, nullable = _ALPHABET, True
+        chars |= first
+        if not nullable:
+            return chars, False
+    return chars, True
+
+
+def _casefold(chars):
+    # RegexCache compiles with re.IGNORECASE, so 'A' and 'a' start the same matches
+    return {ord(chr(c).lower()) for c in chars}
+
+
+def _is_ambiguous_in_repeat(items, following):
+    """True when ``items``, part of the body of a large repeat, can split one input between
+    iterations or between alternatives in more than one way. ``following`` holds the (casefolded)
+    characters that can come right after ``items``, the start of the next iteration included."""
+    for index, (op, av) in enumerate(items):
+        # What may come right after this item: the rest of the body, then whatever follows the body
+        rest_first, rest_nullable = _first_chars(items[index + 1:])
+        item_following = _casefold(rest_first) | following if rest_nullable else _casefold(rest_first)
+        if op in _REPEAT_OPS:
+            min_repeat, max_repeat, body = av
+            # A variable-length part that can end before a character it also matches:
+            # (aa?)+, (a+)+ and (a+b?)+ are ambiguous, (\d+\.)+ and ((ab)*c)+ are not
+            body_first = _casefold(_first_chars(body)[0])
+            if min_repeat != max_repeat and body_first & item_following:
+                return True
+            if _is_ambiguous_in_repeat(body, item_following | body_first if max_repeat > 1 else item_following):
+                return True
+        elif op == sre_constants.SUBPATTERN:
+            if _is_ambiguous_in_repeat(av[-1], item_following):
+                return True
+        elif op == sre_constants.BRANCH:
+            firsts = [_first_chars(branch) for branch in av[1]]
+            if sum(nullable for _, nullable in firsts) > 1:
+                return True
+            folded = [_casefold(first) for first, _ in firsts]
+            if any(folded[i] & folded[j] for i in range(len(folded)) for j in range(i + 1, len(folded))):
+                return True
+            if any(nullable for _, nullable in firsts) and set().union(*folded) & item_following:
+                return True
+            if any(_is_ambiguous_in_repeat(branch, item_following) for branch in av[1]):
+                return True
+        elif op == sre_constants.IN:
+            # re turns (\w|\d) into the class [\w\d]; overlapping members are that alternation
+            sets, _ = _charset_items(av)
+            if any(sets[i] & sets[j] for i in range(len(sets)) for j in range(i + 1, len(sets))):
+                return True
+    return False
+
+
+def _has_ambiguous_repeat(subpattern):
+    for op, av in subpattern:
+        if op in _REPEAT_OPS:
+            min_repeat, max_repeat, body = av
+            if _is_large_repeat(min_repeat, max_repeat):
+                first, nullable = _first_chars(body)
+                if nullable or _is_ambiguous_in_repeat(body, _casefold(first)):
+                    return True
+            if _has_ambiguous_repeat(body):
+                return True
+        elif op == sre_constants.SUBPATTERN:
+            if _has_ambiguous_repeat(av[-1]):
+                return True
+        elif op == sre_constants.BRANCH:
+            if any(_has_ambiguous_repeat(branch) for branch in av[1]):
+                return True
+        elif op in (sre_constants.ASSERT, sre_constants.ASSERT_NOT):
+            if _has_ambiguous_repeat(av[1]):
+                return True
+    return False
+
+
+def check_regex_pattern(pattern):
+    """Rejects patterns that can backtrack exponentially in Python's ``re`` on a near-miss input.
+
+    That is any unbounded or large (``MAX_BOUNDED_REPEAT``) repeat whose body
+    can match empty (``(a?){25}``) or can split the same input more than one
+    way: overlapping alternatives (``(a|aa)+``, ``(\\w|\\d)+``), or a
+    variable-length part that could end before a character it also matches
+    (``(a+)+``, ``(.*a){25}``). Nested quantifiers whose inner repeat is cut
+    off by what follows it, like ``(\\d+\\.)+\\d+``, backtrack linearly and are
+    accepted. Such a pattern would stall the worker evaluating it.
+    """
+    if not isinstance(pattern, str):
+        return
+    subpattern = sre_parse.parse(pattern)
+    if _has_ambiguous_repeat(subpattern):
+        raise Exception(f"Regex pattern rejected, ambiguous repetition can backtrack catastrophically: {pattern}")
+
+
+class RegexCache:
+    """Bounded LRU of compiled, guard-checked Regex() patterns.
+
+    Python's own ``re`` cache is small and shared, so a few hundred distinct
+    KPI patterns would keep evicting each other there.
+    """
+
+    def __init__(self, maxsize=512):
+        self.maxsize = maxsize
+        self._patterns = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, pattern):
+        with self._lock:
+            compiled = self._patterns.get(pattern)
+            if compiled is not None:
+                self._patterns.move_to_end(pattern)
+                return compiled
+
+        check_regex_pattern(pattern)
+        compiled = re.compile(pattern, re.IGNORECASE)
+
+        with self._lock:
+            self._patterns[pattern] = compiled
+            while len(self._patterns) > self.maxsize:
+                self._patterns.popitem(last=False)
+        return compiled
+
+    def try_compile(self, pattern):
+        """Like ``get`` but returns None instead of raising, leaving the error to evaluation time."""
+        try:
+            return self.get(pattern)
+        except Exception:
+            return None
+
+    def clear(self):
+        with self._lock:
+            self._patterns.clear()
+
+    def __len__(self):
+        return len(self._patterns)
+
+    def __contains__(self, pattern):
+        return pattern in self._patterns
+
+
+regex_cache = RegexCache()
+
+
+def regex_match(pattern, value):
+    """Regex() semantics: case-insensitive ``search`` of ``value`` for ``pattern``."""
+    if not isinstance(pattern, re.Pattern):
+        pattern = regex_cache.get(pattern)
+    return bool(pattern.search(value))
+
+
 ###############################################################################
 # AST NODES AND FACTORIES                                                     #
 ###############################################################################
@@ -145,10 +458,17 @@ class String(AST):
         self.value = token.value
 
 
+class Var(AST):
+    def __init__(self, token):
+        self.name = token.value
+
+
 class FuncCall(AST):
-    def __init__(self, func_name, args):
+    def __init__(self, func_name, args, pattern=None):
         self.func_name = func_name
         self.args = args
+        # Precompiled Regex() pattern when the pattern argument is a literal
+        self.pattern = pattern
 
 
 class SimpleASTNodeFactory:
@@ -161,8 +481,14 @@ class SimpleASTNodeFactory:
     def create_string(self, token):
         return String(token)
 
+    def create_var(self, token):
+        return Var(token)
+
     def create_func_call(self, func_name, args):
-        return FuncCall(func_name, args)
+        pattern = None
+        if func_name == 'Regex' and len(args) == 2 and isinstance(args[1], String):
+            pattern = regex_cache.try_compile(args[1].value)
+        return FuncCall(func_name, args, pattern)
 
 
 ###############################################################################
@@ -170,14 +496,15 @@ class SimpleASTNodeFactory:
 ###############################################################################
 
 class Parser:
-    def __init__(self, lexer, ast_node_factory, context):
+    """Builds a context-free AST; identifiers become Var nodes bound at evaluation time."""
+
+    def __init__(self, lexer, ast_node_factory):
         self.lexer = lexer
         self.current_token = self.lexer.get_next_token()
         self.ast_node_factory = ast_node_factory
-        self.context = context
 
     def error(self):
-        raise Exception('Invalid syntax')
+        raise ParseError('Invalid syntax')
 
     def eat(self, token_type):
         if self.current_token.type == token_type:
@@ -194,14 +521,8 @@ class Parser:
             self.eat(STRING)
             return self.ast_node_factory.create_string(token)
         elif token.type == ID:
-            var_name = token.value
-            if var_name in self.context:
-                value = self.context[var_name]
-                token = Token(INTEGER, value)  # Convert variable to number token
-                self.eat(ID)
-                return self.ast_node_factory.create_num(token)
-            else:
-                raise Exception(f"Variable '{var_name}' not found in context")
+            self.eat(ID)
+            return self.ast_node_factory.create_var(token)
         elif token.type == REGEX:
             return self.function_call()
         elif token.type == LPAREN:
@@ -210,7 +531,7 @@ class Parser:
             self.eat(RPAREN)
             return node
         else:
-            raise Exception(f"Unexpected token type: {token.type}")
+            raise ParseError(f"Unexpected token type: {token.type}")
 
     def power(self):
         """power : factor ('**' factor)*"""
@@ -279,15 +600,100 @@ class Parser:
         return self.expr()
 
 
+class ShuntingYardParser(Parser):
+    """Iterative drop-in for ``Parser`` built on the shunting-yard algorithm.
+
+    Produces the same left-associative trees and errors as the recursive
+    descent parser, but keeps operators, open parentheses and open Regex()
+    calls on explicit stacks, so nesting depth is bounded by memory rather
+    than by Python's recursion limit.
+    """
+
+    PRECEDENCE = {PLUS: 1, MINUS: 1, MUL: 2, DIV: 2, POWER: 3}
+    _PAREN, _CALL = 'paren', 'call'
+
+    def parse(self):
+        operands = []
+        # Entries: (PRECEDENCE, token) for operators, (_PAREN,) or (_CALL, func_name, arg_count)
+        operators = []
+        expect_operand = True
+
+        while True:
+            token = self.current_token
+            if expect_operand:
+                if token.type == INTEGER:
+                    self.eat(INTEGER)
+                    operands.append(self.ast_node_factory.create_num(token))
+                    expect_operand = False
+                elif token.type == STRING:
+                    self.eat(STRING)
+                    operands.append(self.ast_node_factory.create_string(token))
+                    expect_operand = False
+                elif token.type == ID:
+                    self.eat(ID)
+                    operands.append(self.ast_node_factory.create_var(token))
+                    expect_operand = False
+                elif token.type == REGEX:
+                    self.eat(REGEX)
+                    self.eat(LPAREN)
+                    operators.append((self._CALL, token.value, 1))
+                elif token.type == LPAREN:
+                    self.eat(LPAREN)
+                    operators.append((self._PAREN,))
+                else:
+                    raise ParseError(f"Unexpected token type: {token.type}")
+                continue
+
+            if token.type in self.PRECEDENCE:
+                precedence = self.PRECEDENCE[token.type]
+                self.reduce(operands, operators, precedence)
+                self.eat(token.type)
+                operators.append((precedence, token))
+                expect_operand = True
+                continue
+
+            self.reduce(operands, operators, 0)
+            if not operators:
+                # Like Parser.parse, stop at the first token that cannot extend the expression
+                return operands.pop()
+            marker = operators[-1]
+            if token.type == COMMA and marker[0] == self._CALL:
+                self.eat(COMMA)
+                operators[-1] = (self._CALL, marker[1], marker[2] + 1)
+                expect_operand = True
+            elif token.type == RPAREN:
+                self.eat(RPAREN)
+                operators.pop()
+                if marker[0] == self._CALL:
+                    args = operands[len(operands) - marker[2]:]
+                    del operands[len(operands) - marker[2]:]
+                    operands.append(self.ast_node_factory.create_func_call(marker[1], args))
+            else:
+                self.error()
+
+    def reduce(self, operands, operators, min_precedence):
+        """Pops operators binding at least as tightly as ``min_precedence`` (all are left-associative)."""
+        while operators and isinstance(operators[-1][0], int) and operators[-1][0] >= min_precedence:
+            _, op = operators.pop()
+            right = operands.pop()
+            left = operands.pop()
+            operands.append(self.ast_node_factory.create_bin_op(left=left, op=op, right=right))
+
+
 ###############################################################################
 # INTERPRETER                                                                 #
 ###############################################################################
 
 class Interpreter:
-    def __init__(self, parser, context=None):
+    def __init__(self, parser=None, context=None):
         self.parser = parser
         self.context = context or {}
 
+    def bind(self, context):
+        """Sets the variables that Var nodes resolve against."""
+        self.context = context or {}
+        return self
+
     def visit(self, node):
         method_name = 'visit_' + type(node).__name__
         visitor = getattr(self, method_name, self.generic_visit)
@@ -327,34 +733,802 @@ class Interpreter:
     def visit_String(self, node):
         return node.value
 
+    def visit_Var(self, node):
+        if node.name not in self.context:
+            raise Exception(f"Variable '{node.name}' not found in context")
+        return self.context[node.name]
+
+    def visit__FailNode(self, node):
+        raise Exception(node.message)
+
     def visit_FuncCall(self, node):
         if node.func_name == 'Regex':
             if len(node.args) != 2:
                 raise Exception("Regex function expects exactly 2 arguments.")
             value, pattern = self.visit(node.args[0]), self.visit(node.args[1])
-            match = re.search(pattern, value, re.IGNORECASE)
-            return bool(match)
+            return regex_match(node.pattern or pattern, value)
         raise Exception(f"Unknown function '{node.func_name}'")
 
+    def evaluate(self, tree, context=None):
+        """Evaluates an already parsed tree, optionally binding a new context first."""
+        if context is not None:
+            self.bind(context)
+        return self.visit(tree)
+
+    # Whether compile() emits coercion-free code for numeric_variables
+    specializes_numeric = False
+
+    def compile(self, tree, numeric_variables=()):
+        """Returns a callable ``program(context)`` that evaluates ``tree``."""
+        interpreter_class = type(self)
+
+        def program(context):
+            return interpreter_class(context=context).visit(tree)
+
+        return program
+
     def interpret(self):
         tree = self.parser.parse()
-        return self.visit(tree)
+        return self.evaluate(tree)
+
+
+###############################################################################
+# CLOSURE COMPILER                                                            #
+###############################################################################
+
+_BINARY_OPERATORS = {
+    PLUS: operator.add,
+    MINUS: operator.sub,
+    MUL: operator.mul,
+    POWER: operator.pow,
+}
+
+
+_INFINITY = float('inf')
+
+
+def _coerce_operand(value):
+    """Applies the Interpreter's numeric-string conversion to a BinOp operand."""
+    if isinstance(value, str) and value.replace(".", "", 1).isdigit():
+        return float(value) if "." in value else int(value)
+    return value
+
+
+def _raise_at_evaluation(message):
+    def fail(context):
+        raise Exception(message)
+
+    return fail
+
+
+class ClosureInterpreter(Interpreter):
+    """Compiles the AST once into nested closures with operators resolved up front.
+
+    Evaluation then costs one Python call per node instead of a ``visit_*``
+    lookup and an operator if/elif chain; results and error messages match
+    the tree-walking ``Interpreter``.
+    """
+
+    specializes_numeric = True
+
+    def compile(self, tree, numeric_variables=()):
+        """Compiles ``tree``; BinOps over subtrees that are provably numeric when
+        ``numeric_variables`` hold numbers skip the string-coercion checks."""
+        self.types = TypeInference(dict.fromkeys(numeric_variables, NUMBER)).infer(tree) if numeric_variables else {}
+        return self.compile_node(tree)
+
+    def evaluate(self, tree, context=None):
+        if context is not None:
+            self.bind(context)
+        return self.compile(tree)(self.context)
+
+    def is_numeric(self, node):
+        return self.types.get(id(node)) in (NUMBER, BOOLEAN)
+
+    def compile_node(self, node):
+        method_name = 'compile_' + type(node).__name__
+        compiler = getattr(self, method_name, self.generic_compile)
+        return compiler(node)
+
+    def generic_compile(self, node):
+        return _raise_at_evaluation(f'No visit_{type(node).__name__} method')
+
+    def compile_Num(self, node):
+        value = node.value
+        return lambda context: value
+
+    def compile_String(self, node):
+        value = node.value
+        return lambda context: value
+
+    def compile_Var(self, node):
+        name = node.name
+
+        def var(context):
+            try:
+                return context[name]
+            except KeyError:
+                raise Exception(f"Variable '{name}' not found in context") from None
+
+        return var
+
+    def compile_BinOp(self, node):
+        left = self.compile_node(node.left)
+        right = self.compile_node(node.right)
+        op_type = node.op.type
+
+        if op_type == DIV and self.is_numeric(node.left) and self.is_numeric(node.right):
+            def numeric_div(context):
+                left_value = left(context)
+                right_value = right(context)
+                if right_value == 0:
+                    raise Exception("Division by zero")
+                return left_value / right_value
+
+            return numeric_div
+
+        if op_type == DIV:
+            def div(context):
+                left_value = _coerce_operand(left(context))
+                right_value = _coerce_operand(right(context))
+                if right_value == 0:
+                    raise Exception("Division by zero")
+                return left_value / right_value
+
+            return div
+
+        op = _BINARY_OPERATORS.get(op_type)
+        if op is None:
+            return lambda context: None
+
+        if self.is_numeric(node.left) and self.is_numeric(node.right):
+            return self.compile_numeric_bin_op(node, op, left, right)
+
+        # Literal operands never need coercion, so bind them as constants
+        if isinstance(node.right, Num):
+            right_value = node.right.value
+
+            def bin_op_const_right(context):
+                left_value = left(context)
+                if left_value.__class__ is str:
+                    left_value = _coerce_operand(left_value)
+                return op(left_value, right_value)
+
+            return bin_op_const_right
+
+        if isinstance(node.left, Num):
+            left_value = node.left.value
+
+            def bin_op_const_left(context):
+                right_value = right(context)
+                if right_value.__class__ is str:
+                    right_value = _coerce_operand(right_value)
+                return op(left_value, right_value)
+
+            return bin_op_const_left
+
+        def bin_op(context):
+            left_value = left(context)
+            right_value = right(context)
+            if left_value.__class__ is str:
+                left_value = _coerce_operand(left_value)
+            if right_value.__class__ is str:
+                right_value = _coerce_operand(right_value)
+            return op(left_value, right_value)
+
+        return bin_op
+
+    @staticmethod
+    def compile_numeric_bin_op(node, op, left, right):
+        squares = isinstance(node.right, Num) and type(node.right.value) is int and node.right.value == 2
+        if op is operator.pow and squares:
+            def square(context):
+                value = left(context)
+                result = value * value
+                # float ** raises on overflow where the product silently becomes inf
+                if result == _INFINITY and value.__class__ is float and abs(value) != _INFINITY:
+                    raise OverflowError(34, 'Numerical result out of range')
+                return result
+
+            return square
+        if isinstance(node.right, Num):
+            right_value = node.right.value
+            return lambda context: op(left(context), right_value)
+        if isinstance(node.left, Num):
+            left_value = node.left.value
+            return lambda context: op(left_value, right(context))
+        return lambda context: op(left(context), right(context))
+
+    def compile__FailNode(self, node):
+        return _raise_at_evaluation(node.message)
+
+    def compile_FuncCall(self, node):
+        if node.func_name == 'Regex':
+            if len(node.args) != 2:
+                return _raise_at_evaluation("Regex function expects exactly 2 arguments.")
+            value, pattern = self.compile_node(node.args[0]), self.compile_node(node.args[1])
+
+            if node.pattern is not None:
+                search = node.pattern.search
+
+                def regex_literal(context):
+                    return bool(search(value(context)))
+
+                return regex_literal
+
+            def regex(context):
+                value_result = value(context)
+                return regex_match(pattern(context), value_result)
+
+            return regex
+        return _raise_at_evaluation(f"Unknown function '{node.func_name}'")
+
+
+###############################################################################
+# BYTECODE (STACK VM)                                                         #
+###############################################################################
+
+# Opcodes; binary operators reuse their token type as the opcode.
+# OP_MATCH is Regex() with a literal pattern carried in the instruction.
+OP_CONST, OP_LOAD, OP_REGEX, OP_MATCH, OP_FAIL = 'CONST', 'LOAD', 'CALL_REGEX', 'MATCH', 'FAIL'
+BYTECODE_VERSION = 1
+
+_OPERATOR_SYMBOLS = {PLUS: '+', MINUS: '-', MUL: '*', DIV: '/', POWER: '**'}
+
+
+def expression_hash(text):
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def unescape_expression(text):
+    """Undoes the quote/backslash escaping KPI expressions are stored with."""
+    return text.replace("\\\"", "\"").replace("\\\\", "\\")
+
+
+class BytecodeProgram:
+    """A postfix instruction sequence evaluated by a small stack machine.
+
+    ``instructions`` is a tuple of ``(opcode, arg)`` pairs, which is far
+    smaller than the object-per-node AST and can be stored as JSON.
+    """
+
+    __slots__ = ('instructions', 'source_hash')
+
+    def __init__(self, instructions, source_hash=None):
+        # Literal patterns are compiled once here; invalid ones stay strings and fail when run
+        self.instructions = tuple(
+            (opcode, regex_cache.try_compile(arg) or arg) if opcode == OP_MATCH and isinstance(arg, str)
+            else (opcode, arg)
+            for opcode, arg in instructions
+        )
+        self.source_hash = source_hash
+
+    def __call__(self, context):
+        stack = []
+        push, pop = stack.append, stack.pop
+        for opcode, arg in self.instructions:
+            if opcode == OP_LOAD:
+                try:
+                    push(context[arg])
+                except KeyError:
+                    raise Exception(f"Variable '{arg}' not found in context") from None
+            elif opcode == OP_CONST:
+                push(arg)
+            elif opcode == OP_MATCH:
+                push(regex_match(arg, pop()))
+            elif opcode == OP_REGEX:
+                pattern = pop()
+                value = pop()
+                push(regex_match(pattern, value))
+            elif opcode == OP_FAIL:
+                raise Exception(arg)
+            else:
+                right = pop()
+                left = pop()
+                if left.__class__ is str:
+                    left = _coerce_operand(left)
+                if right.__class__ is str:
+                    right = _coerce_operand(right)
+                if opcode == DIV:
+                    if right == 0:
+                        raise Exception("Division by zero")
+                    push(left / right)
+                else:
+                    push(_BINARY_OPERATORS[opcode](left, right))
+        return stack[-1]
+
+    def dumps(self):
+        return json.dumps({
+            'version': BYTECODE_VERSION,
+            'source': self.source_hash,
+            'code': [[opcode, arg.pattern if isinstance(arg, re.Pattern) else arg]
+                     for opcode, arg in self.instructions],
+        }, separators=(',', ':'))
+
+    @classmethod
+    def loads(cls, data):
+        payload = json.loads(data)
+        if payload.get('version') != BYTECODE_VERSION:
+            raise Exception(f"Unsupported bytecode version: {payload.get('version')}")
+        return cls((tuple(instruction) for instruction in payload['code']), payload.get('source'))
+
+    def to_tree(self, ast_node_factory=None):
+        """Rebuilds an equivalent AST so any backend can compile it without re-parsing."""
+        ast_node_factory = ast_node_factory or SimpleASTNodeFactory()
+        stack = []
+        for opcode, arg in self.instructions:
+            if opcode == OP_CONST:
+                if isinstance(arg, str):
+                    stack.append(ast_node_factory.create_string(Token(STRING, arg)))
+                else:
+                    stack.append(ast_node_factory.create_num(Token(INTEGER, arg)))
+            elif opcode == OP_LOAD:
+                stack.append(ast_node_factory.create_var(Token(ID, arg)))
+            elif opcode == OP_REGEX:
+                pattern = stack.pop()
+                value = stack.pop()
+                stack.append(ast_node_factory.create_func_call('Regex', [value, pattern]))
+            elif opcode == OP_MATCH:
+                pattern = arg.pattern if isinstance(arg, re.Pattern) else arg
+                pattern = ast_node_factory.create_string(Token(STRING, pattern))
+                stack.append(ast_node_factory.create_func_call('Regex', [stack.pop(), pattern]))
+            elif opcode == OP_FAIL:
+                stack.append(_FailNode(arg))
+            else:
+                right = stack.pop()
+                left = stack.pop()
+                op = Token(opcode, _OPERATOR_SYMBOLS[opcode])
+                stack.append(ast_node_factory.create_bin_op(left=left, op=op, right=right))
+        return stack[-1]
+
+
+class _FailNode(AST):
+    """Stands in for a call that compiled to OP_FAIL when a tree is rebuilt from bytecode."""
+
+    def __init__(self, message):
+        self.message = message
+
+
+class BytecodeCompiler:
+    """Emits postfix bytecode from an AST using an explicit stack (no recursion)."""
+
+    def compile(self, tree, source_hash=None):
+        instructions = []
+        stack = [(tree, False)]
+        while stack:
+            node, children_done = stack.pop()
+            if isinstance(node, BinOp):
+                if children_done:
+                    instructions.append((node.op.type, None))
+                else:
+                    stack.append((node, True))
+                    stack.append((node.right, False))
+                    stack.append((node.left, False))
+            elif isinstance(node, FuncCall):
+                if node.func_name != 'Regex':
+                    instructions.append((OP_FAIL, f"Unknown function '{node.func_name}'"))
+                elif len(node.args) != 2:
+                    instructions.append((OP_FAIL, "Regex function expects exactly 2 arguments."))
+                elif children_done:
+                    if isinstance(node.args[1], String):
+                        instructions.append((OP_MATCH, node.args[1].value))
+                    else:
+                        instructions.append((OP_REGEX, None))
+                else:
+                    stack.append((node, True))
+                    if not isinstance(node.args[1], String):
+                        stack.append((node.args[1], False))
+                    stack.append((node.args[0], False))
+            elif isinstance(node, (Num, String)):
+                instructions.append((OP_CONST, node.value))
+            elif isinstance(node, Var):
+                instructions.append((OP_LOAD, node.name))
+            elif isinstance(node, _FailNode):
+                instructions.append((OP_FAIL, node.message))
+            else:
+                instructions.append((OP_FAIL, f'No visit_{type(node).__name__} method'))
+        return BytecodeProgram(instructions, source_hash)
+
+
+class BytecodeInterpreter(Interpreter):
+    def compile(self, tree, numeric_variables=()):
+        return BytecodeCompiler().compile(tree)
+
+    def evaluate(self, tree, context=None):
+        if context is not None:
+            self.bind(context)
+        return self.compile(tree)(self.context)
+
+
+###############################################################################
+# OPTIMIZER                                                                   #
+###############################################################################
+
+def _child_nodes(node):
+    if isinstance(node, BinOp):
+        return node.left, node.right
+    if isinstance(node, FuncCall):
+        return tuple(node.args)
+    return ()
+
+
+def count_nodes(tree):
+    count = 0
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        count += 1
+        stack.extend(_child_nodes(node))
+    return count
+
+
+def tree_depth(tree):
+    depth = 0
+    stack = [(tree, 1)]
+    while stack:
+        node, level = stack.pop()
+        depth = max(depth, level)
+        stack.extend((child, level + 1) for child in _child_nodes(node))
+    return depth
+
+
+class OptimizationReport:
+    def __init__(self):
+        self.nodes_before = 0
+        self.nodes_after = 0
+        self.folded = 0
+        self.reduced = 0
+
+    @property
+    def optimized_node_count(self):
+        """Number of nodes removed from the tree by the optimizer."""
+        return self.nodes_before - self.nodes_after
+
+    def __str__(self):
+        return (f'OptimizationReport(nodes {self.nodes_before} -> {self.nodes_after}, '
+                f'folded={self.folded}, reduced={self.reduced})')
+
+    __repr__ = __str__
+
+
+class Optimizer:
+    """Folds constant subtrees and applies algebraic simplifications to an AST.
+
+    Anything that would raise (division by zero, type errors, bad regex
+    patterns) is left in the tree so the error still happens at evaluation
+    time. Identities such as ``x * 1`` only apply when ``x`` is provably
+    numeric, because the Interpreter's string coercion would otherwise
+    change the result; ``numeric_variables`` names the variables the caller
+    guarantees to be numbers.
+    """
+
+    def __init__(self, ast_node_factory=None, numeric_variables=()):
+        self.ast_node_factory = ast_node_factory or SimpleASTNodeFactory()
+        self.numeric_variables = frozenset(numeric_variables)
+        self.report = OptimizationReport()
+
+    def optimize(self, tree):
+        self.report = OptimizationReport()
+        self.report.nodes_before = count_nodes(tree)
+        tree = self.visit(tree)
+        self.report.nodes_after = count_nodes(tree)
+        return tree
+
+    def visit(self, tree):
+        """Rebuilds the tree bottom-up with an explicit stack, so deep trees do not recurse."""
+        results = []
+        stack = [(tree, False)]
+        while stack:
+            node, children_done = stack.pop()
+            children = _child_nodes(node)
+            if children and not children_done:
+                stack.append((node, True))
+                stack.extend((child, False) for child in reversed(children))
+                continue
+            optimized_children = results[len(results) - len(children):]
+            del results[len(results) - len(children):]
+            method_name = 'optimize_' + type(node).__name__
+            optimizer = getattr(self, method_name, self.generic_optimize)
+            results.append(optimizer(node, *optimized_children))
+        return results[0]
+
+    def generic_optimize(self, node, *children):
+        return node
+
+    def literal(self, value):
+        if isinstance(value, str):
+            return self.ast_node_factory.create_string(Token(STRING, value))
+        return self.ast_node_factory.create_num(Token(INTEGER, value))
+
+    def is_numeric(self, node):
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, BinOp):
+                stack.extend((node.left, node.right))
+            elif isinstance(node, Num):
+                if type(node.value) not in (int, float):
+                    return False
+            elif not (isinstance(node, Var) and node.name in self.numeric_variables):
+                return False
+        return True
+
+    def optimize_BinOp(self, node, left, right):
+        op_type = node.op.type
+
+        if isinstance(left, (Num, String)) and isinstance(right, (Num, String)):
+            try:
+                value = self.fold(op_type, left.value, right.value)
+            except Exception:
+                value = None
+            if value is not None:
+                self.report.folded += 1
+                return self.literal(value)
+
+        reduced = self.strength_reduce(left, op_type, right)
+        if reduced is not None:
+            self.report.reduced += 1
+            return reduced
+        return self.ast_node_factory.create_bin_op(left=left, op=node.op, right=right)
+
+    @staticmethod
+    def fold(op_type, left, right):
+        left, right = _coerce_operand(left), _coerce_operand(right)
+        if op_type == DIV:
+            if right == 0:
+                return None
+            return left / right
+        op = _BINARY_OPERATORS.get(op_type)
+        value = op(left, right) if op is not None else None
+        # Complex results (negative base, fractional power) have no literal form
+        return value if isinstance(value, (int, float, str)) else None
+
+    def strength_reduce(self, left, op_type, right):
+        def is_int(node, value):
+            return isinstance(node, Num) and type(node.value) is int and node.value == value
+
+        if op_type == MUL:
+            if is_int(right, 1) and self.is_numeric(left):
+                return left
+            if is_int(left, 1) and self.is_numeric(right):
+                return right
+        elif op_type == PLUS:
+            if is_int(right, 0) and self.is_numeric(left):
+                return left
+            if is_int(left, 0) and self.is_numeric(right):
+                return right
+        elif op_type == MINUS:
+            if is_int(right, 0) and self.is_numeric(left):
+                return left
+        elif op_type == POWER:
+            if is_int(right, 1) and self.is_numeric(left):
+                return left
+            # x ** 2 is not rewritten to x * x here: a float x * x overflows to inf where ** raises
+            # OverflowError, and only backends that can check the product (ClosureInterpreter) may square
+        return None
+
+    def optimize_FuncCall(self, node, *args):
+        args = list(args)
+        if (node.func_name == 'Regex' and len(args) == 2
+                and all(isinstance(arg, String) for arg in args)):
+            try:
+                value = regex_match(args[1].value, args[0].value)
+            except Exception:
+                value = None
+            if value is not None:
+                self.report.folded += 1
+                return self.literal(value)
+        return self.ast_node_factory.create_func_call(node.func_name, args)
+
+
+###############################################################################
+# TYPE INFERENCE                                                              #
+###############################################################################
+
+NUMBER, TEXT, BOOLEAN, UNKNOWN = 'number', 'string', 'boolean', 'unknown'
+
+
+def collect_variables(tree):
+    names = set()
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, Var):
+            names.add(node.name)
+        stack.extend(_child_nodes(node))
+    return names
+
+
+class TypeInference:
+    """Classifies every subtree as NUMBER, TEXT, BOOLEAN or UNKNOWN.
+
+    ``variable_types`` maps variable names to the type the caller guarantees
+    at evaluation time. Arithmetic on numbers and booleans always yields a
+    number; anything involving strings may be coerced at runtime, so it is
+    UNKNOWN.
+    """
+
+    def __init__(self, variable_types=None):
+        self.variable_types = variable_types or {}
+
+    def infer(self, tree):
+        """Returns a dict mapping ``id(node)`` to its inferred type for every node of ``tree``."""
+        types = {}
+        stack = [(tree, False)]
+        while stack:
+            node, children_done = stack.pop()
+            children = _child_nodes(node)
+            if children and not children_done:
+                stack.append((node, True))
+                stack.extend((child, False) for child in children)
+                continue
+            types[id(node)] = self.node_type(node, [types[id(child)] for child in children])
+        return types
+
+    def node_type(self, node, child_types):
+        if isinstance(node, Num):
+            return BOOLEAN if isinstance(node.value, bool) else NUMBER
+        if isinstance(node, String):
+            return TEXT
+        if isinstance(node, Var):
+            return self.variable_types.get(node.name, UNKNOWN)
+        if isinstance(node, BinOp):
+            numeric = all(child_type in (NUMBER, BOOLEAN) for child_type in child_types)
+            return NUMBER if numeric and node.op.type in _OPERATOR_SYMBOLS else UNKNOWN
+        if isinstance(node, FuncCall) and node.func_name == 'Regex' and len(node.args) == 2:
+            return BOOLEAN
+        return UNKNOWN
+
+    def is_numeric(self, tree):
+        return self.infer(tree)[id(tree)] in (NUMBER, BOOLEAN)
+
+
+def _dispatch_on_numeric(generic_program, numeric_program, variables):
+    """Runs ``numeric_program`` when every variable arrived as an int or float."""
+    numeric_classes = (int, float)
+    if len(variables) == 1:
+        (name,) = variables
+
+        def program(context):
+            if context.get(name).__class__ in numeric_classes:
+                return numeric_program(context)
+            return generic_program(context)
+
+        return program
+
+    def program(context):
+        if all(context.get(name).__class__ in numeric_classes for name in variables):
+            return numeric_program(context)
+        return generic_program(context)
+
+    return program
 
 
 ###############################################################################
 # INTERPRETER FACTORY                                                         #
 ###############################################################################
 
+LEXERS = {
+    'char': (Lexer, SimpleTokenFactory),
+    'regex': (RegexLexer, SlotTokenFactory),
+}
+
+
+# Deeper trees are run as bytecode: the recursive parser and tree/closure compilers would exceed Python's stack
+MAX_RECURSIVE_DEPTH = 200
+
+
 class SimpleInterpreterFactory:
+    def __init__(self, optimize=True, lexer='char'):
+        # Applies Optimizer to trees passed through compile()/compile_bytecode()
+        self.optimize = optimize
+        try:
+            self.lexer_class, self.token_factory_class = LEXERS[lexer]
+        except KeyError:
+            raise Exception(f"Unknown lexer '{lexer}'") from None
+
     def create_lexer(self, text):
-        token_factory = SimpleTokenFactory()
-        return Lexer(text, token_factory)
+        token_factory = self.token_factory_class()
+        return self.lexer_class(text, token_factory)
 
-    def create_parser(self, lexer, context):
+    def create_parser(self, lexer, context=None):
+        # The context is no longer needed to parse; it is accepted for existing callers
         ast_node_factory = SimpleASTNodeFactory()
-        return Parser(lexer, ast_node_factory, context)
+        return Parser(lexer, ast_node_factory)
 
-    def create_interpreter(self, parser, context):
+    def create_interpreter(self, parser=None, context=None):
         return Interpreter(parser, context)
 
+    def parse(self, text):
+        """Lexes and parses an expression into a tree reusable across contexts."""
+        return self.create_parser(self.create_lexer(text)).parse()
+
+    def create_optimizer(self, numeric_variables=()):
+        return Optimizer(SimpleASTNodeFactory(), numeric_variables)
+
+    def parse_optimized(self, text):
+        tree = self.parse(text)
+        return self.create_optimizer().optimize(tree) if self.optimize else tree
+
+    def compile(self, text):
+        """Parses an expression and returns a reusable ``program(context)`` callable."""
+        try:
+            tree = self.parse(text)
+        except RecursionError:
+            # Too deep for the recursive descent parser; the shunting-yard parser builds the same tree
+            tree = ShuntingYardParser(self.create_lexer(text), SimpleASTNodeFactory()).parse()
+        return self.compile_tree(tree)
+
+    def compile_tree(self, tree):
+        """Compiles a parsed tree, adding a numeric-only variant when the backend supports one.
+
+        The variant is used when the expression is provably numeric given
+        numeric variables; the returned program picks it per call from the
+        types of the (already coerced) context values. Trees deeper than
+        ``MAX_RECURSIVE_DEPTH`` are compiled to bytecode instead, whatever the
+        backend, since the other interpreters recurse once per level.
+        """
+        optimized = self.create_optimizer().optimize(tree) if self.optimize else tree
+        if tree_depth(optimized) > MAX_RECURSIVE_DEPTH:
+            return BytecodeCompiler().compile(optimized)
+        interpreter = self.create_interpreter()
+        try:
+            program = interpreter.compile(optimized)
+            if not interpreter.specializes_numeric:
+                return program
+            variables = collect_variables(tree)
+            if not variables or not TypeInference(dict.fromkeys(variables, NUMBER)).is_numeric(tree):
+                return program
+            if self.optimize:
+                tree = self.create_optimizer(numeric_variables=variables).optimize(tree)
+            numeric_program = self.create_interpreter().compile(tree, numeric_variables=variables)
+        except RecursionError:
+            return BytecodeCompiler().compile(optimized)
+        return _dispatch_on_numeric(program, numeric_program, variables)
+
+    def compile_bytecode(self, text):
+        """Parses an expression into a persistable ``BytecodeProgram``."""
+        return BytecodeCompiler().compile(self.parse_optimized(text), source_hash=expression_hash(text))
+
+    def load_bytecode(self, bytecode):
+        """Builds a program from a ``BytecodeProgram`` without running the lexer or parser."""
+        return self.compile_tree(bytecode.to_tree())
+
+
+class ClosureInterpreterFactory(SimpleInterpreterFactory):
+    def create_interpreter(self, parser=None, context=None):
+        return ClosureInterpreter(parser, context)
+
+
+class BytecodeInterpreterFactory(SimpleInterpreterFactory):
+    def create_interpreter(self, parser=None, context=None):
+        return BytecodeInterpreter(parser, context)
+
+    def load_bytecode(self, bytecode):
+        return bytecode
+
+
+class IterativeInterpreterFactory(BytecodeInterpreterFactory):
+    """Parses, optimizes, compiles and evaluates without recursion, for generated deep expressions."""
+
+    def create_parser(self, lexer, context=None):
+        ast_node_factory = SimpleASTNodeFactory()
+        return ShuntingYardParser(lexer, ast_node_factory)
+
+
+INTERPRETER_FACTORIES = {
+    'tree': SimpleInterpreterFactory,
+    'closure': ClosureInterpreterFactory,
+    'bytecode': BytecodeInterpreterFactory,
+    'iterative': IterativeInterpreterFactory,
+}
+
+
+def get_interpreter_factory(backend, **options):
+    try:
+        factory_class = INTERPRETER_FACTORIES[backend]
+    except KeyError:
+        raise Exception(f"Unknown interpreter backend '{backend}'") from None
+    return factory_class(**options)
+
 
@@ -0,0 +1,187 @@
+import asyncio
+import io
+import json
+import time
+import timeit
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+from django.urls import reverse
+
+from interpreter_app.parallel import ParallelEvaluator
+from interpreter_app.routing import routing_table
+from kpi_app.models import Attribute
+from kpi_app.outputs import output_buffer
+
+
+class SlowBody(io.BytesIO):
+    """Request body that arrives after ``latency`` seconds, like a slow gateway connection."""
+
+    def __init__(self, body, latency):
+        super().__init__(body)
+        self.latency = latency
+
+    def read(self, *args):
+        if self.latency:
+            time.sleep(self.latency)
+            self.latency = 0
+        return super().read(*args)
+
+
+class Command(BaseCommand):
+    help = ("Load benchmarks for the Ingester endpoints, run in-process against the configured database; "
+            "computed outputs are not stored unless --record-outputs is given")
+
+    # Suite name -> default --size
+    suites = {'concurrency': 2000, 'parallel': 100000, 'overhead': 5000}
+
+    def add_arguments(self, parser):
+        parser.add_argument('suite', choices=list(self.suites), help="Benchmark suite to run")
+        parser.add_argument('--size', type=int, help="Number of requests (suite specific default)")
+        parser.add_argument('--threads', type=int, default=8, help="WSGI worker threads")
+        parser.add_argument('--latency', type=float, default=50, help="Per-request client latency in ms")
+        parser.add_argument('--workers', type=int, help="Worker processes for the parallel suite (default: one per CPU)")
+        parser.add_argument('--record-outputs', action='store_true',
+                            help="Write KPIOutput and rollup rows for every benchmark message, as in production")
+
+    def handle(self, *args, **options):
+        suite = options['suite']
+        size = options['size'] or self.suites[suite]
+        # Benchmark messages are fake; keep them out of the configured database's outputs and rollups
+        enabled, output_buffer.enabled = output_buffer.enabled, options['record_outputs']
+        try:
+            getattr(self, f"bench_{suite}")(size, options)
+        finally:
+            output_buffer.enabled = enabled
+
+    def report(self, label, seconds, request_count, statuses):
+        self.stdout.write(f"{label:<40} {seconds * 1000:10.1f} ms  {request_count / seconds:10.1f} req/s  "
+                          f"statuses {dict(sorted(statuses.items()))}")
+
+    def sample_messages(self, size):
+        attributes = list(Attribute.objects.select_related('asset', 'kpi').filter(kpi__isnull=False)[:50])
+        if not attributes:
+            raise CommandError("No Linker row with a KPI to send messages to")
+        return [
+            json.dumps({
+                "asset_id": attribute.asset.asset_id,
+                "attribute_id": attribute.attribute_id,
+                "timestamp": "2022-07-31T23:28:47Z[UTC]",
+                "value": "I have a dog" if "Regex" in attribute.kpi.expression else str(i % 100),
+            }).encode()
+            for i, attribute in zip(range(size), attributes * (size // len(attributes) + 1))
+        ]
+
+    def run_wsgi(self, application, path, bodies, threads, latency):
+        def call(body):
+            environ = {
+                'REQUEST_METHOD': 'POST', 'PATH_INFO': path, 'QUERY_STRING': '',
+                'CONTENT_TYPE': 'application/json', 'CONTENT_LENGTH': str(len(body)),
+                'SERVER_NAME': 'localhost', 'SERVER_PORT': '80', 'HTTP_HOST': 'localhost',
+                'wsgi.input': SlowBody(body, latency), 'wsgi.url_scheme': 'http',
+            }
+            status = []
+            b''.join(application(environ, lambda s, headers: status.append(s)))
+            return int(status[0].split()[0])
+
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            return list(pool.map(call, bodies))
+
+    async def run_asgi(self, application, path, bodies, latency):
+        async def call(body):
+            delivered = False
+
+            async def receive():
+                nonlocal delivered
+                if delivered:
+                    # Client stays connected until the response is sent
+                    await asyncio.Event().wait()
+                delivered = True
+                await asyncio.sleep(latency)
+                return {'type': 'http.request', 'body': body, 'more_body': False}
+
+            status = []
+
+            async def send(event):
+                if event['type'] == 'http.response.start':
+                    status.append(event['status'])
+
+            scope = {
+                'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'POST',
+                'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': b'', 'root_path': '',
+                'headers': [(b'host', b'localhost'), (b'content-type', b'application/json'),
+                            (b'content-length', str(len(body)).encode())],
+                'server': ('localhost', 80), 'client': ('127.0.0.1', 0),
+            }
+            await application(scope, receive, send)
+            return status[0]
+
+        return await asyncio.gather(*(call(body) for body in bodies))
+
+    def bench_concurrency(self, size, options):
+        """Keeps ``size`` slow requests in flight at once under WSGI threads and under ASGI."""
+        threads, latency = options['threads'], options['latency'] / 1000
+        bodies = self.sample_messages(size)
+        sync_path, async_path = reverse('message-ingester'), reverse('message-ingester-async')
+        self.stdout.write(f"{size} requests, {options['latency']:.0f} ms client latency, {threads} WSGI threads")
+
+        runs = [
+            (f"WSGI sync view ({threads} threads)",
+             lambda: self.run_wsgi(get_wsgi_application(), sync_path, bodies, threads, latency)),
+            ("ASGI sync view",
+             lambda: asyncio.run(self.run_asgi(get_asgi_application(), sync_path, bodies, latency))),
+            ("ASGI async view",
+             lambda: asyncio.run(self.run_asgi(get_asgi_application(), async_path, bodies, latency))),
+        ]
+        for label, run in runs:
+            start = time.perf_counter()
+            statuses = run()
+            seconds = time.perf_counter() - start
+            counts = {}
+            for status in statuses:
+                counts[status] = counts.get(status, 0) + 1
+            self.report(label, seconds, size, counts)
+
+    def bench_parallel(self, size, options):
+        """Batch evaluation in-process vs. across worker processes, for growing batch sizes up to ``size``."""
+        messages = [json.loads(body) for body in self.sample_messages(size)]
+        routed = [(routing_table.resolve(message["asset_id"], message["attribute_id"]), message)
+                  for message in messages]
+        in_process = ParallelEvaluator(cutoff=size + 1)
+        parallel = ParallelEvaluator(max_workers=options['workers'], cutoff=0)
+        parallel.evaluate(routed[:parallel.max_workers * 10])  # start and warm the worker processes
+
+        self.stdout.write(f"{parallel.max_workers} worker processes")
+        try:
+            for batch_size in [n for n in (100, 1000, 10000, 100000) if n < size] + [size]:
+                batch = routed[:batch_size]
+                in_process_seconds = min(timeit.repeat(lambda: in_process.evaluate(batch), number=1, repeat=3))
+                parallel_seconds = min(timeit.repeat(lambda: parallel.evaluate(batch), number=1, repeat=3))
+                self.stdout.write(f"{batch_size:>8} messages  in-process {in_process_seconds * 1000:9.1f} ms  "
+                                  f"process pool {parallel_seconds * 1000:9.1f} ms  "
+                                  f"speedup {in_process_seconds / parallel_seconds:5.2f}x")
+        finally:
+            parallel.shutdown()
+
+    def bench_overhead(self, size, options):
+        """Per-request cost of the DRF Ingester vs. the raw Django one, back to back with no client latency."""
+        application = get_wsgi_application()
+        bodies = self.sample_messages(size)
+        runs = [("DRF view", reverse('message-ingester')), ("Raw Django view", reverse('message-ingester-fast'))]
+        for _, path in runs:
+            self.run_wsgi(application, path, bodies[:100], 1, 0)  # warm routes and compiled KPIs
+
+        self.stdout.write(f"{size} sequential requests")
+        timings = {}
+        for label, path in runs:
+            start = time.perf_counter()
+            statuses = self.run_wsgi(application, path, bodies, 1, 0)
+            timings[label] = time.perf_counter() - start
+            counts = {}
+            for status in statuses:
+                counts[status] = counts.get(status, 0) + 1
+            self.report(label, timings[label], size, counts)
+        saved = (timings["DRF view"] - timings["Raw Django view"]) / size
+        self.stdout.write(f"Saved per request: {saved * 1e6:.1f} us")
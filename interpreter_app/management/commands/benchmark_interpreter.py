@@ -0,0 +1,80 @@
+import timeit
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+
+from interpreter_app.interpreter_engine import (
+    EOF, INTERPRETER_FACTORIES, LEXERS, BytecodeProgram, get_interpreter_factory,
+)
+
+
+class Command(BaseCommand):
+    help = "Micro-benchmarks for the interpreter engine"
+
+    # Suite name -> default --size
+    suites = {'lexer': 2000, 'nesting': 10000}
+
+    def add_arguments(self, parser):
+        parser.add_argument('suite', choices=list(self.suites), help="Benchmark suite to run")
+        parser.add_argument('--size', type=int, help="Size of the generated expression (suite specific default)")
+        parser.add_argument('--repeat', type=int, default=5, help="Timing repetitions (best is reported)")
+
+    def handle(self, *args, **options):
+        suite = options['suite']
+        size = options['size'] or self.suites[suite]
+        getattr(self, f"bench_{suite}")(size, options['repeat'])
+
+    def report(self, label, seconds, unit_count, unit):
+        self.stdout.write(f"{label:<32} {seconds * 1000:10.3f} ms  {seconds / unit_count * 1e6:10.3f} us/{unit}")
+
+    def best_of(self, func, repeat):
+        return min(timeit.repeat(func, number=1, repeat=repeat))
+
+    def bench_lexer(self, size, repeat):
+        """Tokenizes a long arithmetic/Regex expression with each lexer."""
+        text = ' + '.join(f'(ATTR_{i % 7} * {i}.5 ** 2 - Regex(ATTR, "x{i}"))' for i in range(size))
+
+        def tokenize(lexer_class, token_factory_class):
+            lexer = lexer_class(text, token_factory_class())
+            count = 0
+            while lexer.get_next_token().type != EOF:
+                count += 1
+            return count
+
+        self.stdout.write(f"Expression length: {len(text)} characters")
+        for name, (lexer_class, token_factory_class) in LEXERS.items():
+            tokens = tokenize(lexer_class, token_factory_class)
+            seconds = self.best_of(lambda: tokenize(lexer_class, token_factory_class), repeat)
+            self.report(f"{name} ({lexer_class.__name__})", seconds, tokens, "token")
+
+    def bench_nesting(self, size, repeat):
+        """Stress test at ``size`` levels of parentheses / operator chaining."""
+        shapes = {
+            'nested parentheses': '(' * size + 'ATTR' + ' + 1)' * size,
+            'long + chain': 'ATTR' + ' + 1' * size,
+            'redundant parentheses': '(' * size + 'ATTR' + ')' * size,
+        }
+        iterative_factory = get_interpreter_factory('iterative', lexer='regex')
+        for shape, text in shapes.items():
+            self.stdout.write(f"{shape} (depth {size}):")
+            # Every backend, from source and from stored bytecode as the ingest path loads it
+            bytecode = BytecodeProgram.loads(iterative_factory.compile_bytecode(text).dumps())
+            for backend in INTERPRETER_FACTORIES:
+                factory = get_interpreter_factory(backend)
+                for path, load in (('compile', lambda: factory.compile(text)),
+                                   ('load_bytecode', lambda: factory.load_bytecode(bytecode))):
+                    try:
+                        load()({'ATTR': 1})
+                        outcome = "ok"
+                    except RecursionError:
+                        outcome = "RecursionError"
+                    self.stdout.write(f"  {backend} {path}: {outcome}")
+
+            tracemalloc.start()
+            program = iterative_factory.compile(text)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            self.report("  iterative compile", self.best_of(lambda: iterative_factory.compile(text), repeat), 1, "expr")
+            self.report("  iterative evaluate", self.best_of(lambda: program({'ATTR': 1}), repeat), 1, "expr")
+            self.stdout.write(f"  compile peak memory: {peak / 1024:.0f} KiB, "
+                              f"program: {len(program.instructions)} instructions")
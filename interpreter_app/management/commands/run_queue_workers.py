@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from interpreter_app.message_queue import WorkerPool, drain, queue_stats
+
+
+class Command(BaseCommand):
+    help = "Runs the worker pool that evaluates messages accepted by /api/Ingester/queue/"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, help="Worker threads (default: KPI_QUEUE_WORKERS)")
+        parser.add_argument('--batch-size', type=int, help="Messages claimed per batch (default: KPI_QUEUE_BATCH_SIZE)")
+        parser.add_argument('--poll-interval', type=float, default=1.0, help="Seconds to sleep when the queue is empty")
+        parser.add_argument('--once', action='store_true', help="Drain the queue in this process and exit")
+
+    def handle(self, *args, **options):
+        if options['once']:
+            processed = drain(batch_size=options['batch_size'])
+            self.stdout.write(f"Processed {processed} messages")
+            return
+
+        pool = WorkerPool(options['workers'], options['batch_size'], options['poll_interval'])
+        pool.start()
+        self.stdout.write(f"Started {pool.workers} queue workers, Ctrl-C to stop")
+        try:
+            while True:
+                time.sleep(10)
+                stats = queue_stats()
+                self.stdout.write(f"depth {stats['depth']}  lag {stats['lag']:.1f}s  "
+                                  f"done {stats['done']}  failed {stats['failed']}")
+        except KeyboardInterrupt:
+            self.stdout.write("Stopping queue workers")
+            pool.stop()
@@ -0,0 +1,145 @@
+import logging
+import threading
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, Min, Q
+from django.utils import timezone
+
+from kpi_app.outputs import output_buffer
+from interpreter_app.models import QueuedMessage
+from interpreter_app.routing import check_serializable, compute_message, routing_table
+
+logger = logging.getLogger(__name__)
+
+###############################################################################
+# DURABLE INGESTION QUEUE                                                     #
+###############################################################################
+
+def enqueue(message):
+    """Appends a validated Ingester message to the queue; it is durable once this returns."""
+    return QueuedMessage.objects.create(payload=message)
+
+
+def claim_batch(worker_id, batch_size=None, claim_timeout=None):
+    """Marks up to ``batch_size`` of the oldest messages as claimed by ``worker_id`` and returns them.
+
+    Messages claimed longer than ``claim_timeout`` seconds ago belong to a
+    worker that died mid-batch and are claimed again.
+    """
+    batch_size = batch_size or getattr(settings, 'KPI_QUEUE_BATCH_SIZE', 500)
+    claim_timeout = claim_timeout or getattr(settings, 'KPI_QUEUE_CLAIM_TIMEOUT', 300)
+    now = timezone.now()
+    claimable = Q(status=QueuedMessage.PENDING) | Q(
+        status=QueuedMessage.PROCESSING, claimed_at__lt=now - timedelta(seconds=claim_timeout))
+    with transaction.atomic():
+        ids = list(QueuedMessage.objects.filter(claimable).order_by('received_at', 'pk')
+                   .values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return []
+        # Re-checking claimable makes the claim safe against a concurrent worker taking the same rows
+        QueuedMessage.objects.filter(claimable, pk__in=ids).update(
+            status=QueuedMessage.PROCESSING, claimed_by=worker_id, claimed_at=now)
+    return list(QueuedMessage.objects.filter(pk__in=ids, claimed_by=worker_id, claimed_at=now)
+                .order_by('received_at', 'pk'))
+
+
+def process_batch(messages):
+    """Evaluates claimed messages grouped by KPI and records each result on its queue row."""
+    routes = routing_table.resolve_many(
+        (queued.payload.get("asset_id"), queued.payload.get("attribute_id")) for queued in messages)
+    groups = {}
+    for queued in messages:
+        route = routes[routing_table.make_key(queued.payload.get("asset_id"), queued.payload.get("attribute_id"))]
+        if isinstance(route, Exception):
+            # The pair was unlinked after the message was accepted
+            queued.result, queued.status = {"error": str(route), "status": 404}, QueuedMessage.FAILED
+            continue
+        groups.setdefault(route.kpi_pk, []).append((queued, route))
+
+    for group in groups.values():
+        for queued, route in group:
+            # A result the JSON column cannot store (e.g. a complex number) must not sink the whole batch
+            data, status = check_serializable(*compute_message(route, queued.payload))
+            if status == 200:
+                queued.result, queued.status = data, QueuedMessage.DONE
+            else:
+                queued.result, queued.status = {**data, "status": status}, QueuedMessage.FAILED
+
+    now = timezone.now()
+    for queued in messages:
+        queued.processed_at = now
+    with transaction.atomic():
+        # Pending outputs are flushed with the results; outputs may already have been flushed
+        # earlier (a full buffer, or another worker's batch), so this is not all-or-nothing
+        output_buffer.flush()
+        QueuedMessage.objects.bulk_update(messages, ['status', 'result', 'processed_at'])
+    return len(messages)
+
+
+def drain(worker_id=None, batch_size=None):
+    """Processes batches until the queue is empty; returns how many messages were processed."""
+    worker_id = worker_id or uuid.uuid4().hex
+    processed = 0
+    while True:
+        messages = claim_batch(worker_id, batch_size)
+        if not messages:
+            return processed
+        processed += process_batch(messages)
+
+
+def queue_stats():
+    now = timezone.now()
+    counts = dict.fromkeys((QueuedMessage.PENDING, QueuedMessage.PROCESSING, QueuedMessage.DONE,
+                            QueuedMessage.FAILED), 0)
+    counts.update(QueuedMessage.objects.order_by().values_list('status').annotate(Count('pk')))
+    oldest = QueuedMessage.objects.filter(status=QueuedMessage.PENDING).aggregate(oldest=Min('received_at'))['oldest']
+    return {
+        "depth": counts[QueuedMessage.PENDING],
+        "processing": counts[QueuedMessage.PROCESSING],
+        "done": counts[QueuedMessage.DONE],
+        "failed": counts[QueuedMessage.FAILED],
+        # Seconds the oldest pending message has been waiting
+        "lag": (now - oldest).total_seconds() if oldest else 0.0,
+    }
+
+
+class WorkerPool:
+    """Threads that keep draining the queue, sleeping ``poll_interval`` seconds whenever it is empty."""
+
+    def __init__(self, workers=None, batch_size=None, poll_interval=1.0):
+        self.workers = workers or getattr(settings, 'KPI_QUEUE_WORKERS', 4)
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self._stop = threading.Event()
+        self._threads = []
+
+    def run_worker(self):
+        worker_id = uuid.uuid4().hex
+        try:
+            while not self._stop.is_set():
+                try:
+                    processed = drain(worker_id, self.batch_size)
+                except Exception:
+                    # The batch stays claimed and is retried after the claim timeout; the worker keeps going
+                    logger.exception("Queue worker %s failed to process a batch", worker_id)
+                    processed = 0
+                if not processed:
+                    self._stop.wait(self.poll_interval)
+        finally:
+            connection.close()
+
+    def start(self):
+        self._stop.clear()
+        self._threads = [threading.Thread(target=self.run_worker, name=f"kpi-queue-worker-{i}", daemon=True)
+                         for i in range(self.workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
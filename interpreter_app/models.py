@@ -1,3 +1,38 @@
 from django.db import models
 
-# Create your models here.
+class QueuedMessage(models.Model):
+    PENDING = 'pending'
+    PROCESSING = 'processing'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (PROCESSING, 'Processing'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    # Ingester message exactly as received
+    payload = models.JSONField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    received_at = models.DateTimeField(auto_now_add=True)
+    # Set when a worker claims the message; stale claims are picked up again
+    claimed_by = models.CharField(max_length=64, blank=True, null=True)
+    claimed_at = models.DateTimeField(blank=True, null=True)
+    processed_at = models.DateTimeField(blank=True, null=True)
+    # Ingester response for DONE messages, error record for FAILED ones
+    result = models.JSONField(blank=True, null=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'received_at'])]
+
+    def __str__(self):
+        return f"{self.pk} ({self.status})"
+
+class RoutingGeneration(models.Model):
+    # Single row, bumped whenever an Asset, Linker or KPI changes; every process compares it with the
+    # generation its routing table was loaded at, so an edit made in another process is picked up too
+    value = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return str(self.value)
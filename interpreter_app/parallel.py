@@ -0,0 +1,140 @@
+import math
+import multiprocessing
+import os
+import logging
+import threading
+from concurrent.futures import CancelledError, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+
+from interpreter_app.expression_cache import expression_cache
+from interpreter_app.pool_worker import initialize_worker
+from interpreter_app.routing import compute_message, evaluate_values, output_record, record_output
+
+logger = logging.getLogger(__name__)
+
+###############################################################################
+# MULTI-PROCESS EVALUATION                                                    #
+###############################################################################
+
+def evaluate_shard(kpi_id, equation, bytecode, values):
+    """Runs in a worker process; the worker's own ``expression_cache`` compiles each KPI once.
+
+    Workers never touch the database, everything they need comes with the task.
+    """
+    return evaluate_values(lambda: expression_cache.get(kpi_id, equation, bytecode), equation, values)
+
+
+def pool_context():
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+
+
+class ParallelEvaluator:
+    """Evaluates large batches of routed messages across a ``ProcessPoolExecutor``.
+
+    Messages are grouped by KPI and each group is split into at most one shard
+    per worker. A task carries the KPI id, its expression text and the raw
+    values; workers keep compiled programs in their own ``expression_cache``,
+    so no parse tree or program is pickled. Batches smaller than ``cutoff``
+    messages are evaluated in-process, where the pool round trip would cost
+    more than it saves.
+
+    Workers are started with ``forkserver`` (``spawn`` where that is not
+    available), never ``fork``: the pool is created lazily inside a threaded
+    server, and a forked child could inherit a lock another thread was holding.
+
+    If a worker dies or a shard takes longer than ``timeout`` seconds, the
+    pool is discarded, the rest of the batch is evaluated in-process and the
+    next large batch starts a new pool.
+    """
+
+    def __init__(self, max_workers=None, cutoff=None, timeout=None):
+        self.max_workers = max_workers or getattr(settings, 'KPI_PARALLEL_WORKERS', None) or os.cpu_count()
+        self.cutoff = cutoff if cutoff is not None else getattr(settings, 'KPI_PARALLEL_CUTOFF', 5000)
+        self.timeout = timeout if timeout is not None else getattr(settings, 'KPI_PARALLEL_TIMEOUT', None)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers, mp_context=pool_context(), initializer=initialize_worker)
+            return self._executor
+
+    def evaluate(self, routed):
+        """Evaluates ``(route, message)`` pairs grouped by KPI; returns ``(data, status)`` per pair, in order."""
+        results = [None] * len(routed)
+        groups = {}
+        for position, (route, message) in enumerate(routed):
+            if not route.has_kpi:
+                results[position] = compute_message(route, message)
+                continue
+            groups.setdefault(route.kpi_pk, []).append(position)
+
+        in_process = len(routed) < self.cutoff
+        executor = None if in_process else self.executor
+        shards = []
+        for positions in groups.values():
+            route = routed[positions[0]][0]
+            if in_process:
+                values = [routed[position][1].get("value") for position in positions]
+                shards.append((positions, evaluate_values(lambda: route.program, route.equation, values)))
+                continue
+            shard_size = math.ceil(len(positions) / self.max_workers)
+            for start in range(0, len(positions), shard_size):
+                shard = positions[start:start + shard_size]
+                values = [routed[position][1].get("value") for position in shard]
+                future = None
+                if executor is not None:
+                    try:
+                        future = executor.submit(evaluate_shard, route.kpi_pk, route.equation, route.bytecode, values)
+                    except BrokenProcessPool as e:
+                        self.discard(executor, e)
+                        executor = None
+                shards.append((shard, future))
+
+        for shard, evaluated in shards:
+            if not in_process:
+                try:
+                    if executor is None:
+                        raise BrokenProcessPool("the pool was discarded earlier in this batch")
+                    evaluated = evaluated.result(timeout=self.timeout)
+                except (BrokenProcessPool, CancelledError, TimeoutError) as e:
+                    if executor is not None:
+                        self.discard(executor, e)
+                        executor = None
+                    route = routed[shard[0]][0]
+                    values = [routed[position][1].get("value") for position in shard]
+                    evaluated = evaluate_values(lambda: route.program, route.equation, values)
+            for position, (computed_value, error) in zip(shard, evaluated):
+                route, message = routed[position]
+                if error is not None:
+                    results[position] = {"error": error}, 400
+                    continue
+                record_output(route, message, computed_value)
+                results[position] = output_record(message, computed_value), 200
+        return results
+
+    def discard(self, executor, error):
+        """Shuts a failed ``executor`` down and, unless another thread already replaced it, forgets it."""
+        logger.warning("Worker pool failed (%r); evaluating the rest of the batch in-process", error)
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        # A hung worker would never finish on its own
+        for process in list((executor._processes or {}).values()):
+            process.terminate()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+
+
+parallel_evaluator = ParallelEvaluator()
@@ -0,0 +1,20 @@
+import django
+from django.db import connections
+
+
+###############################################################################
+# PROCESS POOL WORKER SET-UP                                                  #
+###############################################################################
+
+# Kept free of model imports: a spawned or forkserver child unpickles this
+# initializer before Django is set up, and importing models first would fail.
+
+def initialize_worker():
+    """``ProcessPoolExecutor`` initializer for ``ParallelEvaluator`` workers.
+
+    The child starts from a fresh interpreter, so it sets Django up from the
+    inherited ``DJANGO_SETTINGS_MODULE``. Workers never use the database;
+    closing connections makes sure none is shared with the parent.
+    """
+    django.setup()
+    connections.close_all()
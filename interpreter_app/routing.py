@@ -0,0 +1,296 @@
+import json
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import F
+from django.http import Http404
+
+from kpi_app.models import Asset, Attribute
+from kpi_app.outputs import output_buffer
+from interpreter_app.expression_cache import expression_cache
+from interpreter_app.interpreter_engine import unescape_expression
+from interpreter_app.models import RoutingGeneration
+
+
+###############################################################################
+# ROUTING TABLE                                                               #
+###############################################################################
+
+class Route:
+    """Everything the Ingester needs for one (asset_id, attribute_id) pair."""
+
+    __slots__ = ('asset_pk', 'attribute_pk', 'kpi_pk', 'equation', 'bytecode', '_program')
+
+    def __init__(self, attribute):
+        self.asset_pk = attribute.asset_id
+        self.attribute_pk = attribute.pk
+        kpi = attribute.kpi
+        self.kpi_pk = kpi.pk if kpi else None
+        self.equation = unescape_expression(kpi.expression) if kpi else None
+        self.bytecode = kpi.bytecode if kpi else None
+        self._program = None
+
+    @property
+    def has_kpi(self):
+        return self.kpi_pk is not None
+
+    @property
+    def program(self):
+        # Compiled on first use so a broken expression surfaces as an Interpreter Error, not at warm-up
+        if self._program is None:
+            self._program = expression_cache.get(self.kpi_pk, self.equation, self.bytecode)
+        return self._program
+
+
+def evaluate_values(load_program, equation, values):
+    """Evaluates ATTR values with the Ingester's coercion; returns ``(value, error)`` pairs in order.
+
+    ``load_program`` is only called once a value needs it, so an expression
+    that does not compile is reported per message like any other error.
+    """
+    results = []
+    program = None
+    for value in values:
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            pass
+
+        context = {"ATTR": value}
+
+        try:
+            if program is None:
+                program = load_program()
+            results.append((program(context), None))
+        except Exception as e:
+            results.append((None, f"Interpreter Error: {str(e)} (Equation: {equation}, Context: {context})"))
+    return results
+
+
+def output_record(message, computed_value):
+    return {
+        "asset_id": message.get("asset_id"),
+        "attribute_id": f"output_{message.get('attribute_id')}",
+        "timestamp": message.get("timestamp"),
+        "value": computed_value
+    }
+
+
+def record_output(route, message, computed_value):
+    output_buffer.add(route.asset_pk, route.attribute_pk, message.get("timestamp"), computed_value)
+
+
+def compute_message(route, message):
+    """Evaluates one Ingester message against its resolved route; returns ``(data, status)``."""
+    # Ensuring that the attribute has a linked KPI with an equation
+    if not route.has_kpi:
+        return {"error": "No KPI linked to this attribute"}, 400
+
+    # Compiled programs are context-free, so one cached program serves every message of this KPI
+    [(computed_value, error)] = evaluate_values(lambda: route.program, route.equation, [message.get("value")])
+    if error is not None:
+        return {"error": error}, 400
+    record_output(route, message, computed_value)
+    return output_record(message, computed_value), 200
+
+
+def check_serializable(data, status):
+    """Returns ``(data, status)``, or a 400 error if ``data`` cannot be encoded as JSON (e.g. a complex result)."""
+    try:
+        json.dumps(data)
+    except (TypeError, ValueError) as e:
+        return {"error": f"Unserializable result: {e}"}, 400
+    return data, status
+
+
+def current_generation():
+    return RoutingGeneration.objects.filter(pk=1).values_list('value', flat=True).first() or 0
+
+
+def bump_generation():
+    """Tells every process's routing table that an Asset, Linker or KPI changed."""
+    if not RoutingGeneration.objects.filter(pk=1).update(value=F('value') + 1):
+        RoutingGeneration.objects.get_or_create(pk=1, defaults={'value': 1})
+
+
+class RoutingTable:
+    """Process-local map from ``(asset_id, attribute_id)`` to a ready-to-evaluate ``Route``.
+
+    The whole Linker table is loaded with one query on first use; after that a
+    hit needs no database access. ``post_save``/``post_delete`` handlers on
+    Asset, Attribute and KPI drop affected routes, which are then reloaded one
+    pair at a time on their next miss.
+
+    Those handlers only run in the process that made the change, so they also
+    bump the shared ``RoutingGeneration``. At most every ``check_interval``
+    seconds a lookup reads it (one single-row query) and, if it moved, the
+    whole table is reloaded: other server workers and queue workers see an
+    edit within ``check_interval``. ``check_interval=None`` skips the check,
+    for single-process deployments. Changes that bypass model signals
+    (``QuerySet.update``, raw SQL) need ``bump_generation()`` called by hand.
+    """
+
+    def __init__(self, check_interval=1.0):
+        self._routes = {}
+        self._lock = threading.Lock()
+        self.warmed = False
+        self.hits = 0
+        self.misses = 0
+        self.check_interval = check_interval
+        self.generation = None
+        self._checked_at = None
+
+    @staticmethod
+    def make_key(asset_id, attribute_id):
+        return (None if asset_id is None else str(asset_id),
+                None if attribute_id is None else str(attribute_id))
+
+    def check_due(self):
+        return self.check_interval is not None and (
+            self._checked_at is None or time.monotonic() - self._checked_at >= self.check_interval)
+
+    def check_generation(self):
+        """Drops every route if another process changed a model since the table was loaded."""
+        if not self.warmed or not self.check_due():
+            return
+        generation = current_generation()
+        self._checked_at = time.monotonic()
+        with self._lock:
+            if self.generation is not None and generation != self.generation:
+                self._routes = {}
+                self.warmed = False
+
+    def warm(self):
+        # Read before loading, so a change made during the load is caught by the next check
+        generation = current_generation() if self.check_interval is not None else None
+        routes = {
+            self.make_key(attribute.asset.asset_id, attribute.attribute_id): Route(attribute)
+            for attribute in Attribute.objects.select_related('asset', 'kpi')
+        }
+        with self._lock:
+            self._routes = routes
+            self.warmed = True
+            self.generation = generation
+        self._checked_at = time.monotonic()
+
+    def resolve(self, asset_id, attribute_id):
+        """Returns the ``Route`` for a pair; raises ``Http404`` like ``get_object_or_404`` would."""
+        self.check_generation()
+        if not self.warmed:
+            self.warm()
+        key = self.make_key(asset_id, attribute_id)
+        with self._lock:
+            route = self._routes.get(key)
+            if route is not None:
+                self.hits += 1
+                return route
+            self.misses += 1
+
+        try:
+            attribute = Attribute.objects.select_related('asset', 'kpi').get(
+                asset__asset_id=asset_id, attribute_id=attribute_id)
+        except Attribute.DoesNotExist:
+            if not Asset.objects.filter(asset_id=asset_id).exists():
+                raise Http404("No Asset matches the given query.")
+            raise Http404("No Attribute matches the given query.")
+
+        route = Route(attribute)
+        with self._lock:
+            self._routes[key] = route
+        return route
+
+    async def aresolve(self, asset_id, attribute_id):
+        """Async ``resolve``: a warm hit never leaves the event loop, a miss (or a generation check) runs in a
+        worker thread."""
+        if self.warmed and not self.check_due():
+            key = self.make_key(asset_id, attribute_id)
+            with self._lock:
+                route = self._routes.get(key)
+                if route is not None:
+                    self.hits += 1
+                    return route
+        return await sync_to_async(self.resolve)(asset_id, attribute_id)
+
+    def resolve_many(self, pairs):
+        """Resolves many pairs at once; returns a dict from ``make_key(...)`` to a ``Route`` or ``Http404``.
+
+        Pairs missing from the table are loaded together with a single query.
+        """
+        self.check_generation()
+        if not self.warmed:
+            self.warm()
+        routes = {}
+        missing = {}
+        with self._lock:
+            for asset_id, attribute_id in pairs:
+                key = self.make_key(asset_id, attribute_id)
+                if key in routes or key in missing:
+                    continue
+                route = self._routes.get(key)
+                if route is not None:
+                    self.hits += 1
+                    routes[key] = route
+                else:
+                    self.misses += 1
+                    missing[key] = (asset_id, attribute_id)
+        if not missing:
+            return routes
+
+        attributes = Attribute.objects.select_related('asset', 'kpi').filter(
+            asset__asset_id__in={asset_id for asset_id, _ in missing.values()},
+            attribute_id__in={attribute_id for _, attribute_id in missing.values()},
+        )
+        loaded = {self.make_key(attribute.asset.asset_id, attribute.attribute_id): Route(attribute)
+                  for attribute in attributes}
+        with self._lock:
+            for key in missing:
+                if key in loaded:
+                    self._routes[key] = routes[key] = loaded[key]
+
+        unresolved = [key for key in missing if key not in routes]
+        if unresolved:
+            assets = set(Asset.objects.filter(asset_id__in={key[0] for key in unresolved})
+                         .values_list('asset_id', flat=True))
+            for key in unresolved:
+                model = "Attribute" if key[0] in assets else "Asset"
+                routes[key] = Http404(f"No {model} matches the given query.")
+        return routes
+
+    def _discard(self, predicate):
+        with self._lock:
+            for key in [key for key, route in self._routes.items() if predicate(key, route)]:
+                del self._routes[key]
+
+    def invalidate_asset(self, asset):
+        self._discard(lambda key, route: route.asset_pk == asset.pk or key[0] == asset.asset_id)
+
+    def invalidate_attribute(self, attribute):
+        self._discard(lambda key, route: route.attribute_pk == attribute.pk or (
+            route.asset_pk == attribute.asset_id and key[1] == attribute.attribute_id))
+
+    def invalidate_kpi(self, kpi):
+        self._discard(lambda key, route: route.kpi_pk == kpi.pk)
+
+    def clear(self):
+        with self._lock:
+            self._routes.clear()
+            self.warmed = False
+            self.hits = 0
+            self.misses = 0
+            self.generation = None
+        self._checked_at = None
+
+    def stats(self):
+        return {"size": len(self._routes), "warmed": self.warmed, "hits": self.hits, "misses": self.misses,
+                "generation": self.generation}
+
+    def __len__(self):
+        return len(self._routes)
+
+    def __contains__(self, key):
+        return key in self._routes
+
+
+routing_table = RoutingTable(check_interval=getattr(settings, 'KPI_ROUTING_CHECK_INTERVAL', 1.0))
@@ -0,0 +1,35 @@
+from django.core.signals import request_finished
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from kpi_app.models import KPI, Asset, Attribute
+from interpreter_app.expression_cache import expression_cache
+from interpreter_app.routing import bump_generation, routing_table
+from kpi_app.outputs import output_buffer
+
+
+@receiver(post_save, sender=KPI)
+@receiver(post_delete, sender=KPI)
+def invalidate_kpi_expression(sender, instance, **kwargs):
+    expression_cache.invalidate(instance.pk)
+    routing_table.invalidate_kpi(instance)
+    bump_generation()
+
+
+@receiver(post_save, sender=Asset)
+@receiver(post_delete, sender=Asset)
+def invalidate_asset_routes(sender, instance, **kwargs):
+    routing_table.invalidate_asset(instance)
+    bump_generation()
+
+
+@receiver(post_save, sender=Attribute)
+@receiver(post_delete, sender=Attribute)
+def invalidate_attribute_routes(sender, instance, **kwargs):
+    routing_table.invalidate_attribute(instance)
+    bump_generation()
+
+
+@receiver(request_finished)
+def flush_due_outputs(sender, **kwargs):
+    output_buffer.flush_if_due()
@@ -0,0 +1,66 @@
+import unittest
+import numpy as np
+import pandas as pd
+from interpreter_app.batch_engine import BatchEvaluationError, evaluate_batch
+from interpreter_app.interpreter_engine import SimpleInterpreterFactory
+
+
+class EvaluateBatchTests(unittest.TestCase):
+    def setUp(self):
+        self.interpreter_factory = SimpleInterpreterFactory()
+
+    def compile(self, equation):
+        return self.interpreter_factory.compile_bytecode(equation)
+
+    def test_numeric_array_matches_scalar_evaluation(self):
+        equation = "ATTR * ((ATTR - 2) / 10) + 2 ** 5 - ATTR ** 2"
+        values = np.array([0, 1.5, 3, 42, -7.25])
+        program = self.compile(equation)
+        expected = [self.interpreter_factory.compile(equation)({"ATTR": float(v)}) for v in values]
+        np.testing.assert_allclose(evaluate_batch(program, values), expected)
+
+    def test_division_by_zero_raises_with_row_position(self):
+        program = self.compile("10 / (ATTR - 2)")
+        with self.assertRaisesRegex(BatchEvaluationError, "Division by zero") as raised:
+            evaluate_batch(program, np.array([1, 2, 3]))
+        self.assertEqual(raised.exception.position, 1)
+
+    def test_division_by_zero_coerces_to_nan(self):
+        result = evaluate_batch(self.compile("10 / (ATTR - 2)"), np.array([1, 2, 3]), errors="coerce")
+        np.testing.assert_array_equal(result, [-10.0, np.nan, 10.0])
+
+    def test_numeric_strings_are_coerced_like_the_ingester(self):
+        result = evaluate_batch(self.compile("ATTR + 5"), pd.Series(["10", "2.5", 1]))
+        self.assertEqual(result.tolist(), [15.0, 7.5, 6.0])
+
+    def test_regex_over_string_series_keeps_index(self):
+        series = pd.Series(["I have a Dog", "a cat", "15"], index=["a", "b", "c"])
+        result = evaluate_batch(self.compile('Regex(ATTR, ".*dog.*")'), series, errors="coerce")
+        self.assertEqual(list(result.index), ["a", "b", "c"])
+        self.assertEqual(result.tolist(), [True, False, None])
+
+    def scalar_results(self, equation, values):
+        program = self.interpreter_factory.compile(equation)
+        results = []
+        for value in values:
+            try:
+                results.append(program({"ATTR": float(value)}))
+            except Exception as e:
+                results.append(str(e))
+        return results
+
+    def test_power_overflow_matches_scalar_evaluation(self):
+        for equation, values in [("ATTR ** 2", [3, 1e200, 4]), ("2 ** ATTR", [3, 2000, 4])]:
+            scalar = self.scalar_results(equation, values)
+            with self.assertRaises(BatchEvaluationError) as raised:
+                evaluate_batch(self.compile(equation), np.array(values, dtype=float))
+            self.assertEqual((str(raised.exception), raised.exception.position), (scalar[1], 1))
+            result = evaluate_batch(self.compile(equation), np.array(values, dtype=float), errors="coerce")
+            np.testing.assert_array_equal(result, [scalar[0], np.nan, scalar[2]])
+
+    def test_negative_base_with_fractional_power_matches_scalar_evaluation(self):
+        values = [4, -1, 9]
+        result = evaluate_batch(self.compile("ATTR ** 0.5"), np.array(values, dtype=float))
+        self.assertEqual(list(result), self.scalar_results("ATTR ** 0.5", values))
+        self.assertIsInstance(result[1], complex)
+
@@ -0,0 +1,65 @@
+from unittest import mock
+from django.test import TestCase
+from interpreter_app.expression_cache import CompiledExpressionCache, expression_cache
+from interpreter_app.interpreter_engine import SimpleInterpreterFactory
+from kpi_app.models import KPI
+
+
+class CompiledExpressionCacheTests(TestCase):
+    def setUp(self):
+        self.cache = CompiledExpressionCache(maxsize=2)
+
+    def test_cached_program_is_reused_across_contexts(self):
+        program = self.cache.get(1, "ATTR * 2")
+        self.assertIs(self.cache.get(1, "ATTR * 2"), program)
+        self.assertEqual(program({"ATTR": 3}), 6)
+        self.assertEqual(program({"ATTR": 10}), 20)
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+    def test_changed_expression_is_recompiled(self):
+        old_program = self.cache.get(1, "ATTR * 2")
+        new_program = self.cache.get(1, "ATTR * 3")
+        self.assertIsNot(old_program, new_program)
+        self.assertEqual(new_program({"ATTR": 2}), 6)
+
+    def test_least_recently_used_entry_is_evicted(self):
+        self.cache.get(1, "ATTR + 1")
+        self.cache.get(2, "ATTR + 2")
+        self.cache.get(1, "ATTR + 1")
+        self.cache.get(3, "ATTR + 3")
+        self.assertEqual(len(self.cache), 2)
+        self.assertIn(self.cache.make_key(1, "ATTR + 1"), self.cache)
+        self.assertNotIn(self.cache.make_key(2, "ATTR + 2"), self.cache)
+
+    def test_invalid_expression_is_not_cached(self):
+        with self.assertRaises(Exception):
+            self.cache.get(1, "3 + * 5")
+        self.assertEqual(len(self.cache), 0)
+
+    def test_matching_bytecode_skips_parsing(self):
+        bytecode = SimpleInterpreterFactory().compile_bytecode("ATTR * 2").dumps()
+        with mock.patch.object(self.cache.interpreter_factory, "parse") as parse:
+            program = self.cache.get(1, "ATTR * 2", bytecode)
+        parse.assert_not_called()
+        self.assertEqual(program({"ATTR": 4}), 8)
+
+    def test_stale_bytecode_is_ignored(self):
+        bytecode = SimpleInterpreterFactory().compile_bytecode("ATTR * 2").dumps()
+        program = self.cache.get(1, "ATTR * 3", bytecode)
+        self.assertEqual(program({"ATTR": 4}), 12)
+
+
+class CompiledExpressionCacheInvalidationTests(TestCase):
+    def setUp(self):
+        expression_cache.clear()
+        self.kpi = KPI.objects.create(name="Test KPI", expression="ATTR * 2")
+        expression_cache.get(self.kpi.pk, self.kpi.expression)
+
+    def test_kpi_update_invalidates_entry(self):
+        self.kpi.expression = "ATTR * 3"
+        self.kpi.save()
+        self.assertEqual(len(expression_cache), 0)
+
+    def test_kpi_delete_invalidates_entry(self):
+        self.kpi.delete()
+        self.assertEqual(len(expression_cache), 0)
@@ -1,5 +1,8 @@
 import unittest
-from interpreter_app.interpreter_engine import SimpleInterpreterFactory
+from interpreter_app.interpreter_engine import (
+    BOOLEAN, EOF, NUMBER, UNKNOWN, BytecodeInterpreterFactory, BytecodeProgram, ClosureInterpreterFactory,
+    IterativeInterpreterFactory, RegexCache, SimpleInterpreterFactory, TypeInference, check_regex_pattern,
+)
 
 class SimpleInterpreterFactoryTests(unittest.TestCase):
     def setUp(self):
@@ -113,3 +116,266 @@ class SimpleInterpreterFactoryTests(unittest.TestCase):
         result = interpreter.interpret()
         self.assertFalse(result)
 
+    def test_missing_variable_raises_on_evaluation(self):
+        equation = "ATTR + 5"
+        context = {}
+        lexer = self.interpreter_factory.create_lexer(equation)
+        parser = self.interpreter_factory.create_parser(lexer, context)
+        interpreter = self.interpreter_factory.create_interpreter(parser, context)
+        with self.assertRaisesRegex(Exception, "Variable 'ATTR' not found in context"):
+            interpreter.interpret()
+
+    def test_parse_once_evaluate_many_contexts(self):
+        tree = self.interpreter_factory.parse("ATTR * 1.8 + 32")
+        interpreter = self.interpreter_factory.create_interpreter()
+        self.assertEqual(interpreter.evaluate(tree, {"ATTR": 0}), 32)
+        self.assertEqual(interpreter.evaluate(tree, {"ATTR": 100}), 212)
+        self.assertEqual(interpreter.evaluate(tree, {"ATTR": "10"}), 50)
+
+    def test_parse_does_not_require_context(self):
+        tree = self.interpreter_factory.parse('Regex(ATTR, ".*dog.*")')
+        interpreter = self.interpreter_factory.create_interpreter()
+        self.assertTrue(interpreter.evaluate(tree, {"ATTR": "a dog"}))
+        with self.assertRaisesRegex(Exception, "Variable 'ATTR' not found in context"):
+            interpreter.evaluate(tree, {})
+
+    def test_catastrophic_regex_is_rejected_at_evaluation(self):
+        program = self.interpreter_factory.compile('Regex(ATTR, "^(a+)+$")')
+        with self.assertRaisesRegex(Exception, "Regex pattern rejected"):
+            program({"ATTR": "a" * 40 + "!"})
+
+    def test_dynamic_regex_pattern(self):
+        program = self.interpreter_factory.compile('Regex("I have a Dog", ATTR)')
+        self.assertTrue(program({"ATTR": "dog"}))
+        self.assertFalse(program({"ATTR": "cat"}))
+
+
+class ClosureInterpreterFactoryTests(SimpleInterpreterFactoryTests):
+    def setUp(self):
+        self.interpreter_factory = ClosureInterpreterFactory()
+
+    def test_error_messages_match_tree_interpreter(self):
+        tree_factory = SimpleInterpreterFactory()
+        cases = [
+            ("ATTR / 0", {"ATTR": 1}),
+            ("ATTR / (ATTR - 1)", {"ATTR": "1"}),
+            ('Regex(ATTR)', {"ATTR": "dog"}),
+            ("ATTR + 1", {}),
+        ]
+        for equation, context in cases:
+            with self.subTest(equation=equation):
+                with self.assertRaises(Exception) as expected:
+                    tree_factory.compile(equation)(context)
+                with self.assertRaises(Exception) as actual:
+                    self.interpreter_factory.compile(equation)(context)
+                self.assertEqual(str(actual.exception), str(expected.exception))
+
+    def test_compiled_program_matches_tree_interpreter(self):
+        tree_factory = SimpleInterpreterFactory()
+        for equation in ["ATTR * 1.8 + 32", "2 ** ATTR - ATTR / 4", "(ATTR + ATTR) * (3 - ATTR)"]:
+            for value in [0, 2.5, "7", "12.5"]:
+                with self.subTest(equation=equation, value=value):
+                    self.assertEqual(
+                        self.interpreter_factory.compile(equation)({"ATTR": value}),
+                        tree_factory.compile(equation)({"ATTR": value}),
+                    )
+
+
+class BytecodeInterpreterFactoryTests(ClosureInterpreterFactoryTests):
+    def setUp(self):
+        self.interpreter_factory = BytecodeInterpreterFactory()
+
+    def test_bytecode_is_postfix(self):
+        program = self.interpreter_factory.compile_bytecode("ATTR * 1.8 + 32")
+        self.assertEqual(program.instructions, (
+            ("LOAD", "ATTR"), ("CONST", 1.8), ("MUL", None), ("CONST", 32), ("PLUS", None),
+        ))
+
+    def test_bytecode_round_trips_through_json(self):
+        equation = 'Regex(ATTR, ".*dog.*")'
+        program = BytecodeProgram.loads(self.interpreter_factory.compile_bytecode(equation).dumps())
+        self.assertTrue(program({"ATTR": "a Dog"}))
+        self.assertEqual(program.source_hash, self.interpreter_factory.compile_bytecode(equation).source_hash)
+
+    def test_other_backends_load_bytecode_without_parsing(self):
+        data = self.interpreter_factory.compile_bytecode("(ATTR - 2) / 10 + Regex(\"a\", \"b\")").dumps()
+        for factory in (SimpleInterpreterFactory(), ClosureInterpreterFactory()):
+            with self.subTest(factory=type(factory).__name__):
+                program = factory.load_bytecode(BytecodeProgram.loads(data))
+                self.assertEqual(program({"ATTR": 12}), 1)
+
+
+class IterativeInterpreterFactoryTests(BytecodeInterpreterFactoryTests):
+    def setUp(self):
+        self.interpreter_factory = IterativeInterpreterFactory()
+
+    def test_parse_matches_recursive_parser(self):
+        recursive_factory = SimpleInterpreterFactory()
+        cases = [
+            "2 ** 3 ** 2 * 4 - 1 / 2", 'Regex(Regex(a, "b"), (c)) + 1', "(3 + 4) 5", "3 + 5 )",
+            "3 + * 5", "(1, 2)", "(3", 'Regex(ATTR, "a", 1)', "Regex ATTR", "",
+        ]
+        for equation in cases:
+            with self.subTest(equation=equation):
+                self.assertEqual(self.instructions(self.interpreter_factory, equation),
+                                 self.instructions(recursive_factory, equation))
+
+    def instructions(self, factory, equation):
+        try:
+            return BytecodeInterpreterFactory().create_interpreter().compile(factory.parse(equation)).instructions
+        except Exception as e:
+            return repr(e)
+
+    def test_deep_nesting_does_not_recurse(self):
+        depth = 10000
+        for equation in ["(" * depth + "ATTR" + " + 1)" * depth, "ATTR" + " - 1" * depth]:
+            with self.subTest(equation=equation[:20]):
+                program = self.interpreter_factory.compile(equation)
+                self.assertEqual(abs(program({"ATTR": 0})), depth)
+
+
+class RegexLexerInterpreterFactoryTests(SimpleInterpreterFactoryTests):
+    def setUp(self):
+        self.interpreter_factory = SimpleInterpreterFactory(lexer="regex")
+
+    def tokens(self, factory, text):
+        try:
+            lexer = factory.create_lexer(text)
+            tokens = [lexer.get_next_token()]
+            while tokens[-1].type != EOF:
+                tokens.append(lexer.get_next_token())
+            return [(token.type, token.value) for token in tokens]
+        except Exception as e:
+            return repr(e)
+
+    def test_tokens_and_errors_match_char_lexer(self):
+        char_factory = SimpleInterpreterFactory()
+        for text in ['Regex(ATTR, "^\\d{3}$") + 3.5 ** 2 - (x_1/4)  ', "", "  ", "3 $ 4", '"abc', "1.2.3", "a ½"]:
+            with self.subTest(text=text):
+                self.assertEqual(self.tokens(self.interpreter_factory, text), self.tokens(char_factory, text))
+
+    def test_tokens_have_no_instance_dict(self):
+        token = self.interpreter_factory.create_lexer("ATTR").get_next_token()
+        self.assertFalse(hasattr(token, "__dict__"))
+
+
+class OptimizerTests(unittest.TestCase):
+    def setUp(self):
+        self.interpreter_factory = SimpleInterpreterFactory()
+
+    def optimize(self, equation, numeric_variables=()):
+        optimizer = self.interpreter_factory.create_optimizer(numeric_variables)
+        tree = optimizer.optimize(self.interpreter_factory.parse(equation))
+        return tree, optimizer.report
+
+    def test_constant_subtrees_are_folded(self):
+        tree, report = self.optimize("(9 / 5) * ATTR + 2 ** 5")
+        program = BytecodeInterpreterFactory().create_interpreter().compile(tree)
+        self.assertEqual(program.instructions, (
+            ("CONST", 1.8), ("LOAD", "ATTR"), ("MUL", None), ("CONST", 32), ("PLUS", None),
+        ))
+        self.assertEqual(report.optimized_node_count, 4)
+        self.assertEqual(report.folded, 2)
+
+    def test_division_by_zero_is_left_for_evaluation(self):
+        tree, report = self.optimize("ATTR + 1 / 0")
+        self.assertEqual(report.optimized_node_count, 0)
+        with self.assertRaisesRegex(Exception, "Division by zero"):
+            self.interpreter_factory.create_interpreter().evaluate(tree, {"ATTR": 1})
+
+    def test_literal_regex_is_precomputed(self):
+        tree, report = self.optimize('Regex("I have a Dog", ".*dog.*") + ATTR')
+        self.assertEqual(report.optimized_node_count, 2)
+        self.assertEqual(self.interpreter_factory.create_interpreter().evaluate(tree, {"ATTR": 1}), 2)
+
+    def test_identities_need_numeric_operands(self):
+        _, report = self.optimize("ATTR * 1 + 0")
+        self.assertEqual(report.optimized_node_count, 0)
+
+        tree, report = self.optimize("ATTR * 1 + 0 - ATTR ** 2", numeric_variables={"ATTR"})
+        self.assertEqual(report.reduced, 2)
+        self.assertEqual(report.optimized_node_count, 4)
+        self.assertEqual(self.interpreter_factory.create_interpreter().evaluate(tree, {"ATTR": 3.0}), -6.0)
+
+
+class TypeInferenceTests(unittest.TestCase):
+    def setUp(self):
+        self.interpreter_factory = ClosureInterpreterFactory()
+
+    def infer(self, equation):
+        tree = self.interpreter_factory.parse(equation)
+        return TypeInference({"ATTR": NUMBER}).infer(tree)[id(tree)]
+
+    def test_subtrees_are_classified(self):
+        self.assertEqual(self.infer("ATTR * ((ATTR - 2) / 10) + 2 ** 5"), NUMBER)
+        self.assertEqual(self.infer('Regex(ATTR, ".*dog.*") + 1'), NUMBER)
+        self.assertEqual(self.infer('Regex(ATTR, ".*dog.*")'), BOOLEAN)
+        self.assertEqual(self.infer('ATTR + "5"'), UNKNOWN)
+        self.assertEqual(self.infer("OTHER + 1"), UNKNOWN)
+
+    def test_numeric_program_matches_generic_program(self):
+        equation = "ATTR * ((ATTR - 2) / 10) + 25 + ATTR ** 2"
+        generic_program = SimpleInterpreterFactory().compile(equation)
+        program = self.interpreter_factory.compile(equation)
+        for value in [0.0, 1.5, 42, -7.25, "10", "2.5"]:
+            with self.subTest(value=value):
+                self.assertEqual(program({"ATTR": value}), generic_program({"ATTR": value}))
+
+    def test_numeric_program_overflows_like_the_interpreter(self):
+        interpreter = SimpleInterpreterFactory().create_interpreter()
+        for equation in ["1 - 0 + (ATTR ** 2)", "10*0-10-1/ATTR+0-10/ATTR**(2)/ATTR", "ATTR ** 2 / 10"]:
+            program = self.interpreter_factory.compile(equation)
+            tree = self.interpreter_factory.parse(equation)
+            for value in [1e200, -1e200, 1e154, float("inf"), 3.0, 7]:
+                with self.subTest(equation=equation, value=value):
+                    try:
+                        expected = interpreter.evaluate(tree, {"ATTR": value})
+                    except OverflowError:
+                        with self.assertRaises(OverflowError):
+                            program({"ATTR": value})
+                    else:
+                        self.assertEqual(program({"ATTR": value}), expected)
+
+    def test_string_attribute_takes_the_coercing_path(self):
+        program = self.interpreter_factory.compile("ATTR + 5")
+        with self.assertRaisesRegex(Exception, "unsupported operand|can only concatenate"):
+            program({"ATTR": "dog"})
+        with self.assertRaisesRegex(Exception, "Division by zero"):
+            self.interpreter_factory.compile("10 / (ATTR - 2)")({"ATTR": 2.0})
+
+
+class RegexCacheTests(unittest.TestCase):
+    def test_ambiguous_nested_quantifiers_are_rejected(self):
+        for pattern in ["(a+)+$", "(\\w+\\s?)*x", "(?:x|(y+))*", "(a+b?)+$", "(x+x+)+y"]:
+            with self.subTest(pattern=pattern):
+                with self.assertRaises(Exception):
+                    check_regex_pattern(pattern)
+        # An inner repeat cut off by what follows it inside the outer one backtracks linearly
+        for pattern in [".*dog.*", "(?i).*cat.*|.*dog.*", "^\\d{3}-\\d{2}-\\d{4}$", "(ab){2,5}c+", "((ab)*c)+",
+                        "(\\d+\\.)+\\d+", "^([a-z]+,)*[a-z]+$", "(,\\s*\\w+)*"]:
+            with self.subTest(pattern=pattern):
+                check_regex_pattern(pattern)
+
+    def test_ambiguous_repeats_are_rejected(self):
+        for pattern in ["(a|aa)+$", "^(a?){25}a{25}$", "(a|a)*$", "(\\w|\\d)+$", "(.*a){25}", "(?:b|B?)+$"]:
+            with self.subTest(pattern=pattern):
+                with self.assertRaisesRegex(Exception, "Regex pattern rejected"):
+                    check_regex_pattern(pattern)
+        for pattern in ["(ab?)+$", "(cat|dog)+", "(a|ab)+c", "^(\\d{1,3}\\.){3}\\d{1,3}$", "(a?){3}", "^[\\w.-]+$"]:
+            with self.subTest(pattern=pattern):
+                check_regex_pattern(pattern)
+
+    def test_literal_pattern_is_compiled_onto_node(self):
+        tree = SimpleInterpreterFactory().parse('Regex(ATTR, ".*dog.*")')
+        self.assertEqual(tree.pattern.pattern, ".*dog.*")
+        self.assertIsNone(SimpleInterpreterFactory().parse('Regex(ATTR, ATTR)').pattern)
+
+    def test_cache_is_bounded(self):
+        cache = RegexCache(maxsize=2)
+        cache.get("a")
+        cache.get("b")
+        cache.get("a")
+        cache.get("c")
+        self.assertEqual(len(cache), 2)
+        self.assertIn("a", cache)
+        self.assertNotIn("b", cache)
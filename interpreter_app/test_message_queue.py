@@ -0,0 +1,85 @@
+from datetime import timedelta
+from unittest import mock
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from interpreter_app.message_queue import WorkerPool, claim_batch, drain, queue_stats
+from interpreter_app.models import QueuedMessage
+from interpreter_app.routing import routing_table
+from kpi_app.outputs import output_buffer
+from kpi_app.models import Asset, Attribute, KPI
+
+
+class MessageQueueTests(APITestCase):
+    def setUp(self):
+        routing_table.clear()
+        output_buffer.clear()
+        asset = Asset.objects.create(asset_id="43", name="Test Asset")
+        Attribute.objects.create(asset=asset, attribute_id="6", kpi=KPI.objects.create(name="KPI", expression="10 / ATTR"))
+        Attribute.objects.create(asset=asset, attribute_id="7")
+        self.url = reverse('message-ingester-queue')
+
+    def post(self, attribute_id, value):
+        return self.client.post(self.url, {"asset_id": "43", "attribute_id": attribute_id,
+                                           "timestamp": "2022-07-31T23:28:47Z[UTC]", "value": value}, format="json")
+
+    def test_message_is_acknowledged_and_evaluated_later(self):
+        response = self.post("6", "4")
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(self.client.get(self.url).data["depth"], 1)
+
+        self.assertEqual(drain(), 1)
+        queued = QueuedMessage.objects.get(pk=response.data["id"])
+        self.assertEqual(queued.status, QueuedMessage.DONE)
+        self.assertEqual(queued.result, {"asset_id": "43", "attribute_id": "output_6",
+                                         "timestamp": "2022-07-31T23:28:47Z[UTC]", "value": 2.5})
+        stats = queue_stats()
+        self.assertEqual((stats["depth"], stats["done"], stats["lag"]), (0, 1, 0.0))
+
+    def test_unroutable_messages_are_rejected_up_front(self):
+        self.assertEqual(self.client.post(self.url, {"asset_id": "99", "attribute_id": "6"}, format="json").status_code, 404)
+        self.assertEqual(self.post("7", "1").status_code, 400)
+        self.assertEqual(QueuedMessage.objects.count(), 0)
+
+    def test_evaluation_errors_are_recorded(self):
+        self.post("6", "0")
+        drain()
+        queued = QueuedMessage.objects.get()
+        self.assertEqual(queued.status, QueuedMessage.FAILED)
+        self.assertEqual(queued.result["status"], 400)
+        self.assertIn("Division by zero", queued.result["error"])
+
+    def test_stale_claims_are_claimed_again(self):
+        self.post("6", "4")
+        self.assertEqual(len(claim_batch("worker-1")), 1)
+        self.assertEqual(claim_batch("worker-2"), [])
+        QueuedMessage.objects.update(claimed_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(len(claim_batch("worker-2")), 1)
+
+    def test_unserializable_result_fails_only_its_message(self):
+        asset = Asset.objects.get(asset_id="43")
+        Attribute.objects.create(asset=asset, attribute_id="8", kpi=KPI.objects.create(name="Root", expression="ATTR ** 0.5"))
+        for value in ("4", "-4", "9"):
+            self.assertEqual(self.post("8", value).status_code, 202)
+        self.assertEqual(drain(), 3)
+        results = list(QueuedMessage.objects.order_by("pk").values_list("status", "result"))
+        self.assertEqual([status for status, _ in results], [QueuedMessage.DONE, QueuedMessage.FAILED, QueuedMessage.DONE])
+        self.assertEqual((results[0][1]["value"], results[2][1]["value"]), (2.0, 3.0))
+        self.assertIn("Unserializable result", results[1][1]["error"])
+
+    def test_worker_survives_a_failing_batch(self):
+        pool = WorkerPool(workers=1, poll_interval=0)
+        calls = []
+
+        def drain_once(worker_id, batch_size):
+            calls.append(worker_id)
+            if len(calls) == 1:
+                raise RuntimeError("database went away")
+            pool._stop.set()
+            return 0
+
+        with mock.patch("interpreter_app.message_queue.drain", side_effect=drain_once), \
+                mock.patch("interpreter_app.message_queue.connection"), \
+                self.assertLogs("interpreter_app.message_queue", level="ERROR"):
+            pool.run_worker()
+        self.assertEqual(len(calls), 2)
@@ -0,0 +1,71 @@
+import os
+import time
+from concurrent.futures.process import BrokenProcessPool
+from django.test import TestCase
+from interpreter_app.parallel import ParallelEvaluator
+from interpreter_app.routing import routing_table
+from kpi_app.outputs import output_buffer
+from kpi_app.models import Asset, Attribute, KPI
+
+
+class ParallelEvaluatorTests(TestCase):
+    def setUp(self):
+        routing_table.clear()
+        output_buffer.clear()
+        asset = Asset.objects.create(asset_id="43", name="Test Asset")
+        Attribute.objects.create(asset=asset, attribute_id="6", kpi=KPI.objects.create(name="KPI", expression="10 / ATTR"))
+        Attribute.objects.create(asset=asset, attribute_id="7",
+                                 kpi=KPI.objects.create(name="Regex KPI", expression='Regex(ATTR, ".*dog.*")'))
+        Attribute.objects.create(asset=asset, attribute_id="8")
+        self.routed = []
+        for i in range(200):
+            attribute_id = "678"[i % 3]
+            value = "a dog" if attribute_id == "7" else str(i % 5)
+            message = {"asset_id": "43", "attribute_id": attribute_id, "timestamp": str(i), "value": value}
+            self.routed.append((routing_table.resolve("43", attribute_id), message))
+        self.evaluator = ParallelEvaluator(max_workers=2, cutoff=0)
+
+    def tearDown(self):
+        self.evaluator.shutdown()
+
+    def test_process_pool_matches_in_process_evaluation(self):
+        expected = ParallelEvaluator(cutoff=len(self.routed) + 1).evaluate(self.routed)
+        results = self.evaluator.evaluate(self.routed)
+        self.assertEqual(results, expected)
+        self.assertEqual(results[0], ({"error": "Interpreter Error: Division by zero (Equation: 10 / ATTR, "
+                                                "Context: {'ATTR': 0.0})"}, 400))
+        self.assertEqual(results[3], ({"asset_id": "43", "attribute_id": "output_6", "timestamp": "3", "value": 10 / 3},
+                                      200))
+        self.assertEqual(results[1][0]["value"], True)
+        self.assertEqual(results[2], ({"error": "No KPI linked to this attribute"}, 400))
+
+    def test_workers_are_not_forked(self):
+        self.assertIn(self.evaluator.executor._mp_context.get_start_method(), ("forkserver", "spawn"))
+
+    def test_small_batches_stay_in_process(self):
+        self.evaluator.cutoff = len(self.routed) + 1
+        self.evaluator.evaluate(self.routed)
+        self.assertIsNone(self.evaluator._executor)
+
+    def test_crashed_worker_does_not_break_later_batches(self):
+        expected = ParallelEvaluator(cutoff=len(self.routed) + 1).evaluate(self.routed)
+        crashed = self.evaluator.executor
+        with self.assertRaises(BrokenProcessPool):
+            crashed.submit(os._exit, 1).result()
+        with self.assertLogs("interpreter_app.parallel", "WARNING"):
+            self.assertEqual(self.evaluator.evaluate(self.routed), expected)
+        self.assertIsNone(self.evaluator._executor)
+        self.assertEqual(self.evaluator.evaluate(self.routed), expected)
+        self.assertIsNot(self.evaluator._executor, crashed)
+
+    def test_slow_shards_are_evaluated_in_process(self):
+        expected = ParallelEvaluator(cutoff=len(self.routed) + 1).evaluate(self.routed)
+        self.evaluator.timeout = 0.5
+        for _ in range(self.evaluator.max_workers):
+            self.evaluator.executor.submit(time.sleep, 60)
+        start = time.monotonic()
+        with self.assertLogs("interpreter_app.parallel", "WARNING"):
+            self.assertEqual(self.evaluator.evaluate(self.routed), expected)
+        self.assertLess(time.monotonic() - start, 30)
+        self.assertIsNone(self.evaluator._executor)
+
@@ -0,0 +1,85 @@
+from django.http import Http404
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from interpreter_app.routing import RoutingTable, bump_generation, routing_table
+from kpi_app.outputs import output_buffer
+from kpi_app.models import KPI, Asset, Attribute
+
+
+class RoutingTableTests(TestCase):
+    def setUp(self):
+        routing_table.clear()
+        output_buffer.clear()
+        self.kpi = KPI.objects.create(name="Test KPI", expression="ATTR * 2")
+        self.asset = Asset.objects.create(asset_id="43", name="Test Asset")
+        self.attribute = Attribute.objects.create(asset=self.asset, attribute_id="6", kpi=self.kpi)
+
+    def test_warmed_route_needs_no_queries(self):
+        # The routing generation, then the whole Linker table
+        with self.assertNumQueries(2):
+            routing_table.resolve("43", "6")
+        with self.assertNumQueries(0):
+            route = routing_table.resolve(43, "6")
+        self.assertEqual(route.program({"ATTR": 4.0}), 8)
+        self.assertEqual((routing_table.hits, routing_table.misses), (2, 0))
+
+    def test_unknown_pair_raises_not_found(self):
+        with self.assertRaisesMessage(Http404, "No Asset matches the given query."):
+            routing_table.resolve("99", "6")
+        with self.assertRaisesMessage(Http404, "No Attribute matches the given query."):
+            routing_table.resolve("43", "99")
+        self.assertEqual(routing_table.misses, 2)
+
+    def test_change_made_by_another_process_is_picked_up(self):
+        table = RoutingTable(check_interval=0)
+        self.assertEqual(table.resolve("43", "6").program({"ATTR": 4.0}), 8)
+        # Another process: no signal reaches this table, only the bumped generation
+        KPI.objects.filter(pk=self.kpi.pk).update(expression="ATTR * 5")
+        self.assertEqual(table.resolve("43", "6").program({"ATTR": 4.0}), 8)
+        bump_generation()
+        self.assertEqual(table.resolve("43", "6").program({"ATTR": 4.0}), 20)
+
+    def test_generation_is_checked_once_per_interval(self):
+        table = RoutingTable(check_interval=3600)
+        table.resolve("43", "6")
+        bump_generation()
+        with self.assertNumQueries(0):
+            table.resolve("43", "6")
+
+    def test_kpi_update_is_picked_up(self):
+        routing_table.resolve("43", "6")
+        self.kpi.expression = "ATTR * 3"
+        self.kpi.save()
+        self.assertNotIn(("43", "6"), routing_table)
+        self.assertEqual(routing_table.resolve("43", "6").program({"ATTR": 4.0}), 12)
+
+    def test_relinked_attribute_is_picked_up(self):
+        routing_table.resolve("43", "6")
+        self.attribute.kpi = None
+        self.attribute.save()
+        self.assertFalse(routing_table.resolve("43", "6").has_kpi)
+
+    def test_renamed_and_deleted_asset_drops_routes(self):
+        routing_table.resolve("43", "6")
+        self.asset.asset_id = "44"
+        self.asset.save()
+        with self.assertRaises(Http404):
+            routing_table.resolve("43", "6")
+        routing_table.resolve("44", "6")
+        self.asset.delete()
+        self.assertEqual(len(routing_table), 0)
+
+
+class IngesterStatsAPIViewTest(APITestCase):
+    def test_counters_are_reported(self):
+        routing_table.clear()
+        output_buffer.clear()
+        asset = Asset.objects.create(asset_id="43", name="Test Asset")
+        Attribute.objects.create(asset=asset, attribute_id="6", kpi=KPI.objects.create(name="KPI", expression="ATTR + 1"))
+        for _ in range(3):
+            self.client.post(reverse('message-ingester'), {"asset_id": "43", "attribute_id": "6", "value": "1"})
+        response = self.client.get(reverse('ingester-stats'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["routing_table"]["hits"], 3)
+        self.assertEqual(response.data["routing_table"]["misses"], 0)
@@ -1,9 +1,18 @@
+import json
+from unittest import mock
 from rest_framework.test import APITestCase
+from django.test import TestCase
 from django.urls import reverse
+from interpreter_app.expression_cache import expression_cache
+from interpreter_app.interpreter_engine import ClosureInterpreterFactory
+from interpreter_app.routing import routing_table
+from kpi_app.serializers import KPISerializer
+from kpi_app.outputs import output_buffer
 from kpi_app.models import Asset, Attribute, KPI
 
 class ComputeValueAPIViewTest(APITestCase):
     def setUp(self):
+        output_buffer.clear()
         self.asset = Asset.objects.create(asset_id="43", name="Test Asset")
         self.kpi = KPI.objects.create(name="Test KPI", expression="Regex(ATTR, \".*dog.*\")")
         self.attribute = Attribute.objects.create(asset=self.asset, attribute_id="6", kpi=self.kpi)
@@ -39,3 +48,195 @@ class ComputeValueAPIViewTest(APITestCase):
         })
         self.assertEqual(response.status_code, 400)
         self.assertEqual(response.data['error'], "No KPI linked to this attribute")
+
+
+class DeepExpressionIngestTest(APITestCase):
+    def setUp(self):
+        routing_table.clear()
+        output_buffer.clear()
+        expression_cache.clear()
+        self.asset = Asset.objects.create(asset_id="43", name="Test Asset")
+        self.url = reverse('message-ingester')
+
+    def test_closure_backend_evaluates_10k_deep_kpis(self):
+        expression = '(' * 10000 + 'ATTR' + ' + 1)' * 10000
+        serializer = KPISerializer(data={"name": "Deep", "expression": expression})
+        serializer.is_valid(raise_exception=True)
+        with_bytecode = serializer.save()
+        self.assertIsNotNone(with_bytecode.bytecode)
+        without_bytecode = KPI.objects.create(name="Deep, no bytecode", expression=expression)
+        Attribute.objects.create(asset=self.asset, attribute_id="6", kpi=with_bytecode)
+        Attribute.objects.create(asset=self.asset, attribute_id="7", kpi=without_bytecode)
+
+        with mock.patch.object(expression_cache, "interpreter_factory", ClosureInterpreterFactory()):
+            for attribute_id in ("6", "7"):
+                response = self.client.post(self.url, {"asset_id": "43", "attribute_id": attribute_id,
+                                                       "timestamp": "2022-07-31T23:28:47Z[UTC]", "value": 5},
+                                            format="json")
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.data["value"], 10005)
+
+
+class BatchComputeValueAPIViewTest(APITestCase):
+    def setUp(self):
+        routing_table.clear()
+        output_buffer.clear()
+        self.asset = Asset.objects.create(asset_id="43", name="Test Asset")
+        self.regex_kpi = KPI.objects.create(name="Regex KPI", expression="Regex(ATTR, \".*dog.*\")")
+        self.double_kpi = KPI.objects.create(name="Double KPI", expression="ATTR * 2")
+        Attribute.objects.create(asset=self.asset, attribute_id="6", kpi=self.regex_kpi)
+        Attribute.objects.create(asset=self.asset, attribute_id="8", kpi=self.double_kpi)
+        Attribute.objects.create(asset=self.asset, attribute_id="7")
+        self.url = reverse('message-ingester-batch')
+
+    def message(self, attribute_id, value, asset_id="43"):
+        return {"asset_id": asset_id, "attribute_id": attribute_id, "timestamp": "2022-07-31T23:28:47Z[UTC]",
+                "value": value}
+
+    def test_results_and_errors_keep_message_order(self):
+        response = self.client.post(self.url, [
+            self.message("8", "21"),
+            self.message("6", "I have a Dog"),
+            self.message("7", "Test value"),
+            self.message("6", "I have a cat", asset_id="99"),
+            self.message("99", "1"),
+            self.message("8", None),
+        ], format="json")
+        self.assertEqual(response.status_code, 200)
+        results = response.data
+        self.assertEqual(results[0], {"asset_id": "43", "attribute_id": "output_8",
+                                      "timestamp": "2022-07-31T23:28:47Z[UTC]", "value": 42})
+        self.assertEqual(results[1]["value"], True)
+        self.assertEqual(results[2], {"error": "No KPI linked to this attribute", "status": 400})
+        self.assertEqual(results[3], {"error": "No Asset matches the given query.", "status": 404})
+        self.assertEqual(results[4], {"error": "No Attribute matches the given query.", "status": 404})
+        self.assertTrue(results[5]["error"].startswith("Interpreter Error:"))
+
+    def test_pairs_are_resolved_in_one_query(self):
+        messages = [self.message(attribute_id, "1") for attribute_id in ["6", "8"] * 500]
+        # One query for the routing generation, one for every pair
+        with mock.patch.object(output_buffer, "max_size", len(messages) + 1), self.assertNumQueries(2):
+            response = self.client.post(self.url, messages, format="json")
+        self.assertEqual(len(response.data), 1000)
+        self.assertEqual(response.data[-1]["value"], 2)
+
+    def test_unserializable_result_fails_only_its_message(self):
+        Attribute.objects.create(asset=self.asset, attribute_id="9",
+                                 kpi=KPI.objects.create(name="Root", expression="ATTR ** 0.5"))
+        response = self.client.post(self.url, [self.message("9", "4"), self.message("9", "-1"), self.message("8", "1")],
+                                    format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([result.get("value") for result in response.data], [2.0, None, 2])
+        self.assertEqual(response.data[1]["status"], 400)
+        self.assertIn("Unserializable result", response.data[1]["error"])
+
+    def test_non_list_body_is_rejected(self):
+        response = self.client.post(self.url, self.message("8", "1"), format="json")
+        self.assertEqual(response.status_code, 400)
+
+
+class StreamComputeValueAPIViewTest(APITestCase):
+    def setUp(self):
+        routing_table.clear()
+        output_buffer.clear()
+        asset = Asset.objects.create(asset_id="43", name="Test Asset")
+        Attribute.objects.create(asset=asset, attribute_id="8", kpi=KPI.objects.create(name="KPI", expression="10 / ATTR"))
+        self.url = reverse('message-ingester-stream')
+
+    def post_lines(self, lines):
+        response = self.client.generic("POST", self.url, "\n".join(lines), content_type="application/x-ndjson")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return [json.loads(line) for line in b"".join(response.streaming_content).decode().splitlines()]
+
+    def test_each_line_yields_a_record_in_order(self):
+        records = self.post_lines([
+            '{"asset_id": "43", "attribute_id": "8", "timestamp": "2022-07-31T23:28:47Z[UTC]", "value": "4"}',
+            '',
+            '{"asset_id": "43", "attribute_id": "8", "value": "0"}',
+            'not json',
+            '{"asset_id": "43", "attribute_id": "99", "value": "1"}',
+            '{"asset_id": "43", "attribute_id": "8", "value": 5}',
+        ])
+        self.assertEqual(len(records), 5)
+        self.assertEqual(records[0], {"asset_id": "43", "attribute_id": "output_8",
+                                      "timestamp": "2022-07-31T23:28:47Z[UTC]", "value": 2.5})
+        self.assertEqual((records[1]["status"], records[1]["line"]), (400, 3))
+        self.assertIn("Division by zero", records[1]["error"])
+        self.assertTrue(records[2]["error"].startswith("Invalid JSON"))
+        self.assertEqual(records[3], {"error": "No Attribute matches the given query.", "status": 404, "line": 5})
+        self.assertEqual(records[4]["value"], 2.0)
+
+    def test_payload_with_an_error_field_is_still_evaluated(self):
+        records = self.post_lines([
+            '{"asset_id": "43", "attribute_id": "8", "value": "4", "error": "upstream sensor warning"}',
+        ])
+        self.assertEqual(records, [{"asset_id": "43", "attribute_id": "output_8", "timestamp": None, "value": 2.5}])
+
+    def test_unserializable_result_is_reported_on_its_line(self):
+        asset = Asset.objects.get(asset_id="43")
+        Attribute.objects.create(asset=asset, attribute_id="9", kpi=KPI.objects.create(name="Root", expression="ATTR ** 0.5"))
+        records = self.post_lines([
+            '{"asset_id": "43", "attribute_id": "9", "value": "4"}',
+            '{"asset_id": "43", "attribute_id": "9", "value": "-1"}',
+            '{"asset_id": "43", "attribute_id": "9", "value": "9"}',
+        ])
+        self.assertEqual([record.get("value") for record in records], [2.0, None, 3.0])
+        self.assertEqual((records[1]["status"], records[1]["line"]), (400, 2))
+        self.assertIn("Unserializable result", records[1]["error"])
+
+
+class AsyncComputeValueViewTest(TestCase):
+    def setUp(self):
+        routing_table.clear()
+        output_buffer.clear()
+        asset = Asset.objects.create(asset_id="43", name="Test Asset")
+        Attribute.objects.create(asset=asset, attribute_id="6", kpi=KPI.objects.create(name="KPI", expression="ATTR * 2"))
+        Attribute.objects.create(asset=asset, attribute_id="7")
+        self.url = reverse('message-ingester-async')
+
+    async def test_same_contract_as_sync_view(self):
+        response = await self.async_client.post(self.url, {
+            "asset_id": "43", "attribute_id": "6", "timestamp": "2022-07-31T23:28:47Z[UTC]", "value": "21"
+        }, content_type="application/json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"asset_id": "43", "attribute_id": "output_6",
+                                           "timestamp": "2022-07-31T23:28:47Z[UTC]", "value": 42})
+
+        response = await self.async_client.post(self.url, {"asset_id": "43", "attribute_id": "7", "value": "1"})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["error"], "No KPI linked to this attribute")
+
+        response = await self.async_client.post(self.url, {"asset_id": "99", "attribute_id": "6", "value": "1"},
+                                                content_type="application/json")
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json()["detail"], "No Asset matches the given query.")
+
+
+class FastComputeValueViewTest(TestCase):
+    def setUp(self):
+        routing_table.clear()
+        output_buffer.clear()
+        asset = Asset.objects.create(asset_id="43", name="Test Asset")
+        Attribute.objects.create(asset=asset, attribute_id="6", kpi=KPI.objects.create(name="KPI", expression="ATTR * 2"))
+        Attribute.objects.create(asset=asset, attribute_id="7")
+
+    def test_responses_match_drf_view_byte_for_byte(self):
+        requests = [
+            ({"asset_id": "43", "attribute_id": "6", "timestamp": "2022-07-31T23:28:47Z[UTC]", "value": "21"},
+             "application/json"),
+            ({"asset_id": "43", "attribute_id": "6", "value": "é"}, "application/json"),
+            ({"asset_id": "43", "attribute_id": "7", "value": "1"}, None),
+            ({"asset_id": "99", "attribute_id": "6", "value": "1"}, "application/json"),
+        ]
+        for data, content_type in requests:
+            kwargs = {"content_type": content_type} if content_type else {}
+            expected = self.client.post(reverse('message-ingester'), data, **kwargs)
+            response = self.client.post(reverse('message-ingester-fast'), data, **kwargs)
+            self.assertEqual((response.status_code, response["Content-Type"], response.content),
+                             (expected.status_code, expected["Content-Type"], expected.content))
+
+    def test_rejects_malformed_json(self):
+        response = self.client.post(reverse('message-ingester-fast'), "{", content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue(response.json()["detail"].startswith("JSON parse error"))
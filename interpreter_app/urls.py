@@ -1,8 +1,17 @@
 from django.urls import path
-from .views import ComputeValueAPIView
+from .views import (
+    AsyncComputeValueView, BatchComputeValueAPIView, ComputeValueAPIView, FastComputeValueView, IngesterStatsAPIView,
+    QueueComputeValueAPIView, StreamComputeValueAPIView,
+)
 
 urlpatterns = [
     path('Ingester/', ComputeValueAPIView.as_view(), name='message-ingester'),
+    path('Ingester/batch/', BatchComputeValueAPIView.as_view(), name='message-ingester-batch'),
+    path('Ingester/stream/', StreamComputeValueAPIView.as_view(), name='message-ingester-stream'),
+    path('Ingester/fast/', FastComputeValueView.as_view(), name='message-ingester-fast'),
+    path('Ingester/async/', AsyncComputeValueView.as_view(), name='message-ingester-async'),
+    path('Ingester/queue/', QueueComputeValueAPIView.as_view(), name='message-ingester-queue'),
+    path('Ingester/stats/', IngesterStatsAPIView.as_view(), name='ingester-stats'),
 ]
 
 
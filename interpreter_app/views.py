@@ -1,55 +1,202 @@
+import json
+
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from django.shortcuts import get_object_or_404
-from kpi_app.models import Asset, Attribute
-from interpreter_app.interpreter_engine import SimpleInterpreterFactory
+from interpreter_app.expression_cache import expression_cache
+from interpreter_app.message_queue import enqueue, queue_stats
+from interpreter_app.parallel import parallel_evaluator
+from interpreter_app.routing import check_serializable, compute_message, routing_table
 
 class ComputeValueAPIView(APIView):
     name = "Message Ingester"
     def post(self, request):
 
-        # Extracting data from the request
-        asset_id = request.data.get("asset_id")
-        attribute_id = request.data.get("attribute_id")
-        timestamp = request.data.get("timestamp")
-        value = request.data.get("value")
+        # Resolving the Asset/Attribute pair to its KPI from the in-memory routing table
+        route = routing_table.resolve(request.data.get("asset_id"), request.data.get("attribute_id"))
 
-        # Fetching the Asset and Attribute to get the KPI equation
-        asset = get_object_or_404(Asset, asset_id=asset_id)
-        attribute = get_object_or_404(Attribute, asset=asset, attribute_id=attribute_id)
+        data, status = compute_message(route, request.data)
+        return Response(data, status=status)
 
-        # Ensuring that the attribute has a linked KPI with an equation
-        if not attribute.kpi:
-            return Response({"error": "No KPI linked to this attribute"}, status=400)
 
-        equation = attribute.kpi.expression
-        equation = equation.replace("\\\"", "\"").replace("\\\\", "\\")
+class BatchComputeValueAPIView(APIView):
+    name = "Batch Message Ingester"
+    def post(self, request):
+        messages = request.data
+        if not isinstance(messages, list):
+            return Response({"error": "Expected a list of messages"}, status=400)
+
+        # Resolving every (asset_id, attribute_id) pair of the batch at once
+        keys = [
+            (message.get("asset_id"), message.get("attribute_id")) if isinstance(message, dict) else None
+            for message in messages
+        ]
+        routes = routing_table.resolve_many(key for key in keys if key is not None)
+
+        routed = []
+        results = [None] * len(messages)
+        for position, key in enumerate(keys):
+            if key is None:
+                results[position] = {"error": "Message must be an object", "status": 400}
+                continue
+            route = routes[routing_table.make_key(*key)]
+            if isinstance(route, Exception):
+                results[position] = {"error": str(route), "status": 404}
+                continue
+            routed.append((position, route))
+
+        # Evaluating grouped by KPI, across worker processes once the batch is past the cutoff
+        evaluated = parallel_evaluator.evaluate([(route, messages[position]) for position, route in routed])
+        for (position, _), result in zip(routed, evaluated):
+            # One unencodable result (e.g. a complex number) is that message's error, not a 500 for the batch
+            data, status = check_serializable(*result)
+            results[position] = data if status == 200 else {**data, "status": status}
+        return Response(results)
+
+
+def parse_lines(stream):
+    """Yields ``(line_number, message, error)`` per non-blank NDJSON line; ``error`` is an error record
+    (and ``message`` None) if the line is bad, so a message's own fields are never mistaken for one."""
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            message = json.loads(line)
+        except ValueError as e:
+            yield line_number, None, {"error": f"Invalid JSON: {e}", "status": 400}
+            continue
+        if not isinstance(message, dict):
+            yield line_number, None, {"error": "Message must be an object", "status": 400}
+            continue
+        yield line_number, message, None
+
 
+def route_messages(messages):
+    """Yields ``(line_number, message, route, error)``; ``route`` is None when ``error`` is set."""
+    for line_number, message, error in messages:
+        if error is not None:
+            yield line_number, message, None, error
+            continue
         try:
-            value = float(value)
-        except ValueError:
-            pass
+            route = routing_table.resolve(message.get("asset_id"), message.get("attribute_id"))
+        except Http404 as e:
+            yield line_number, message, None, {"error": str(e), "status": 404}
+            continue
+        yield line_number, message, route, None
 
-        context = {"ATTR": value}
 
-        interpreter_factory = SimpleInterpreterFactory()
-        lexer = interpreter_factory.create_lexer(equation)
-        parser = interpreter_factory.create_parser(lexer, context)
-        interpreter = interpreter_factory.create_interpreter(parser, context)
+def evaluate_messages(routed):
+    """Yields one output record per message, in input order."""
+    for line_number, message, route, error in routed:
+        if error is not None:
+            yield {**error, "line": line_number}
+            continue
+        # Checked here so one unencodable result is reported on its line instead of ending the stream
+        data, status = check_serializable(*compute_message(route, message))
+        yield data if status == 200 else {**data, "status": status, "line": line_number}
 
+
+def serialize_records(records):
+    for record in records:
+        yield json.dumps(record) + "\n"
+
+
+class StreamComputeValueAPIView(APIView):
+    name = "Streaming Message Ingester"
+    def post(self, request):
+        # Lines are read from the body only as the response is consumed, so memory stays flat for any upload size
+        stream = request.stream or ()
+        records = evaluate_messages(route_messages(parse_lines(stream)))
+        return StreamingHttpResponse(serialize_records(records), content_type="application/x-ndjson")
+
+
+def read_message(request):
+    """Decodes an Ingester message from a JSON or form body; returns ``(message, error_response)``."""
+    if request.content_type == "application/json":
         try:
-            computed_value = interpreter.interpret()
-        except Exception as e:
-            return Response({"error": f"Interpreter Error: {str(e)} (Equation: {equation}, Context: {context})"},
-                            status=400)
+            message = json.loads(request.body or b"{}")
+        except ValueError as e:
+            return None, JsonResponse({"detail": f"JSON parse error - {e}"}, status=400)
+        if not isinstance(message, dict):
+            return None, JsonResponse({"error": "Message must be an object"}, status=400)
+        return message, None
+    return request.POST.dict(), None
+
+
+def json_response(data, status=200):
+    # Same bytes as DRF's JSONRenderer (compact, unicode) without the renderer machinery
+    return HttpResponse(json.dumps(data, ensure_ascii=False, separators=(",", ":")),
+                        status=status, content_type="application/json")
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class FastComputeValueView(View):
+    """Ingester without DRF: same contract as ``ComputeValueAPIView``, minus content negotiation,
+    parser/renderer selection and the browsable API.
+
+    For a message this small the framework costs more than the evaluation.
+    """
+    name = "Fast Message Ingester"
+
+    def post(self, request):
+        message, error = read_message(request)
+        if error is not None:
+            return error
+
+        try:
+            route = routing_table.resolve(message.get("asset_id"), message.get("attribute_id"))
+        except Http404 as e:
+            return json_response({"detail": str(e)}, status=404)
+
+        data, status = compute_message(route, message)
+        return json_response(data, status=status)
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class AsyncComputeValueView(View):
+    """Ingester for ASGI deployments: same contract as ``ComputeValueAPIView`` without a thread per request.
+
+    Warm routes are served from memory and evaluation is pure CPU, so the
+    event loop only hands off to a thread when a route has to be loaded.
+    """
+    name = "Async Message Ingester"
+
+    async def post(self, request):
+        message, error = read_message(request)
+        if error is not None:
+            return error
+
+        try:
+            route = await routing_table.aresolve(message.get("asset_id"), message.get("attribute_id"))
+        except Http404 as e:
+            return JsonResponse({"detail": str(e)}, status=404)
+
+        data, status = compute_message(route, message)
+        return JsonResponse(data, status=status)
+
+
+class QueueComputeValueAPIView(APIView):
+    name = "Queued Message Ingester"
+    def post(self, request):
+        # Validating the message up front so only evaluable messages are acknowledged
+        route = routing_table.resolve(request.data.get("asset_id"), request.data.get("attribute_id"))
+        if not route.has_kpi:
+            return Response({"error": "No KPI linked to this attribute"}, status=400)
 
-        response_data = {
-            "asset_id": asset_id,
-            "attribute_id": f"output_{attribute_id}",
-            "timestamp": timestamp,
-            "value": computed_value
-        }
-        return Response(response_data)
+        queued = enqueue(dict(request.data.items()))
+        return Response({"id": queued.pk, "status": queued.status}, status=202)
 
+    def get(self, request):
+        return Response(queue_stats())
 
 
+class IngesterStatsAPIView(APIView):
+    name = "Ingester Stats"
+    def get(self, request):
+        return Response({
+            "routing_table": routing_table.stats(),
+            "expression_cache": expression_cache.stats(),
+        })
@@ -0,0 +1,288 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.http import HttpResponseNotAllowed
+from django.http.response import HttpResponseBadRequest
+from graphene_django.constants import MUTATION_ERRORS_FLAG
+from graphene_django.settings import graphene_settings
+from graphene_django.utils.utils import set_rollback
+from graphene_django.views import GraphQLView, HttpError
+from graphql import ExecutionResult, OperationType, execute, get_operation_ast, parse, validate_schema
+from graphql.validation import validate
+
+from kpi_app.query_cost import query_cost_analyzer
+
+
+###############################################################################
+# GRAPHQL DOCUMENT CACHE AND PERSISTED QUERIES                                #
+###############################################################################
+
+def query_hash(query):
+    """sha256 of the query text, as sent by persisted-query clients."""
+    return hashlib.sha256(query.encode()).hexdigest()
+
+
+class DocumentCache:
+    """Process-local LRU of parsed and validated GraphQL documents.
+
+    Entries are keyed by ``(schema, sha256(query), validation rules)`` and hold
+    the document with its validation errors, so a repeated query skips both
+    parsing and validation. Documents that fail to parse are not cached.
+    """
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, schema, query, validation_rules=None, max_errors=None):
+        """Returns ``(document, validation_errors)``; raises ``GraphQLSyntaxError`` for unparsable queries."""
+        key = (id(schema), query_hash(query), tuple(validation_rules or ()))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+
+        document = parse(query)
+        entry = document, validate(schema, document, validation_rules, max_errors)
+
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        return {"size": len(self._entries), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses}
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class PersistedQueries:
+    """Queries clients may send as ``extensions.persistedQuery.sha256Hash`` alone.
+
+    Queries are registered up front (``register`` or a JSON file of
+    ``{hash: query}`` / ``[query, ...]``) and kept for the life of the
+    process, or, as in Apollo's automatic persisted queries, the first time a
+    client sends a valid query with its hash (``register_automatic``). Those
+    live in an LRU of ``maxsize`` entries, so clients cannot grow it unbounded.
+    """
+
+    def __init__(self, queries=(), maxsize=1024):
+        self.maxsize = maxsize
+        self._queries = {}
+        self._automatic = OrderedDict()
+        self._lock = threading.Lock()
+        for query in queries:
+            self.register(query)
+
+    def register(self, query):
+        sha = query_hash(query)
+        with self._lock:
+            self._queries[sha] = query
+        return sha
+
+    def register_automatic(self, query):
+        sha = query_hash(query)
+        with self._lock:
+            if sha in self._queries:
+                return sha
+            self._automatic[sha] = query
+            self._automatic.move_to_end(sha)
+            while len(self._automatic) > self.maxsize:
+                self._automatic.popitem(last=False)
+        return sha
+
+    def load(self, path):
+        with open(path) as f:
+            queries = json.load(f)
+        for query in queries.values() if isinstance(queries, dict) else queries:
+            self.register(query)
+        return len(self)
+
+    def get(self, sha):
+        with self._lock:
+            query = self._queries.get(sha)
+            if query is None:
+                query = self._automatic.get(sha)
+                if query is not None:
+                    self._automatic.move_to_end(sha)
+        return query
+
+    def clear(self):
+        with self._lock:
+            self._queries.clear()
+            self._automatic.clear()
+
+    def __len__(self):
+        return len(self._queries) + len(self._automatic)
+
+    def __contains__(self, sha):
+        return sha in self._queries or sha in self._automatic
+
+
+document_cache = DocumentCache(maxsize=getattr(settings, 'KPI_GRAPHQL_DOCUMENT_CACHE_SIZE', 256))
+persisted_queries = PersistedQueries(maxsize=getattr(settings, 'KPI_GRAPHQL_PERSISTED_QUERY_CACHE_SIZE', 1024))
+if getattr(settings, 'KPI_GRAPHQL_PERSISTED_QUERIES', None):
+    persisted_queries.load(settings.KPI_GRAPHQL_PERSISTED_QUERIES)
+
+
+class CachedGraphQLView(GraphQLView):
+    """``GraphQLView`` that takes documents from ``document_cache``, accepts persisted queries and
+    enforces the ``query_cost`` depth and cost limits, reporting the cost in the response extensions.
+    """
+
+    document_cache = document_cache
+    persisted_queries = persisted_queries
+    query_cost = query_cost_analyzer
+
+    def get_graphql_params(self, request, data):
+        query, variables, operation_name, id = super().get_graphql_params(request, data)
+
+        extensions = request.GET.get("extensions") or data.get("extensions")
+        if extensions and isinstance(extensions, str):
+            try:
+                extensions = json.loads(extensions)
+            except Exception:
+                raise HttpError(HttpResponseBadRequest("Extensions are invalid JSON."))
+        persisted = extensions.get("persistedQuery") if isinstance(extensions, dict) else None
+        if not persisted:
+            return query, variables, operation_name, id
+
+        sha = persisted.get("sha256Hash")
+        if query:
+            if query_hash(query) != sha:
+                raise HttpError(HttpResponseBadRequest("provided sha does not match query"))
+            # Only documents that parse and validate are remembered; the lookup also warms the document cache
+            try:
+                _, validation_errors = self.document_cache.get(
+                    self.schema.graphql_schema, query, self.validation_rules, graphene_settings.MAX_VALIDATION_ERRORS)
+            except Exception:
+                validation_errors = True
+            if not validation_errors:
+                self.persisted_queries.register_automatic(query)
+        else:
+            query = self.persisted_queries.get(sha)
+            if query is None:
+                raise HttpError(HttpResponseBadRequest("PersistedQueryNotFound"))
+        return query, variables, operation_name, id
+
+    def execute_graphql_request(self, request, data, query, variables, operation_name, show_graphiql=False):
+        # GraphQLView.execute_graphql_request, with parse + validate served from the document cache
+        if not query:
+            if show_graphiql:
+                return None
+            raise HttpError(HttpResponseBadRequest("Must provide query string."))
+
+        schema = self.schema.graphql_schema
+
+        schema_validation_errors = validate_schema(schema)
+        if schema_validation_errors:
+            return ExecutionResult(data=None, errors=schema_validation_errors)
+
+        try:
+            document, validation_errors = self.document_cache.get(
+                schema, query, self.validation_rules, graphene_settings.MAX_VALIDATION_ERRORS)
+        except Exception as e:
+            return ExecutionResult(errors=[e])
+
+        operation_ast = get_operation_ast(document, operation_name)
+
+        if (
+            request.method.lower() == "get"
+            and operation_ast is not None
+            and operation_ast.operation != OperationType.QUERY
+        ):
+            if show_graphiql:
+                return None
+            raise HttpError(HttpResponseNotAllowed(
+                ["POST"], "Can only perform a {} operation from a POST request.".format(operation_ast.operation.value)))
+
+        if validation_errors:
+            return ExecutionResult(data=None, errors=validation_errors)
+
+        # Too deep or too expensive documents are rejected before any resolver runs
+        cost = self.query_cost.analyze(schema, document, operation_name, variables)
+        extensions = {"cost": cost.as_dict()}
+        if cost.errors:
+            return ExecutionResult(data=None, errors=cost.errors, extensions=extensions)
+
+        try:
+            execute_options = {
+                "root_value": self.get_root_value(request),
+                "context_value": self.get_context(request),
+                "variable_values": variables,
+                "operation_name": operation_name,
+                "middleware": self.get_middleware(request),
+            }
+            if self.execution_context_class:
+                execute_options["execution_context_class"] = self.execution_context_class
+
+            if (
+                operation_ast is not None
+                and operation_ast.operation == OperationType.MUTATION
+                and (
+                    graphene_settings.ATOMIC_MUTATIONS is True
+                    or connection.settings_dict.get("ATOMIC_MUTATIONS", False) is True
+                )
+            ):
+                with transaction.atomic():
+                    result = execute(schema, document, **execute_options)
+                    if getattr(request, MUTATION_ERRORS_FLAG, False) is True:
+                        transaction.set_rollback(True)
+            else:
+                result = execute(schema, document, **execute_options)
+        except Exception as e:
+            return ExecutionResult(errors=[e], extensions=extensions)
+        result.extensions = {**(result.extensions or {}), **extensions}
+        return result
+
+    def get_response(self, request, data, show_graphiql=False):
+        # GraphQLView.get_response, plus the result's extensions in the response body
+        query, variables, operation_name, id = self.get_graphql_params(request, data)
+
+        execution_result = self.execute_graphql_request(
+            request, data, query, variables, operation_name, show_graphiql)
+
+        if getattr(request, MUTATION_ERRORS_FLAG, False) is True:
+            set_rollback()
+
+        status_code = 200
+        if not execution_result:
+            return None, status_code
+
+        response = {}
+        if execution_result.errors:
+            set_rollback()
+            response["errors"] = [self.format_error(e) for e in execution_result.errors]
+
+        if execution_result.errors and any(not getattr(e, "path", None) for e in execution_result.errors):
+            status_code = 400
+        else:
+            response["data"] = execution_result.data
+
+        if execution_result.extensions:
+            response["extensions"] = execution_result.extensions
+
+        if self.batch:
+            response["id"] = id
+            response["status"] = status_code
+
+        return self.json_encode(request, response, pretty=show_graphiql), status_code
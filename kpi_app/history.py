@@ -0,0 +1,108 @@
+from datetime import datetime, timezone as dt_timezone
+
+import numpy as np
+from django.db import IntegrityError, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest, Least
+
+from kpi_app.models import KPIOutput, KPIRollup
+from kpi_app.timestamps import parse_timestamp
+
+
+###############################################################################
+# KPI OUTPUT HISTORY AND ROLLUPS                                              #
+###############################################################################
+
+RAW = 'raw'
+# Rollup resolution -> bucket width in seconds
+ROLLUP_SECONDS = {'1m': 60, '1h': 3600, '1d': 86400}
+RESOLUTIONS = (RAW, *ROLLUP_SECONDS)
+
+
+def parse_range(start, end):
+    """Parses optional ``start``/``end`` query strings (Ingester timestamp format or ISO 8601)."""
+    return tuple(None if text in (None, '') else parse_timestamp(text) for text in (start, end))
+
+
+def bucket_start(timestamp, resolution):
+    seconds = ROLLUP_SECONDS[resolution]
+    epoch = int(timestamp.timestamp())
+    return datetime.fromtimestamp(epoch - epoch % seconds, tz=dt_timezone.utc)
+
+
+def update_rollups(outputs):
+    """Folds new numeric ``KPIOutput`` instances into every rollup resolution.
+
+    Outputs are aggregated in memory first, so a flush costs one UPDATE per
+    touched bucket. The UPDATE combines with the stored aggregate in SQL,
+    which keeps concurrent flushers from overwriting each other.
+    """
+    buckets = {}
+    for output in outputs:
+        if output.value is None:
+            continue
+        for resolution in ROLLUP_SECONDS:
+            key = (output.asset_id, output.attribute_id, resolution, bucket_start(output.timestamp, resolution))
+            aggregate = buckets.get(key)
+            if aggregate is None:
+                buckets[key] = [1, output.value, output.value, output.value]
+            else:
+                aggregate[0] += 1
+                aggregate[1] += output.value
+                aggregate[2] = min(aggregate[2], output.value)
+                aggregate[3] = max(aggregate[3], output.value)
+
+    for (asset_pk, attribute_pk, resolution, bucket), (count, total, low, high) in buckets.items():
+        rollup = KPIRollup.objects.filter(attribute_id=attribute_pk, resolution=resolution, bucket=bucket)
+        changes = dict(count=F('count') + count, sum=F('sum') + total,
+                       min=Least('min', Value(low)), max=Greatest('max', Value(high)))
+        if rollup.update(**changes):
+            continue
+        try:
+            with transaction.atomic():
+                KPIRollup.objects.create(asset_id=asset_pk, attribute_id=attribute_pk, resolution=resolution,
+                                         bucket=bucket, count=count, sum=total, min=low, max=high)
+        except IntegrityError:
+            # Another writer created the bucket first
+            rollup.update(**changes)
+    return len(buckets)
+
+
+def attribute_history(attribute, resolution=RAW, start=None, end=None, segment_store=None):
+    """Returns ``{timestamp, min, max, avg, count}`` points for ``start <= timestamp < end``.
+
+    Rollup resolutions read the precomputed buckets; ``raw`` reads the outputs
+    themselves (from ``segment_store`` when outputs are kept there), as
+    single-value points.
+    """
+    if resolution not in RESOLUTIONS:
+        raise ValueError(f"Invalid resolution '{resolution}', expected one of: {', '.join(RESOLUTIONS)}")
+
+    if resolution != RAW:
+        rollups = KPIRollup.objects.filter(attribute=attribute, resolution=resolution)
+        if start is not None:
+            rollups = rollups.filter(bucket__gte=bucket_start(start, resolution))
+        if end is not None:
+            rollups = rollups.filter(bucket__lt=end)
+        return [
+            {"timestamp": bucket, "min": low, "max": high, "avg": total / count, "count": count}
+            for bucket, low, high, total, count in rollups.order_by('bucket').values_list(
+                'bucket', 'min', 'max', 'sum', 'count')
+        ]
+
+    if segment_store is not None:
+        timestamps, values = segment_store.scan(
+            attribute.asset_id, attribute.pk,
+            start=None if start is None else start.astimezone(dt_timezone.utc).replace(tzinfo=None),
+            end=None if end is None else end.astimezone(dt_timezone.utc).replace(tzinfo=None))
+        points = zip(timestamps.astype('datetime64[us]').tolist(), np.asarray(values).tolist())
+        points = ((timestamp.replace(tzinfo=dt_timezone.utc), value) for timestamp, value in points)
+    else:
+        outputs = KPIOutput.objects.filter(attribute=attribute, value__isnull=False)
+        if start is not None:
+            outputs = outputs.filter(timestamp__gte=start)
+        if end is not None:
+            outputs = outputs.filter(timestamp__lt=end)
+        points = outputs.order_by('timestamp', 'pk').values_list('timestamp', 'value')
+    return [{"timestamp": timestamp, "min": value, "max": value, "avg": value, "count": 1}
+            for timestamp, value in points]
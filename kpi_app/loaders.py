@@ -0,0 +1,95 @@
+from kpi_app.models import KPI, Asset, Attribute
+
+
+###############################################################################
+# GRAPHQL DATALOADERS                                                         #
+###############################################################################
+
+class DataLoader:
+    """Per-request batching cache in front of ``batch_load(keys) -> {key: value}``.
+
+    The schema executes synchronously, one list item at a time, so a loader
+    cannot wait for sibling fields to ask for their keys. Instead, whoever
+    materializes a list of parents announces the keys its children will need
+    with ``expect``; the first ``load`` then fetches every announced key in
+    one query. Keys are deduplicated and each is fetched at most once.
+    """
+
+    def __init__(self, batch_load, default=None):
+        self.batch_load = batch_load
+        self.default = default
+        self._cache = {}
+        self._queue = set()
+        self.batches = 0
+
+    def expect(self, keys):
+        self._queue.update(key for key in keys if key is not None and key not in self._cache)
+
+    def prime(self, key, value):
+        self._cache.setdefault(key, value)
+        self._queue.discard(key)
+
+    def load(self, key):
+        if key is None:
+            return self.default
+        if key not in self._cache:
+            self._queue.add(key)
+            self.dispatch()
+        return self._cache[key]
+
+    def dispatch(self):
+        keys, self._queue = self._queue, set()
+        if not keys:
+            return
+        self.batches += 1
+        loaded = self.batch_load(keys)
+        for key in keys:
+            self._cache[key] = loaded.get(key, self.default)
+
+
+class Loaders:
+    """The DataLoaders of one GraphQL request; loading a batch announces the keys its children will need."""
+
+    def __init__(self):
+        self.asset = DataLoader(self.load_assets)
+        self.kpi = DataLoader(self.load_kpis)
+        # Asset pk -> its Linkers
+        self.attributes = DataLoader(self.load_attributes, default=())
+
+    def load_assets(self, keys):
+        assets = Asset.objects.in_bulk(keys)
+        self.expect_assets(assets.values())
+        return assets
+
+    def load_kpis(self, keys):
+        return KPI.objects.in_bulk(keys)
+
+    def load_attributes(self, keys):
+        attributes = {}
+        linkers = list(Attribute.objects.filter(asset_id__in=keys).order_by('pk'))
+        for linker in linkers:
+            attributes.setdefault(linker.asset_id, []).append(linker)
+        self.expect_linkers(linkers)
+        return attributes
+
+    def expect_assets(self, assets):
+        for asset in assets:
+            self.asset.prime(asset.pk, asset)
+        self.attributes.expect(asset.pk for asset in assets)
+
+    def expect_linkers(self, linkers):
+        self.asset.expect(linker.asset_id for linker in linkers)
+        self.kpi.expect(linker.kpi_id for linker in linkers)
+
+
+def get_loaders(info):
+    """Returns the loaders of the current request, kept on ``info.context`` (the HttpRequest under GraphQLView)."""
+    loaders = getattr(info.context, 'kpi_loaders', None)
+    if loaders is None:
+        loaders = Loaders()
+        try:
+            info.context.kpi_loaders = loaders
+        except AttributeError:
+            # No context object to keep them on: loaders last for this one field
+            pass
+    return loaders
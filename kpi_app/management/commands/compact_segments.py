@@ -0,0 +1,20 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from kpi_app.segment_store import segment_store
+
+
+class Command(BaseCommand):
+    help = "Merges small KPI output segments, once or every --interval seconds"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, help="Keep running and compact every INTERVAL seconds")
+
+    def handle(self, *args, **options):
+        while True:
+            merged = segment_store.compact_all()
+            self.stdout.write(f"Merged {merged} segments in {segment_store.root}")
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
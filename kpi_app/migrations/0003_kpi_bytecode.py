@@ -0,0 +1,35 @@
+# Generated by Django 5.1.2 on 2026-10-18 12:44
+
+from django.db import migrations, models
+
+
+def compile_existing_kpis(apps, schema_editor):
+    # A frozen copy of the serializer's compile step at the time of this migration; the
+    # bytecode is only a cache, so an expression that fails to compile keeps none and the
+    # Ingester compiles it from its text as before
+    from interpreter_app.interpreter_engine import IterativeInterpreterFactory, unescape_expression
+
+    KPI = apps.get_model('kpi_app', 'KPI')
+    factory = IterativeInterpreterFactory()
+    for kpi in KPI.objects.all():
+        try:
+            kpi.bytecode = factory.compile_bytecode(unescape_expression(kpi.expression)).dumps()
+        except Exception:
+            continue
+        kpi.save(update_fields=['bytecode'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kpi_app', '0002_alter_attribute_kpi'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='kpi',
+            name='bytecode',
+            field=models.TextField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(compile_existing_kpis, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.2 on 2026-10-18 13:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kpi_app', '0003_kpi_bytecode'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='KPIOutput',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('timestamp', models.DateTimeField()),
+                ('value', models.FloatField(blank=True, null=True)),
+                ('text_value', models.TextField(blank=True, null=True)),
+                ('asset', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='outputs', to='kpi_app.asset')),
+                ('attribute', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='outputs', to='kpi_app.attribute')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['attribute', 'timestamp'], name='kpi_app_kpi_attribu_9092b9_idx'), models.Index(fields=['asset', 'timestamp'], name='kpi_app_kpi_asset_i_51deac_idx')],
+            },
+        ),
+    ]
@@ -4,6 +4,8 @@ class KPI(models.Model):
     name = models.CharField(max_length=100)
     expression = models.TextField()
     description = models.TextField(blank=True, null=True)
+    # Postfix program compiled from `expression`, filled by KPISerializer
+    bytecode = models.TextField(blank=True, null=True, editable=False)
 
     def __str__(self):
         return self.name
@@ -23,3 +25,45 @@ class Attribute(models.Model):
 
     def __str__(self):
         return f"{self.asset.asset_id} - {self.attribute_id}"
+
+class KPIOutput(models.Model):
+    asset = models.ForeignKey(Asset, on_delete=models.CASCADE, related_name='outputs')
+    attribute = models.ForeignKey(Attribute, on_delete=models.CASCADE, related_name='outputs')
+    timestamp = models.DateTimeField()
+    # Numeric results (Regex booleans as 0/1); anything else is kept in text_value
+    value = models.FloatField(blank=True, null=True)
+    text_value = models.TextField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['attribute', 'timestamp']),
+            models.Index(fields=['asset', 'timestamp']),
+        ]
+
+    def __str__(self):
+        return f"{self.attribute} @ {self.timestamp}"
+
+class KPIRollup(models.Model):
+    RESOLUTION_CHOICES = [
+        ('1m', '1 minute'),
+        ('1h', '1 hour'),
+        ('1d', '1 day'),
+    ]
+
+    asset = models.ForeignKey(Asset, on_delete=models.CASCADE, related_name='rollups')
+    attribute = models.ForeignKey(Attribute, on_delete=models.CASCADE, related_name='rollups')
+    resolution = models.CharField(max_length=2, choices=RESOLUTION_CHOICES)
+    # Start of the bucket, in UTC
+    bucket = models.DateTimeField()
+    count = models.BigIntegerField(default=0)
+    sum = models.FloatField(default=0)
+    min = models.FloatField()
+    max = models.FloatField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['attribute', 'resolution', 'bucket'], name='unique_kpi_rollup_bucket'),
+        ]
+
+    def __str__(self):
+        return f"{self.attribute} {self.resolution} @ {self.bucket}"
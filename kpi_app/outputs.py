@@ -0,0 +1,163 @@
+import asyncio
+import logging
+import threading
+import time
+from datetime import timezone as dt_timezone
+
+import numpy as np
+
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from django.utils import timezone
+
+from kpi_app.history import update_rollups
+from kpi_app.models import Attribute, KPIOutput
+from kpi_app.segment_store import segment_store
+from kpi_app.timestamps import parse_timestamp
+
+
+logger = logging.getLogger(__name__)
+
+
+###############################################################################
+# KPI OUTPUT WRITE-BEHIND BUFFER                                              #
+###############################################################################
+
+def _in_event_loop():
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+class OutputBuffer:
+    """Collects computed KPI values and writes them with one ``bulk_create`` per flush.
+
+    Each flush also folds the numeric outputs into the 1m/1h/1d rollups.
+
+    A flush happens once ``max_size`` outputs are pending or the oldest has
+    waited ``max_age`` seconds, checked on every ``add`` and at the end of every
+    request. Outputs still buffered when the process dies are lost, which is
+    the price of not writing one row per message.
+
+    With a ``segment_store`` numeric outputs are appended there, one segment
+    per (asset, attribute) per flush, and only text outputs become ORM rows.
+    A disabled buffer drops every output, e.g. while benchmarks run against a
+    real database.
+    """
+
+    def __init__(self, max_size=500, max_age=5.0, segment_store=None, enabled=True):
+        self.max_size = max_size
+        self.max_age = max_age
+        self.segment_store = segment_store
+        self.enabled = enabled
+        self._pending = []
+        self._oldest = None
+        self._lock = threading.Lock()
+        self.flushed = 0
+
+    @staticmethod
+    def make_output(asset_pk, attribute_pk, timestamp, computed_value):
+        try:
+            instant = parse_timestamp(timestamp)
+        except (TypeError, ValueError):
+            instant = timezone.now()
+        if isinstance(computed_value, (bool, int, float)):
+            return KPIOutput(asset_id=asset_pk, attribute_id=attribute_pk, timestamp=instant,
+                             value=float(computed_value))
+        return KPIOutput(asset_id=asset_pk, attribute_id=attribute_pk, timestamp=instant,
+                         text_value=str(computed_value))
+
+    def add(self, asset_pk, attribute_pk, timestamp, computed_value):
+        if not self.enabled:
+            return
+        output = self.make_output(asset_pk, attribute_pk, timestamp, computed_value)
+        with self._lock:
+            if not self._pending:
+                self._oldest = time.monotonic()
+            self._pending.append(output)
+        # Async views leave the write to the end of the request, outside the event loop
+        if not _in_event_loop():
+            self.flush_if_due()
+
+    def is_due(self):
+        return bool(self._pending) and (
+            len(self._pending) >= self.max_size or time.monotonic() - self._oldest >= self.max_age)
+
+    def flush_if_due(self):
+        if self.is_due():
+            self.flush()
+
+    def flush(self):
+        """Writes every pending output; returns how many rows were inserted.
+
+        Flushes run inside whatever request happened to trigger them, so a
+        failed write never raises. Outputs of Linkers deleted since they were
+        buffered are dropped and the rest retried; if that fails too, the
+        outputs go back to the buffer for the next flush.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, []
+        if not pending:
+            return 0
+        try:
+            self.write_rows(pending)
+        except DatabaseError:
+            logger.exception("Writing %d KPI outputs failed; retrying without deleted Linkers", len(pending))
+            existing = set(Attribute.objects.filter(pk__in={output.attribute_id for output in pending})
+                           .values_list('pk', flat=True))
+            pending = [output for output in pending if output.attribute_id in existing]
+            for output in pending:
+                # bulk_create may have assigned primary keys before the rollback
+                output.pk = None
+            try:
+                self.write_rows(pending)
+            except DatabaseError:
+                logger.exception("Writing %d KPI outputs failed again; keeping them for the next flush",
+                                 len(pending))
+                with self._lock:
+                    if not self._pending:
+                        self._oldest = time.monotonic()
+                    self._pending = pending + self._pending
+                return 0
+        # Segments are only written once the rows and rollups are in, so a retried output is never appended twice
+        if self.segment_store is not None:
+            self.write_segments([output for output in pending if output.value is not None])
+        self.flushed += len(pending)
+        return len(pending)
+
+    def write_rows(self, outputs):
+        """Inserts the ORM rows (only text outputs with a ``segment_store``) and updates the rollups, atomically."""
+        rows = outputs if self.segment_store is None else [output for output in outputs if output.value is None]
+        with transaction.atomic():
+            if rows:
+                KPIOutput.objects.bulk_create(rows, batch_size=self.max_size)
+            update_rollups(outputs)
+
+    def write_segments(self, outputs):
+        series = {}
+        for output in outputs:
+            series.setdefault((output.asset_id, output.attribute_id), []).append(output)
+        for (asset_pk, attribute_pk), outputs in series.items():
+            # Segments store naive UTC microseconds
+            timestamps = np.array([output.timestamp.astimezone(dt_timezone.utc).replace(tzinfo=None)
+                                   for output in outputs], dtype='datetime64[us]')
+            values = np.array([output.value for output in outputs], dtype=np.float64)
+            self.segment_store.append(asset_pk, attribute_pk, timestamps, values)
+
+    def clear(self):
+        with self._lock:
+            self._pending = []
+            self.flushed = 0
+
+    def __len__(self):
+        return len(self._pending)
+
+
+output_buffer = OutputBuffer(
+    max_size=getattr(settings, 'KPI_OUTPUT_BUFFER_SIZE', 500),
+    max_age=getattr(settings, 'KPI_OUTPUT_BUFFER_MAX_AGE', 5.0),
+    segment_store=segment_store if getattr(settings, 'KPI_OUTPUT_BACKEND', 'orm') == 'segments' else None,
+    enabled=getattr(settings, 'KPI_RECORD_OUTPUTS', True),
+)
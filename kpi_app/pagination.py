@@ -0,0 +1,64 @@
+import base64
+
+from django.conf import settings
+from graphene import relay
+from rest_framework.pagination import CursorPagination
+
+
+###############################################################################
+# KEYSET PAGINATION                                                           #
+###############################################################################
+
+# Both APIs page on the primary key: its index makes page N cost the same as
+# page 1 (``WHERE id > last_seen ORDER BY id LIMIT n``), where OFFSET would
+# scan and discard every earlier row.
+PAGE_SIZE = getattr(settings, 'KPI_PAGE_SIZE', 100)
+MAX_PAGE_SIZE = getattr(settings, 'KPI_MAX_PAGE_SIZE', 1000)
+
+
+class KeysetPagination(CursorPagination):
+    """REST list pagination: ``?cursor=...&page_size=...``, returning ``{next, previous, results}``."""
+
+    ordering = 'pk'
+    page_size = PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = MAX_PAGE_SIZE
+
+
+def encode_cursor(pk):
+    return base64.urlsafe_b64encode(f"pk:{pk}".encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        prefix, pk = base64.urlsafe_b64decode(cursor.encode()).decode().split(":")
+        if prefix != "pk":
+            raise ValueError(prefix)
+        return int(pk)
+    except (ValueError, UnicodeDecodeError):
+        raise Exception(f"Invalid cursor: {cursor}")
+
+
+def keyset_page(queryset, first=None, after=None):
+    """Returns ``(nodes, has_next_page)`` for the ``first`` rows with a pk greater than the ``after`` cursor."""
+    first = PAGE_SIZE if first is None else first
+    if not 0 <= first <= MAX_PAGE_SIZE:
+        raise Exception(f"first must be between 0 and {MAX_PAGE_SIZE}")
+    if after is not None:
+        queryset = queryset.filter(pk__gt=decode_cursor(after))
+    # One extra row tells whether another page follows
+    nodes = list(queryset.order_by('pk')[:first + 1])
+    return nodes[:first], len(nodes) > first
+
+
+def make_connection(connection_type, nodes, has_next_page, after=None):
+    edges = [connection_type.Edge(node=node, cursor=encode_cursor(node.pk)) for node in nodes]
+    return connection_type(
+        edges=edges,
+        page_info=relay.PageInfo(
+            start_cursor=edges[0].cursor if edges else None,
+            end_cursor=edges[-1].cursor if edges else None,
+            has_next_page=has_next_page,
+            has_previous_page=after is not None,
+        ),
+    )
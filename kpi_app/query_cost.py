@@ -0,0 +1,146 @@
+from graphql import (
+    FieldNode, FragmentDefinitionNode, FragmentSpreadNode, GraphQLError, InlineFragmentNode, OperationType,
+    get_named_type, get_nullable_type, get_operation_ast, is_composite_type, is_list_type,
+)
+from graphql.execution.values import get_argument_values
+
+from django.conf import settings
+
+
+###############################################################################
+# GRAPHQL QUERY DEPTH AND COST LIMITS                                         #
+###############################################################################
+
+class QueryCost:
+    def __init__(self, depth, cost, max_depth, max_cost):
+        self.depth = depth
+        self.cost = cost
+        self.max_depth = max_depth
+        self.max_cost = max_cost
+
+    @property
+    def errors(self):
+        errors = []
+        if self.max_depth is not None and self.depth > self.max_depth:
+            errors.append(GraphQLError(f"Query depth {self.depth} exceeds the maximum depth of {self.max_depth}"))
+        if self.max_cost is not None and self.cost > self.max_cost:
+            errors.append(GraphQLError(f"Query cost {self.cost} exceeds the maximum cost of {self.max_cost}"))
+        return errors
+
+    def as_dict(self):
+        return {"depth": self.depth, "cost": self.cost, "maxDepth": self.max_depth, "maxCost": self.max_cost}
+
+
+def is_connection_type(type_):
+    fields = getattr(type_, 'fields', {})
+    return 'edges' in fields and 'pageInfo' in fields
+
+
+class QueryCostAnalyzer:
+    """Static depth and cost of a validated document, computed before anything executes.
+
+    Every object field costs its weight (1 unless overridden in
+    ``field_weights`` as ``"Type.field"``; scalars cost 0) times the number of
+    times it would be resolved. A list field multiplies everything below it by
+    its ``first``/``last`` argument when given, otherwise by ``list_size``, so a
+    cyclic ``attributes { asset { attributes ... } }`` query grows
+    exponentially in cost just as it would in work. For a Relay connection the
+    page size comes from the connection field's arguments and multiplies its
+    ``edges``. Introspection fields are free and do not count towards depth.
+    """
+
+    def __init__(self, max_depth=10, max_cost=50000, list_size=100, field_weights=None):
+        self.max_depth = max_depth
+        self.max_cost = max_cost
+        self.list_size = list_size
+        self.field_weights = field_weights or {}
+
+    def analyze(self, schema, document, operation_name=None, variables=None):
+        operation = get_operation_ast(document, operation_name)
+        if operation is None:
+            return QueryCost(0, 0, self.max_depth, self.max_cost)
+        root_type = {
+            OperationType.QUERY: schema.query_type,
+            OperationType.MUTATION: schema.mutation_type,
+            OperationType.SUBSCRIPTION: schema.subscription_type,
+        }[operation.operation]
+        fragments = {definition.name.value: definition for definition in document.definitions
+                     if isinstance(definition, FragmentDefinitionNode)}
+        depth, cost = self.measure(schema, root_type, operation.selection_set, fragments, variables or {}, 1, (), {})
+        return QueryCost(depth, cost, self.max_depth, self.max_cost)
+
+    def page_size(self, field, node, variables):
+        try:
+            arguments = get_argument_values(field, node, variables)
+        except Exception:
+            arguments = {}
+        for name in ('first', 'last'):
+            if isinstance(arguments.get(name), int):
+                return max(arguments[name], 0)
+        return self.list_size
+
+    def multiplier(self, field, node, variables, page_size=None):
+        if not is_list_type(get_nullable_type(field.type)):
+            return 1
+        return self.page_size(field, node, variables) if page_size is None else page_size
+
+    def measure(self, schema, parent_type, selection_set, fragments, variables, multiplier, spreads, memo,
+                page_size=None, visited=None):
+        """Returns ``(depth, cost)`` of ``selection_set`` resolved ``multiplier`` times.
+
+        ``page_size`` is the size of the connection ``parent_type`` belongs to, if any. Like
+        graphql-core's ``collect_fields``, a fragment is spread at most once per selection set
+        (``visited`` is shared with the inline fragments and spreads merged into it), and each
+        fragment is walked once per document: cost is linear in ``multiplier``, so ``memo`` keeps
+        its ``(depth, cost)`` at a multiplier of 1 and scales it.
+        """
+        visited = set() if visited is None else visited
+        depth = cost = 0
+        fields = getattr(parent_type, 'fields', {})
+        for selection in selection_set.selections:
+            if isinstance(selection, FieldNode):
+                name = selection.name.value
+                if name.startswith('__') or name not in fields:
+                    continue
+                field = fields[name]
+                field_type = get_named_type(field.type)
+                weight = self.field_weights.get(f"{parent_type.name}.{name}", 1 if is_composite_type(field_type) else 0)
+                cost += multiplier * weight
+                child_depth = 0
+                if selection.selection_set is not None:
+                    child_depth, child_cost = self.measure(
+                        schema, field_type, selection.selection_set, fragments, variables,
+                        multiplier * self.multiplier(field, selection, variables, page_size), spreads, memo,
+                        self.page_size(field, selection, variables) if is_connection_type(field_type) else None)
+                    cost += child_cost
+                depth = max(depth, 1 + child_depth)
+            elif isinstance(selection, InlineFragmentNode):
+                fragment_type = (schema.get_type(selection.type_condition.name.value)
+                                 if selection.type_condition else parent_type)
+                child_depth, child_cost = self.measure(
+                    schema, fragment_type, selection.selection_set, fragments, variables, multiplier, spreads, memo,
+                    page_size, visited)
+                depth, cost = max(depth, child_depth), cost + child_cost
+            elif isinstance(selection, FragmentSpreadNode):
+                name = selection.name.value
+                # Validation already rejects fragment cycles; this only guards the walk itself
+                if name in spreads or name in visited or name not in fragments:
+                    continue
+                visited.add(name)
+                key = (name, page_size)
+                if key not in memo:
+                    fragment = fragments[name]
+                    memo[key] = self.measure(
+                        schema, schema.get_type(fragment.type_condition.name.value), fragment.selection_set,
+                        fragments, variables, 1, spreads + (name,), memo, page_size, {name})
+                child_depth, unit_cost = memo[key]
+                depth, cost = max(depth, child_depth), cost + multiplier * unit_cost
+        return depth, cost
+
+
+query_cost_analyzer = QueryCostAnalyzer(
+    max_depth=getattr(settings, 'KPI_GRAPHQL_MAX_DEPTH', 10),
+    max_cost=getattr(settings, 'KPI_GRAPHQL_MAX_COST', 50000),
+    list_size=getattr(settings, 'KPI_GRAPHQL_LIST_SIZE', 100),
+    field_weights=getattr(settings, 'KPI_GRAPHQL_FIELD_WEIGHTS', None),
+)
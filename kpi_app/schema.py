@@ -1,74 +1,139 @@
 import graphene
-from graphene import ObjectType, Mutation, Field, List, Int, String, Float
-import requests
+from graphene import ObjectType, Mutation, Field, List, Int, String, Float, relay
+from django.http import Http404
+from graphene_django import DjangoObjectType
+from interpreter_app.routing import compute_message, routing_table
+from kpi_app.history import RAW, attribute_history, parse_range
+from kpi_app.loaders import get_loaders
+from kpi_app.models import KPI, Asset, Attribute
+from kpi_app.outputs import output_buffer
+from kpi_app.pagination import keyset_page, make_connection
+from kpi_app.serializers import KPISerializer, AssetSerializer, AttributeSerializer
+
+# Resolvers and mutations work on the models in-process; ids stay Int and
+# relations stay nullable so the API matches the REST-backed schema it replaces.
 
 # Define the KPI Type
-class KPIType(graphene.ObjectType):
+class KPIType(DjangoObjectType):
     id = Int()
     name = String()
     expression = String()
     description = String()
 
+    class Meta:
+        model = KPI
+        fields = ('id', 'name', 'expression', 'description')
+
 class IngesterType(graphene.ObjectType):
     asset_id = String()
     attribute_id = String()
     timestamp = String()
     value = Float()
 
-class LinkerType(graphene.ObjectType):
+class LinkerType(DjangoObjectType):
     id = Int()
     asset = Field(lambda: AssetType)
     attribute_id = String()
     kpi = Field(KPIType)
 
+    class Meta:
+        model = Attribute
+        fields = ('id', 'asset', 'attribute_id', 'kpi')
+
     def resolve_asset(self, info):
-        # Fetch the asset data by ID from the linker dictionary
-        asset_id = self.get("asset")
-        if asset_id:
-            response = requests.get(f"http://127.0.0.1:8000/api/Assets/{asset_id}/")
-            if response.status_code == 200:
-                return response.json()
-        return None
+        return get_loaders(info).asset.load(self.asset_id)
 
     def resolve_kpi(self, info):
-        # Fetch the KPI data by ID from the linker dictionary
-        kpi_id = self.get("kpi")
-        if kpi_id:
-            response = requests.get(f"http://127.0.0.1:8000/api/KPIs/{kpi_id}/")
-            if response.status_code == 200:
-                return response.json()
-        return None
+        return get_loaders(info).kpi.load(self.kpi_id)
+
+
+class HistoryPointType(graphene.ObjectType):
+    timestamp = graphene.DateTime()
+    min = Float()
+    max = Float()
+    avg = Float()
+    count = Int()
 
 
 # Define the Asset Type
-class AssetType(graphene.ObjectType):
+class AssetType(DjangoObjectType):
     id = Int()
     asset_id = String()
     name = String()
     attributes = List(LinkerType)
 
+    class Meta:
+        model = Asset
+        fields = ('id', 'asset_id', 'name', 'attributes')
+
+    def resolve_attributes(self, info):
+        return get_loaders(info).attributes.load(self.pk)
+
+# Relay connections: pages of `first` nodes after the `after` cursor, in pk order
+class KPIConnection(relay.Connection):
+    class Meta:
+        node = KPIType
+
+class AssetConnection(relay.Connection):
+    class Meta:
+        node = AssetType
+
+class LinkerConnection(relay.Connection):
+    class Meta:
+        node = LinkerType
+
 # Queries for listing KPIs, Assets, and Linkers
 class Query(ObjectType):
     # KPIs Query
-    all_kpis = List(KPIType)
+    all_kpis = Field(KPIConnection, first=Int(), after=String())
 
-    def resolve_all_kpis(root, info):
-        response = requests.get("http://127.0.0.1:8000/api/KPIs/")
-        return response.json()
+    def resolve_all_kpis(root, info, first=None, after=None):
+        kpis, has_next_page = keyset_page(KPI.objects.all(), first, after)
+        return make_connection(KPIConnection, kpis, has_next_page, after)
 
     # Assets Query
-    all_assets = List(AssetType)
+    all_assets = Field(AssetConnection, first=Int(), after=String())
 
-    def resolve_all_assets(root, info):
-        response = requests.get("http://127.0.0.1:8000/api/Assets/")
-        return response.json()
+    def resolve_all_assets(root, info, first=None, after=None):
+        assets, has_next_page = keyset_page(Asset.objects.all(), first, after)
+        get_loaders(info).expect_assets(assets)
+        return make_connection(AssetConnection, assets, has_next_page, after)
 
     # Linker Query
-    all_linkers = List(LinkerType)
-
-    def resolve_all_linkers(root, info):
-        response = requests.get("http://127.0.0.1:8000/api/Linker/")
-        return response.json()
+    all_linkers = Field(LinkerConnection, first=Int(), after=String())
+
+    def resolve_all_linkers(root, info, first=None, after=None):
+        linkers, has_next_page = keyset_page(Attribute.objects.all(), first, after)
+        get_loaders(info).expect_linkers(linkers)
+        return make_connection(LinkerConnection, linkers, has_next_page, after)
+
+    # KPI output history of one Linker, read from the rollups in-process
+    attribute_history = List(HistoryPointType, id=Int(required=True), resolution=String(default_value=RAW),
+                             start=String(), end=String())
+
+    def resolve_attribute_history(root, info, id, resolution=RAW, start=None, end=None):
+        try:
+            attribute = Attribute.objects.get(pk=id)
+        except Attribute.DoesNotExist:
+            raise Exception(f"Linker {id} not found")
+        return attribute_history(attribute, resolution, *parse_range(start, end),
+                                 segment_store=output_buffer.segment_store)
+
+def get_instance(model, id, failure):
+    try:
+        return model.objects.get(pk=id)
+    except model.DoesNotExist:
+        raise Exception(f"{failure}: No {model._meta.object_name} matches the given query.")
+
+def save(serializer, failure):
+    # Same validation (and KPI bytecode compilation) as the REST endpoints
+    if not serializer.is_valid():
+        raise Exception(f"{failure}: {serializer.errors}")
+    return serializer.save()
+
+def provided(**fields):
+    # Arguments left out (or empty) keep their stored value, as before
+    return {name: value for name, value in fields.items() if value}
 
 # Mutations for KPIs
 class CreateKPI(Mutation):
@@ -85,11 +150,7 @@ class CreateKPI(Mutation):
             "expression": expression,
             "description": description,
         }
-        response = requests.post("http://127.0.0.1:8000/api/KPIs/", json=payload)
-        if response.status_code == 201:
-            return CreateKPI(kpi=response.json())
-        else:
-            raise Exception("Failed to create KPI")
+        return CreateKPI(kpi=save(KPISerializer(data=payload), "Failed to create KPI"))
 
 class UpdateKPI(Mutation):
     class Arguments:
@@ -101,17 +162,9 @@ class UpdateKPI(Mutation):
     kpi = Field(KPIType)
 
     def mutate(root, info, id, name=None, expression=None, description=None):
-        existing_kpi = requests.get(f"http://127.0.0.1:8000/api/KPIs/{id}/").json()
-        payload = {
-            "name": name if name else existing_kpi.get("name"),
-            "expression": expression if expression else existing_kpi.get("expression"),
-            "description": description if description else existing_kpi.get("description"),
-        }
-        response = requests.put(f"http://127.0.0.1:8000/api/KPIs/{id}/", json=payload)
-        if response.status_code == 200:
-            return UpdateKPI(kpi=response.json())
-        else:
-            raise Exception(f"Failed to update KPI: {response.json().get('detail', 'Unknown error')}")
+        existing_kpi = get_instance(KPI, id, "Failed to update KPI")
+        payload = provided(name=name, expression=expression, description=description)
+        return UpdateKPI(kpi=save(KPISerializer(existing_kpi, data=payload, partial=True), "Failed to update KPI"))
 
 class DeleteKPI(Mutation):
     class Arguments:
@@ -120,11 +173,8 @@ class DeleteKPI(Mutation):
     success = String()
 
     def mutate(root, info, id):
-        response = requests.delete(f"http://127.0.0.1:8000/api/KPIs/{id}/")
-        if response.status_code == 204:
-            return DeleteKPI(success="KPI deleted successfully")
-        else:
-            raise Exception("Failed to delete KPI")
+        get_instance(KPI, id, "Failed to delete KPI").delete()
+        return DeleteKPI(success="KPI deleted successfully")
 
 # Mutations for Assets
 class CreateAsset(Mutation):
@@ -139,11 +189,7 @@ class CreateAsset(Mutation):
             "asset_id": asset_id,
             "name": name,
         }
-        response = requests.post("http://127.0.0.1:8000/api/Assets/", json=payload)
-        if response.status_code == 201:
-            return CreateAsset(asset=response.json())
-        else:
-            raise Exception(f"Failed to create asset: {response.json().get('detail', 'Unknown error')}")
+        return CreateAsset(asset=save(AssetSerializer(data=payload), "Failed to create asset"))
 
 class UpdateAsset(Mutation):
     class Arguments:
@@ -154,16 +200,10 @@ class UpdateAsset(Mutation):
     asset = Field(AssetType)
 
     def mutate(root, info, id, asset_id=None, name=None):
-        existing_asset = requests.get(f"http://127.0.0.1:8000/api/Assets/{id}/").json()
-        payload = {
-            "asset_id": asset_id if asset_id else existing_asset.get("asset_id"),
-            "name": name if name else existing_asset.get("name"),
-        }
-        response = requests.put(f"http://127.0.0.1:8000/api/Assets/{id}/", json=payload)
-        if response.status_code == 200:
-            return UpdateAsset(asset=response.json())
-        else:
-            raise Exception(f"Failed to update asset: {response.json().get('detail', 'Unknown error')}")
+        existing_asset = get_instance(Asset, id, "Failed to update asset")
+        payload = provided(asset_id=asset_id, name=name)
+        return UpdateAsset(asset=save(AssetSerializer(existing_asset, data=payload, partial=True),
+                                      "Failed to update asset"))
 
 class DeleteAsset(Mutation):
     class Arguments:
@@ -172,11 +212,8 @@ class DeleteAsset(Mutation):
     success = String()
 
     def mutate(root, info, id):
-        response = requests.delete(f"http://127.0.0.1:8000/api/Assets/{id}/")
-        if response.status_code == 204:
-            return DeleteAsset(success="Asset deleted successfully")
-        else:
-            raise Exception(f"Failed to delete asset: {response.json().get('detail', 'Unknown error')}")
+        get_instance(Asset, id, "Failed to delete asset").delete()
+        return DeleteAsset(success="Asset deleted successfully")
 
 # Mutations for Linker
 class CreateLinker(Mutation):
@@ -193,11 +230,7 @@ class CreateLinker(Mutation):
             "attribute_id": attribute_id,
             "kpi": kpi,
         }
-        response = requests.post("http://127.0.0.1:8000/api/Linker/", json=payload)
-        if response.status_code == 201:
-            return CreateLinker(linker=response.json())
-        else:
-            raise Exception(f"Failed to create linker: {response.json().get('detail', 'Unknown error')}")
+        return CreateLinker(linker=save(AttributeSerializer(data=payload), "Failed to create linker"))
 
 class UpdateLinker(Mutation):
     class Arguments:
@@ -209,17 +242,10 @@ class UpdateLinker(Mutation):
     linker = Field(LinkerType)
 
     def mutate(root, info, id, asset=None, attribute_id=None, kpi=None):
-        existing_linker = requests.get(f"http://127.0.0.1:8000/api/Linker/{id}/").json()
-        payload = {
-            "asset": asset if asset else existing_linker.get("asset"),
-            "attribute_id": attribute_id if attribute_id else existing_linker.get("attribute_id"),
-            "kpi": kpi if kpi else existing_linker.get("kpi"),
-        }
-        response = requests.put(f"http://127.0.0.1:8000/api/Linker/{id}/", json=payload)
-        if response.status_code == 200:
-            return UpdateLinker(linker=response.json())
-        else:
-            raise Exception(f"Failed to update linker: {response.json().get('detail', 'Unknown error')}")
+        existing_linker = get_instance(Attribute, id, "Failed to update linker")
+        payload = provided(asset=asset, attribute_id=attribute_id, kpi=kpi)
+        return UpdateLinker(linker=save(AttributeSerializer(existing_linker, data=payload, partial=True),
+                                        "Failed to update linker"))
 
 class DeleteLinker(Mutation):
     class Arguments:
@@ -228,11 +254,8 @@ class DeleteLinker(Mutation):
     success = String()
 
     def mutate(root, info, id):
-        response = requests.delete(f"http://127.0.0.1:8000/api/Linker/{id}/")
-        if response.status_code == 204:
-            return DeleteLinker(success="Linker deleted successfully")
-        else:
-            raise Exception(f"Failed to delete linker: {response.json().get('detail', 'Unknown error')}")
+        get_instance(Attribute, id, "Failed to delete linker").delete()
+        return DeleteLinker(success="Linker deleted successfully")
         
 
 class ProcessIngester(Mutation):
@@ -253,12 +276,16 @@ class ProcessIngester(Mutation):
             "value": value,
         }
 
-        # Send the request to the Ingester API
-        response = requests.post("http://127.0.0.1:8000/api/Ingester/", json=payload)
-        if response.status_code == 200:
-            return ProcessIngester(result=response.json())
+        # Evaluating in-process, exactly as the Ingester endpoint does
+        try:
+            route = routing_table.resolve(asset_id, attribute_id)
+        except Http404 as e:
+            raise Exception(f"Failed to process Ingester: {e}")
+        data, status = compute_message(route, payload)
+        if status == 200:
+            return ProcessIngester(result=data)
         else:
-            raise Exception(f"Failed to process Ingester: {response.json().get('detail', 'Unknown error')}")
+            raise Exception(f"Failed to process Ingester: {data.get('error', 'Unknown error')}")
 
 
 # Combine all mutations
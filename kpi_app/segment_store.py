@@ -0,0 +1,251 @@
+import os
+import struct
+from contextlib import contextmanager
+import threading
+import uuid
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+
+###############################################################################
+# COLUMNAR SEGMENT STORE                                                      #
+###############################################################################
+
+# Segment layout: header, then the timestamp column, then the value column
+#   magic (8 bytes) | row count (<u8) | min timestamp (<i8) | max timestamp (<i8)
+#   count x timestamp (<M8[us], sorted) | count x value (<f8)
+#   [names of the segments this one supersedes, utf-8, newline separated]
+# A merged segment and the list of inputs it replaces become visible in one
+# rename, so readers skip the inputs from that moment on, whether or not
+# compaction got as far as deleting them.
+SEGMENT_MAGIC = b'KPISEG01'
+HEADER = struct.Struct('<8sQqq')
+TIMESTAMP_DTYPE = np.dtype('<M8[us]')
+VALUE_DTYPE = np.dtype('<f8')
+SEGMENT_SUFFIX = '.seg'
+
+
+class Segment:
+    """One immutable segment file; its columns are read-only ``np.memmap`` views, never copies."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path, 'rb') as f:
+            magic, self.count, min_timestamp, max_timestamp = HEADER.unpack(f.read(HEADER.size))
+            if magic != SEGMENT_MAGIC:
+                raise ValueError(f"Not a KPI segment: {self.path}")
+            f.seek(self.nbytes)
+            self.supersedes = frozenset(f.read().decode().split())
+        self.min_timestamp = np.datetime64(min_timestamp, 'us')
+        self.max_timestamp = np.datetime64(max_timestamp, 'us')
+        self._timestamps = self._values = None
+
+    def _map(self, dtype, offset):
+        if not self.count:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(self.path, dtype=dtype, mode='r', offset=offset, shape=(self.count,))
+
+    @property
+    def timestamps(self):
+        if self._timestamps is None:
+            self._timestamps = self._map(TIMESTAMP_DTYPE, HEADER.size)
+        return self._timestamps
+
+    @property
+    def values(self):
+        if self._values is None:
+            self._values = self._map(VALUE_DTYPE, HEADER.size + self.count * TIMESTAMP_DTYPE.itemsize)
+        return self._values
+
+    def map(self):
+        """Maps both columns now; a deleted file cannot be opened later, but existing maps stay valid."""
+        return self.timestamps, self.values
+
+    @property
+    def nbytes(self):
+        return HEADER.size + self.count * (TIMESTAMP_DTYPE.itemsize + VALUE_DTYPE.itemsize)
+
+    def overlaps(self, start, end):
+        return (start is None or self.max_timestamp >= start) and (end is None or self.min_timestamp < end)
+
+    def slice(self, start=None, end=None):
+        """Returns ``(timestamps, values)`` views for ``start <= timestamp < end``."""
+        timestamps = self.timestamps
+        lo = 0 if start is None else int(np.searchsorted(timestamps, start, side='left'))
+        hi = self.count if end is None else int(np.searchsorted(timestamps, end, side='left'))
+        return timestamps[lo:hi], self.values[lo:hi]
+
+
+def write_segment(path, timestamps, values, supersedes=()):
+    """Writes sorted columns to ``path`` atomically (temp file + rename), listing the segments it supersedes."""
+    timestamps = np.ascontiguousarray(timestamps, dtype=TIMESTAMP_DTYPE)
+    values = np.ascontiguousarray(values, dtype=VALUE_DTYPE)
+    order = np.argsort(timestamps, kind='stable')
+    timestamps, values = timestamps[order], values[order]
+    header = HEADER.pack(SEGMENT_MAGIC, len(timestamps),
+                         int(timestamps[0].astype('<i8')) if len(timestamps) else 0,
+                         int(timestamps[-1].astype('<i8')) if len(timestamps) else 0)
+    temp_path = path.with_name(f".{path.name}.tmp")
+    with open(temp_path, 'wb') as f:
+        f.write(header)
+        f.write(timestamps.tobytes())
+        f.write(values.tobytes())
+        f.write('\n'.join(sorted(supersedes)).encode())
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+    return Segment(path)
+
+
+class SegmentStore:
+    """Append-only store of numeric KPI outputs, one directory of segments per (asset, attribute).
+
+    Every ``append`` writes a new immutable segment, so writers never touch a
+    file a reader has mapped. ``compact`` merges an attribute's small segments
+    into one; a range scan over a compacted attribute is a single contiguous
+    slice of one file. Compactions of a series are serialized across
+    processes by a lock file in its directory.
+    """
+
+    def __init__(self, root, compact_below=1 << 20):
+        self.root = Path(root)
+        # Segments smaller than this many bytes are merged by compact()
+        self.compact_below = compact_below
+        self._lock = threading.Lock()
+
+    def series_path(self, asset_pk, attribute_pk):
+        return self.root / str(asset_pk) / str(attribute_pk)
+
+    def _read_headers(self, path):
+        """Every segment file in ``path``, superseded ones included, with only its header read."""
+        while True:
+            try:
+                return [Segment(p) for p in sorted(path.glob(f'*{SEGMENT_SUFFIX}'))]
+            except FileNotFoundError:
+                # Compaction deleted an input after it was listed; the listing now has its merged segment
+                continue
+
+    def _read_segments(self, path, start=None, end=None):
+        """The current segments in ``path`` that overlap ``start <= timestamp < end``, with their columns mapped.
+
+        Superseded and out-of-range segments are dropped on their headers, so
+        only the files a scan actually reads are mapped.
+        """
+        while True:
+            segments = self._read_headers(path)
+            superseded = set().union(*(segment.supersedes for segment in segments))
+            segments = [segment for segment in segments
+                        if segment.path.name not in superseded and segment.overlaps(start, end)]
+            try:
+                for segment in segments:
+                    segment.map()
+                return segments
+            except FileNotFoundError:
+                continue
+
+    def segments(self, asset_pk, attribute_pk, start=None, end=None):
+        path = self.series_path(asset_pk, attribute_pk)
+        if not path.is_dir():
+            return []
+        return sorted(self._read_segments(path, start, end), key=lambda segment: segment.min_timestamp)
+
+    def series(self):
+        """Yields every ``(asset_pk, attribute_pk)`` with at least one segment."""
+        if not self.root.is_dir():
+            return
+        for asset_dir in sorted(self.root.iterdir()):
+            for attribute_dir in sorted(asset_dir.iterdir()) if asset_dir.is_dir() else ():
+                if any(attribute_dir.glob(f'*{SEGMENT_SUFFIX}')):
+                    yield asset_dir.name, attribute_dir.name
+
+    def append(self, asset_pk, attribute_pk, timestamps, values, supersedes=()):
+        """Writes one new segment for the series; returns it (None if there was nothing to write)."""
+        if not len(timestamps):
+            return None
+        path = self.series_path(asset_pk, attribute_pk)
+        path.mkdir(parents=True, exist_ok=True)
+        return write_segment(path / f"{uuid.uuid4().hex}{SEGMENT_SUFFIX}", timestamps, values, supersedes)
+
+    def scan(self, asset_pk, attribute_pk, start=None, end=None):
+        """Returns ``(timestamps, values)`` for ``start <= timestamp < end``, sorted by timestamp.
+
+        When a single segment covers the range the arrays are memmap views of
+        its bytes; several segments are concatenated.
+        """
+        start = None if start is None else np.datetime64(start, 'us')
+        end = None if end is None else np.datetime64(end, 'us')
+        parts = [segment.slice(start, end) for segment in self.segments(asset_pk, attribute_pk, start, end)]
+        parts = [part for part in parts if len(part[0])]
+        if not parts:
+            return np.empty(0, dtype=TIMESTAMP_DTYPE), np.empty(0, dtype=VALUE_DTYPE)
+        if len(parts) == 1:
+            return parts[0]
+        timestamps = np.concatenate([part[0] for part in parts])
+        values = np.concatenate([part[1] for part in parts])
+        order = np.argsort(timestamps, kind='stable')
+        return timestamps[order], values[order]
+
+    @contextmanager
+    def _compaction_lock(self, path):
+        with self._lock, open(path / '.compact.lock', 'a') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            yield
+
+    def _remove_superseded(self, path):
+        """Deletes superseded segments left by an interrupted compaction.
+
+        A segment is only deleted once everything it supersedes is gone,
+        so a crash part way through never brings an older input back.
+        """
+        segments = self._read_headers(path)
+        superseded = set().union(*(segment.supersedes for segment in segments))
+        pending = [segment for segment in segments if segment.path.name in superseded]
+        while pending:
+            remaining = {segment.path.name for segment in pending}
+            ready = [segment for segment in pending if not segment.supersedes & remaining]
+            if not ready:
+                break
+            for segment in ready:
+                # Open memmaps of the old files stay valid after unlink
+                segment.path.unlink(missing_ok=True)
+            pending = [segment for segment in pending if segment not in ready]
+
+    def compact(self, asset_pk, attribute_pk):
+        """Merges the series' small segments into one; returns how many segments were merged.
+
+        The merged segment lists its inputs and is published before they are
+        deleted, so a concurrent ``scan`` sees either the inputs or the merged
+        segment, never both, and a crash in between leaves nothing counted twice.
+        """
+        path = self.series_path(asset_pk, attribute_pk)
+        if not path.is_dir():
+            return 0
+        with self._compaction_lock(path):
+            self._remove_superseded(path)
+            small = [segment for segment in self.segments(asset_pk, attribute_pk)
+                     if segment.nbytes < self.compact_below]
+            if len(small) < 2:
+                return 0
+            timestamps = np.concatenate([segment.timestamps for segment in small])
+            values = np.concatenate([segment.values for segment in small])
+            self.append(asset_pk, attribute_pk, timestamps, values,
+                        supersedes=[segment.path.name for segment in small])
+            self._remove_superseded(path)
+            return len(small)
+
+    def compact_all(self):
+        return sum(self.compact(asset_pk, attribute_pk) for asset_pk, attribute_pk in list(self.series()))
+
+
+segment_store = SegmentStore(
+    getattr(settings, 'KPI_SEGMENT_STORE_DIR', Path(settings.BASE_DIR) / 'segments'),
+    compact_below=getattr(settings, 'KPI_SEGMENT_COMPACT_BELOW', 1 << 20),
+)
@@ -1,11 +1,29 @@
 from rest_framework import serializers
+from interpreter_app.interpreter_engine import IterativeInterpreterFactory, ParseError, unescape_expression
 from .models import KPI, Asset, Attribute
 
+def _compile_bytecode(expression):
+    try:
+        # The iterative pipeline also compiles generated, deeply nested expressions
+        return IterativeInterpreterFactory().compile_bytecode(unescape_expression(expression)).dumps()
+    except ParseError:
+        # Invalid expressions are still accepted; the Ingester reports them as before
+        return None
+
 class KPISerializer(serializers.ModelSerializer):
     class Meta:
         model = KPI
         fields = ['id', 'name', 'expression', 'description']
 
+    def create(self, validated_data):
+        validated_data['bytecode'] = _compile_bytecode(validated_data['expression'])
+        return super().create(validated_data)
+
+    def update(self, instance, validated_data):
+        if 'expression' in validated_data:
+            validated_data['bytecode'] = _compile_bytecode(validated_data['expression'])
+        return super().update(instance, validated_data)
+
 class AttributeSerializer(serializers.ModelSerializer):
     class Meta:
         model = Attribute
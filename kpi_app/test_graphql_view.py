@@ -0,0 +1,101 @@
+import json
+from unittest import mock
+from django.test import TestCase
+from graphql import parse
+from kpi_app.graphql_view import DocumentCache, PersistedQueries, document_cache, persisted_queries, query_hash
+from kpi_app.models import KPI
+from kpi_project.schema import schema
+
+
+class DocumentCacheTests(TestCase):
+    def test_repeated_query_is_parsed_and_validated_once(self):
+        cache = DocumentCache(maxsize=2)
+        with mock.patch("kpi_app.graphql_view.parse", wraps=parse) as parse_spy:
+            first = cache.get(schema.graphql_schema, "{ allKpis { pageInfo { hasNextPage } } }")
+            second = cache.get(schema.graphql_schema, "{ allKpis { pageInfo { hasNextPage } } }")
+        self.assertIs(first, second)
+        self.assertEqual(parse_spy.call_count, 1)
+        self.assertEqual(cache.stats(), {"size": 1, "maxsize": 2, "hits": 1, "misses": 1})
+
+    def test_least_recently_used_is_evicted(self):
+        cache = DocumentCache(maxsize=2)
+        kpis, assets, linkers = ("{ %s { pageInfo { hasNextPage } } }" % field
+                                 for field in ("allKpis", "allAssets", "allLinkers"))
+        for query in (kpis, assets, kpis, linkers):
+            cache.get(schema.graphql_schema, query)
+        self.assertEqual(len(cache), 2)
+        cache.get(schema.graphql_schema, kpis)
+        self.assertEqual(cache.hits, 2)
+
+    def test_validation_errors_are_cached_and_syntax_errors_raise(self):
+        cache = DocumentCache()
+        _, errors = cache.get(schema.graphql_schema, "{ noSuchField }")
+        self.assertEqual(len(errors), 1)
+        with self.assertRaises(Exception):
+            cache.get(schema.graphql_schema, "{ allKpis {")
+        self.assertEqual(len(cache), 1)
+
+
+class PersistedQueriesTests(TestCase):
+    def test_automatic_registrations_are_bounded(self):
+        queries = PersistedQueries(["{ allKpis { pageInfo { hasNextPage } } }"], maxsize=2)
+        shas = [queries.register_automatic("{ allAssets { edges { cursor } } }" + " " * i) for i in range(3)]
+        self.assertEqual(len(queries), 3)
+        self.assertNotIn(shas[0], queries)
+        self.assertIsNotNone(queries.get(shas[2]))
+        # Queries registered up front are never evicted
+        self.assertIn(query_hash("{ allKpis { pageInfo { hasNextPage } } }"), queries)
+
+
+class CachedGraphQLViewTests(TestCase):
+    query = "{ allKpis { edges { node { name } } } }"
+
+    def setUp(self):
+        document_cache.clear()
+        persisted_queries.clear()
+        KPI.objects.create(name="Test KPI", expression="ATTR * 2")
+
+    def post(self, body):
+        return self.client.post("/graphql/", body, content_type="application/json")
+
+    def persisted(self, sha):
+        return {"persistedQuery": {"version": 1, "sha256Hash": sha}}
+
+    def test_repeated_requests_hit_the_cache(self):
+        for _ in range(3):
+            response = self.post({"query": self.query})
+            self.assertEqual(response.json()["data"], {"allKpis": {"edges": [{"node": {"name": "Test KPI"}}]}})
+        self.assertEqual((document_cache.misses, document_cache.hits), (1, 2))
+
+    def test_registered_query_is_sent_by_hash_only(self):
+        sha = persisted_queries.register(self.query)
+        response = self.post({"extensions": self.persisted(sha)})
+        self.assertEqual(response.json()["data"], {"allKpis": {"edges": [{"node": {"name": "Test KPI"}}]}})
+
+        response = self.client.get("/graphql/", {"extensions": json.dumps(self.persisted(sha))},
+                                   HTTP_ACCEPT="application/json")
+        self.assertEqual(response.json()["data"]["allKpis"], {"edges": [{"node": {"name": "Test KPI"}}]})
+
+    def test_unknown_hash_then_automatic_registration(self):
+        sha = query_hash(self.query)
+        response = self.post({"extensions": self.persisted(sha)})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["errors"][0]["message"], "PersistedQueryNotFound")
+
+        response = self.post({"query": self.query, "extensions": self.persisted(sha)})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(sha, persisted_queries)
+        self.assertEqual(self.post({"extensions": self.persisted(sha)}).status_code, 200)
+
+    def test_mismatched_hash_is_rejected(self):
+        response = self.post({"query": self.query, "extensions": self.persisted("0" * 64)})
+        self.assertEqual(response.status_code, 400)
+        self.assertNotIn("0" * 64, persisted_queries)
+
+    def test_only_valid_queries_are_registered(self):
+        for query in ["{ noSuchField }", "{ allKpis {"]:
+            with self.subTest(query=query):
+                sha = query_hash(query)
+                response = self.post({"query": query, "extensions": self.persisted(sha)})
+                self.assertEqual(response.status_code, 400)
+                self.assertNotIn(sha, persisted_queries)
@@ -0,0 +1,80 @@
+from datetime import datetime, timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+from django.test import TestCase
+from django.urls import reverse
+from kpi_app.history import attribute_history, parse_range
+from kpi_app.models import KPI, Asset, Attribute, KPIRollup
+from kpi_app.outputs import OutputBuffer
+from kpi_project.schema import schema
+
+
+def make_fixtures(test):
+    test.kpi = KPI.objects.create(name="Test KPI", expression="ATTR * 2")
+    test.asset = Asset.objects.create(asset_id="43", name="Test Asset")
+    test.attribute = Attribute.objects.create(asset=test.asset, attribute_id="6", kpi=test.kpi)
+
+
+def record(test, outputs):
+    buffer = OutputBuffer(max_size=1000, max_age=60)
+    for timestamp, value in outputs:
+        buffer.add(test.asset.pk, test.attribute.pk, timestamp, value)
+    buffer.flush()
+
+
+class RollupTests(TestCase):
+    def setUp(self):
+        make_fixtures(self)
+
+    def test_rollups_are_updated_incrementally_across_flushes(self):
+        record(self, [("2022-07-31T23:28:10Z[UTC]", 1.0), ("2022-07-31T23:28:20Z[UTC]", 5.0)])
+        record(self, [("2022-07-31T23:28:30Z[UTC]", 3.0), ("2022-07-31T23:29:00Z[UTC]", 10.0), ("x", "dog")])
+
+        minute = KPIRollup.objects.get(resolution="1m", bucket=datetime(2022, 7, 31, 23, 28, tzinfo=timezone.utc))
+        self.assertEqual((minute.count, minute.sum, minute.min, minute.max), (3, 9.0, 1.0, 5.0))
+        hour = KPIRollup.objects.get(resolution="1h")
+        self.assertEqual((hour.count, hour.sum, hour.min, hour.max), (4, 19.0, 1.0, 10.0))
+        self.assertEqual(KPIRollup.objects.filter(resolution="1d").get().count, 4)
+
+    def test_rollup_history_matches_raw_outputs(self):
+        record(self, [("2022-07-31T23:28:10Z[UTC]", 1.0), ("2022-07-31T23:28:20Z[UTC]", 5.0),
+                      ("2022-07-31T23:29:00Z[UTC]", 10.0)])
+        self.assertEqual(attribute_history(self.attribute, "1m"), [
+            {"timestamp": datetime(2022, 7, 31, 23, 28, tzinfo=timezone.utc),
+             "min": 1.0, "max": 5.0, "avg": 3.0, "count": 2},
+            {"timestamp": datetime(2022, 7, 31, 23, 29, tzinfo=timezone.utc),
+             "min": 10.0, "max": 10.0, "avg": 10.0, "count": 1},
+        ])
+        raw = attribute_history(self.attribute, "raw", *parse_range("2022-07-31T23:28:15Z", None))
+        self.assertEqual([(point["timestamp"].second, point["avg"]) for point in raw], [(20, 5.0), (0, 10.0)])
+
+    def test_invalid_resolution_raises(self):
+        with self.assertRaises(ValueError):
+            attribute_history(self.attribute, "5m")
+
+
+class HistoryEndpointTests(APITestCase):
+    def setUp(self):
+        make_fixtures(self)
+        record(self, [("2022-07-31T23:28:10Z[UTC]", 1.0), ("2022-07-31T23:28:20Z[UTC]", 5.0),
+                      ("2022-08-01T01:00:00Z[UTC]", 7.0)])
+
+    def test_rest_history(self):
+        url = reverse("attribute-history", args=[self.attribute.pk])
+        response = self.client.get(url, {"resolution": "1h", "end": "2022-08-01T00:00:00Z"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 1)
+        self.assertEqual((response.data[0]["avg"], response.data[0]["count"]), (3.0, 2))
+
+    def test_rest_history_rejects_invalid_resolution(self):
+        url = reverse("attribute-history", args=[self.attribute.pk])
+        response = self.client.get(url, {"resolution": "1w"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("error", response.data)
+
+    def test_graphql_history(self):
+        result = schema.execute(
+            'query { attributeHistory(id: %d, resolution: "1d") { timestamp min max avg count } }' % self.attribute.pk)
+        self.assertIsNone(result.errors)
+        self.assertEqual([(point["min"], point["max"], point["count"]) for point in result.data["attributeHistory"]],
+                         [(1.0, 5.0, 2), (7.0, 7.0, 1)])
@@ -0,0 +1,91 @@
+from datetime import datetime, timezone
+from unittest import mock
+from django.db import DatabaseError, connection
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from kpi_app.models import KPI, Asset, Attribute, KPIOutput, KPIRollup
+from kpi_app.outputs import OutputBuffer
+from kpi_app.timestamps import parse_timestamp
+
+
+class ParseTimestampTests(TestCase):
+    def test_ingester_format(self):
+        self.assertEqual(parse_timestamp("2022-07-31T23:28:47Z[UTC]"),
+                         datetime(2022, 7, 31, 23, 28, 47, tzinfo=timezone.utc))
+
+    def test_zone_name_applies_to_local_times(self):
+        parsed = parse_timestamp("2022-07-31T23:28:47[Europe/Berlin]")
+        self.assertEqual(parsed.astimezone(timezone.utc), datetime(2022, 7, 31, 21, 28, 47, tzinfo=timezone.utc))
+
+    def test_invalid_timestamp_raises(self):
+        with self.assertRaises(ValueError):
+            parse_timestamp("yesterday")
+
+
+class OutputBufferTests(TestCase):
+    def setUp(self):
+        self.kpi = KPI.objects.create(name="Test KPI", expression="ATTR * 2")
+        self.asset = Asset.objects.create(asset_id="43", name="Test Asset")
+        self.attribute = Attribute.objects.create(asset=self.asset, attribute_id="6", kpi=self.kpi)
+
+    def add(self, buffer, value, timestamp="2022-07-31T23:28:47Z[UTC]"):
+        buffer.add(self.asset.pk, self.attribute.pk, timestamp, value)
+
+    def test_flushes_in_one_insert_when_full(self):
+        buffer = OutputBuffer(max_size=3, max_age=60)
+        self.add(buffer, 1.5)
+        self.add(buffer, True)
+        self.assertEqual(KPIOutput.objects.count(), 0)
+        with CaptureQueriesContext(connection) as queries:
+            self.add(buffer, "dogdog")
+        inserts = [query for query in queries if query["sql"].startswith('INSERT INTO "kpi_app_kpioutput"')]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(len(buffer), 0)
+        self.assertEqual(list(KPIOutput.objects.order_by("pk").values_list("value", "text_value")),
+                         [(1.5, None), (1.0, None), (None, "dogdog")])
+
+    def test_flushes_when_oldest_output_is_too_old(self):
+        buffer = OutputBuffer(max_size=100, max_age=0)
+        self.add(buffer, 2.0, timestamp="not a timestamp")
+        output = KPIOutput.objects.get()
+        self.assertEqual((output.asset, output.attribute, output.value), (self.asset, self.attribute, 2.0))
+
+    def test_explicit_flush_writes_everything(self):
+        buffer = OutputBuffer(max_size=100, max_age=60)
+        for value in range(10):
+            self.add(buffer, value)
+        self.assertEqual(buffer.flush(), 10)
+        self.assertEqual(KPIOutput.objects.filter(timestamp=parse_timestamp("2022-07-31T23:28:47Z[UTC]")).count(), 10)
+
+    def test_disabled_buffer_stores_nothing(self):
+        buffer = OutputBuffer(max_size=1, max_age=0, enabled=False)
+        self.add(buffer, 2.0)
+        self.assertEqual((len(buffer), buffer.flush()), (0, 0))
+        self.assertEqual(KPIOutput.objects.count(), 0)
+
+
+class OutputBufferFailureTests(TransactionTestCase):
+    def setUp(self):
+        kpi = KPI.objects.create(name="Test KPI", expression="ATTR * 2")
+        self.asset = Asset.objects.create(asset_id="43", name="Test Asset")
+        self.kept = Attribute.objects.create(asset=self.asset, attribute_id="6", kpi=kpi)
+        self.deleted = Attribute.objects.create(asset=self.asset, attribute_id="7", kpi=kpi)
+        self.buffer = OutputBuffer(max_size=100, max_age=60)
+        for attribute in (self.kept, self.deleted, self.kept, self.deleted):
+            self.buffer.add(self.asset.pk, attribute.pk, "2022-07-31T23:28:47Z[UTC]", 2.0)
+
+    def test_outputs_of_a_deleted_linker_are_dropped_and_the_rest_written(self):
+        self.deleted.delete()
+        with self.assertLogs("kpi_app.outputs", "ERROR"):
+            self.assertEqual(self.buffer.flush(), 2)
+        self.assertEqual(list(KPIOutput.objects.values_list("attribute_id", flat=True)), [self.kept.pk] * 2)
+        self.assertEqual(set(KPIRollup.objects.values_list("attribute_id", "count")), {(self.kept.pk, 2)})
+        self.assertEqual(len(self.buffer), 0)
+
+    def test_failed_retry_keeps_outputs_for_the_next_flush(self):
+        with mock.patch.object(self.buffer, "write_rows", side_effect=DatabaseError("database is locked")):
+            with self.assertLogs("kpi_app.outputs", "ERROR"):
+                self.assertEqual(self.buffer.flush(), 0)
+        self.assertEqual(len(self.buffer), 4)
+        self.assertEqual(self.buffer.flush(), 4)
+        self.assertEqual(KPIOutput.objects.count(), 4)
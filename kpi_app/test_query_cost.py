@@ -0,0 +1,99 @@
+import time
+from unittest import mock
+from django.test import TestCase
+from graphql import parse
+from kpi_app.graphql_view import CachedGraphQLView, document_cache
+from kpi_app.models import KPI, Asset, Attribute
+from kpi_app.query_cost import QueryCostAnalyzer
+from kpi_project.schema import schema
+
+
+def analyze(query, analyzer=None, **kwargs):
+    analyzer = analyzer or QueryCostAnalyzer(list_size=10)
+    return analyzer.analyze(schema.graphql_schema, parse(query), **kwargs)
+
+
+class QueryCostAnalyzerTests(TestCase):
+    def test_depth_and_cost(self):
+        cost = analyze("""{
+            allKpis { edges { node { name } } }
+            allLinkers(first: 5) { pageInfo { hasNextPage } edges { node { asset { name } kpi { name } } } }
+        }""")
+        # Connection, pageInfo and edges once, then node, asset and kpi once per item of the page
+        self.assertEqual((cost.depth, cost.cost), (5, (1 + 1 + 10) + (1 + 1 + 1 + 5 * 3)))
+        self.assertEqual(cost.errors, [])
+
+    def test_page_size_from_variables(self):
+        query = "query ($n: Int) { allKpis(first: $n) { edges { node { name } } } }"
+        self.assertEqual(analyze(query, variables={"n": 3}).cost, 1 + 1 + 3)
+        self.assertEqual(analyze(query).cost, 1 + 1 + 10)
+
+    def test_cyclic_query_grows_exponentially(self):
+        shallow = analyze("{ allAssets { edges { node { attributes { asset { name } } } } } }")
+        deep = analyze("{ allAssets { edges { node { attributes { asset { attributes { asset { name } } } } } } } }")
+        self.assertEqual((shallow.depth, deep.depth), (6, 8))
+        self.assertEqual(shallow.cost, 1 + 1 + 10 + 10 + 100)
+        self.assertEqual(deep.cost, shallow.cost + 100 + 1000)
+
+    def test_fragments_weights_and_introspection(self):
+        query = """
+            query { __schema { types { name } } allLinkers(first: 5) { edges { node { ...Linker } } } }
+            fragment Linker on LinkerType { asset { name } ... on LinkerType { kpi { name } } }
+        """
+        self.assertEqual(analyze(query).cost, 1 + 1 + 5 + 5 + 5)
+        weighted = QueryCostAnalyzer(list_size=10, field_weights={"LinkerType.kpi": 5})
+        self.assertEqual(analyze(query, weighted).cost, 1 + 1 + 5 + 5 + 25)
+
+    def test_repeated_fragment_spreads_are_walked_once(self):
+        # Each fragment spreads the next twice: 2**30 walks without deduplication and memoization
+        fragments = [f"fragment F{i} on LinkerType {{ asset {{ name }} ...F{i + 1} ...F{i + 1} }}" for i in range(30)]
+        fragments.append("fragment F30 on LinkerType { kpi { name } }")
+        query = "{ allLinkers(first: 5) { edges { node { ...F0 } } } }\n" + "\n".join(fragments)
+        document = parse(query)
+        with self.assertNumQueries(0):
+            start = time.perf_counter()
+            cost = QueryCostAnalyzer(list_size=10).analyze(schema.graphql_schema, document)
+        self.assertLess(time.perf_counter() - start, 0.5)
+        self.assertEqual(cost.cost, 1 + 1 + 5 + 5 * 31)
+
+        # A fragment reached through different fields is counted for each, as execution would resolve it
+        query = """{ allLinkers(first: 5) { edges { node { ...Pair } } } }
+            fragment Pair on LinkerType { asset { attributes { ...Leaf } } kpi { name } }
+            fragment Leaf on LinkerType { kpi { name } }"""
+        self.assertEqual(analyze(query).cost, 1 + 1 + 5 + 5 + 5 + 50 + 5)
+
+    def test_limits(self):
+        analyzer = QueryCostAnalyzer(max_depth=3, max_cost=100, list_size=10)
+        cost = analyze("{ allAssets { edges { node { attributes { asset { attributes { id } } } } } } }", analyzer)
+        self.assertEqual([error.message for error in cost.errors], [
+            "Query depth 7 exceeds the maximum depth of 3",
+            "Query cost 222 exceeds the maximum cost of 100",
+        ])
+
+
+class QueryCostViewTests(TestCase):
+    def setUp(self):
+        document_cache.clear()
+        asset = Asset.objects.create(asset_id="43", name="Test Asset")
+        Attribute.objects.create(asset=asset, attribute_id="6", kpi=KPI.objects.create(name="KPI", expression="ATTR"))
+
+    def post(self, query):
+        return self.client.post("/graphql/", {"query": query}, content_type="application/json")
+
+    def test_cost_is_reported_in_extensions(self):
+        response = self.post("{ allLinkers(first: 20) { edges { node { asset { name } } } } }")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["data"], {"allLinkers": {"edges": [{"node": {"asset": {"name": "Test Asset"}}}]}})
+        self.assertEqual(response.json()["extensions"]["cost"]["depth"], 5)
+        self.assertEqual(response.json()["extensions"]["cost"]["cost"], 1 + 1 + 20 + 20)
+
+    def test_expensive_query_is_rejected_before_execution(self):
+        analyzer = QueryCostAnalyzer(max_depth=4, max_cost=1000)
+        with mock.patch.object(CachedGraphQLView, "query_cost", analyzer), \
+                mock.patch("kpi_app.graphql_view.execute") as execute:
+            response = self.post("{ allAssets { edges { node { attributes { asset { attributes { id } } } } } } }")
+        execute.assert_not_called()
+        self.assertEqual(response.status_code, 400)
+        self.assertNotIn("data", response.json())
+        self.assertEqual(len(response.json()["errors"]), 2)
+        self.assertEqual(response.json()["extensions"]["cost"]["maxCost"], 1000)
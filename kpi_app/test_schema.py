@@ -0,0 +1,153 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from interpreter_app.routing import routing_table
+from kpi_app.loaders import Loaders
+from kpi_app.models import KPI, Asset, Attribute
+from kpi_app.outputs import output_buffer
+from kpi_project.schema import schema
+
+
+def nodes(connection):
+    return [edge["node"] for edge in connection["edges"]]
+
+
+class SchemaTests(TestCase):
+    def setUp(self):
+        routing_table.clear()
+        output_buffer.clear()
+        self.kpi = KPI.objects.create(name="Test KPI", expression="ATTR * 2", description="Sample KPI")
+        self.asset = Asset.objects.create(asset_id="43", name="Test Asset")
+        self.attribute = Attribute.objects.create(asset=self.asset, attribute_id="6", kpi=self.kpi)
+
+    def execute(self, query):
+        result = schema.execute(query)
+        self.assertIsNone(result.errors)
+        return result.data
+
+    def test_queries_read_the_models(self):
+        data = self.execute("""query {
+            allKpis { edges { node { id name expression description } } }
+            allAssets { edges { node { id assetId name attributes { id attributeId kpi { name } } } } }
+            allLinkers { edges { node { id attributeId asset { assetId } kpi { expression } } } }
+        }""")
+        self.assertEqual(nodes(data["allKpis"]), [{"id": self.kpi.pk, "name": "Test KPI", "expression": "ATTR * 2",
+                                                   "description": "Sample KPI"}])
+        self.assertEqual(nodes(data["allAssets"])[0]["attributes"],
+                         [{"id": self.attribute.pk, "attributeId": "6", "kpi": {"name": "Test KPI"}}])
+        self.assertEqual(nodes(data["allLinkers"]), [{"id": self.attribute.pk, "attributeId": "6",
+                                                      "asset": {"assetId": "43"}, "kpi": {"expression": "ATTR * 2"}}])
+
+    def test_connections_page_by_cursor(self):
+        for i in range(4):
+            KPI.objects.create(name=f"KPI {i}", expression="ATTR")
+        query = """query ($after: String) {
+            allKpis(first: 2, after: $after) { pageInfo { hasNextPage hasPreviousPage endCursor } edges { node { name } } }
+        }"""
+        page = schema.execute(query).data["allKpis"]
+        self.assertEqual([node["name"] for node in nodes(page)], ["Test KPI", "KPI 0"])
+        self.assertFalse(page["pageInfo"]["hasPreviousPage"])
+
+        names = []
+        with CaptureQueriesContext(connection) as queries:
+            while page["pageInfo"]["hasNextPage"]:
+                page = schema.execute(query, variable_values={"after": page["pageInfo"]["endCursor"]}).data["allKpis"]
+                names += [node["name"] for node in nodes(page)]
+        self.assertEqual(names, ["KPI 1", "KPI 2", "KPI 3"])
+        self.assertTrue(page["pageInfo"]["hasPreviousPage"])
+        self.assertFalse(any("OFFSET" in query["sql"] for query in queries))
+
+    def test_invalid_cursor_and_page_size(self):
+        result = schema.execute('{ allKpis(after: "nonsense") { edges { cursor } } }')
+        self.assertEqual(result.errors[0].message, "Invalid cursor: nonsense")
+        result = schema.execute("{ allKpis(first: 100000) { edges { cursor } } }")
+        self.assertEqual(result.errors[0].message, "first must be between 0 and 1000")
+
+    def test_kpi_mutations(self):
+        data = self.execute('mutation { createKpi(name: "New", expression: "ATTR + 1", description: "d") '
+                            '{ kpi { id name } } }')
+        kpi = KPI.objects.get(pk=data["createKpi"]["kpi"]["id"])
+        self.assertIsNotNone(kpi.bytecode)
+
+        self.execute('mutation { updateKpi(id: %d, expression: "ATTR + 2") { kpi { name expression } } }' % kpi.pk)
+        kpi.refresh_from_db()
+        self.assertEqual((kpi.name, kpi.expression), ("New", "ATTR + 2"))
+
+        data = self.execute("mutation { deleteKpi(id: %d) { success } }" % kpi.pk)
+        self.assertEqual(data["deleteKpi"]["success"], "KPI deleted successfully")
+        self.assertFalse(KPI.objects.filter(pk=kpi.pk).exists())
+
+    def test_linker_mutations_validate_like_rest(self):
+        data = self.execute('mutation { createLinker(asset: %d, attributeId: "7", kpi: %d) '
+                            '{ linker { attributeId asset { name } } } }' % (self.asset.pk, self.kpi.pk))
+        self.assertEqual(data["createLinker"]["linker"], {"attributeId": "7", "asset": {"name": "Test Asset"}})
+
+        result = schema.execute('mutation { createLinker(asset: 999, attributeId: "8", kpi: %d) '
+                                '{ linker { id } } }' % self.kpi.pk)
+        self.assertTrue(result.errors[0].message.startswith("Failed to create linker"))
+
+        result = schema.execute("mutation { deleteAsset(id: 999) { success } }")
+        self.assertEqual(result.errors[0].message, "Failed to delete asset: No Asset matches the given query.")
+
+    def test_process_ingester_evaluates_in_process(self):
+        data = self.execute('mutation { processIngester(assetId: "43", attributeId: "6", '
+                            'timestamp: "2022-07-31T23:28:47Z[UTC]", value: 21) '
+                            '{ result { assetId attributeId timestamp value } } }')
+        self.assertEqual(data["processIngester"]["result"], {"assetId": "43", "attributeId": "output_6",
+                                                             "timestamp": "2022-07-31T23:28:47Z[UTC]",
+                                                             "value": 42.0})
+        self.assertEqual(len(output_buffer), 1)
+
+        result = schema.execute('mutation { processIngester(assetId: "99", attributeId: "6", '
+                                'timestamp: "t", value: 1) { result { value } } }')
+        self.assertEqual(result.errors[0].message, "Failed to process Ingester: No Asset matches the given query.")
+
+
+class DataLoaderTests(TestCase):
+    query = """query {
+        allLinkers { edges { node {
+            attributeId asset { name attributes { attributeId kpi { name } } } kpi { expression } } } }
+        allAssets { edges { node { assetId attributes { asset { name } kpi { name } } } } }
+    }"""
+
+    def add_linkers(self, count):
+        for i in range(count):
+            asset = Asset.objects.create(asset_id=f"asset-{count}-{i}", name=f"Asset {i}")
+            kpi = KPI.objects.create(name=f"KPI {i}", expression="ATTR * 2")
+            Attribute.objects.create(asset=asset, attribute_id="6", kpi=kpi)
+            # Linkers sharing an asset and a KPI are loaded once
+            Attribute.objects.create(asset=asset, attribute_id="7", kpi=kpi)
+        Attribute.objects.create(asset=asset, attribute_id="8")
+
+    def count_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post("/graphql/", {"query": self.query}, content_type="application/json")
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("errors", response.json())
+        data = response.json()["data"]
+        return len(queries), {field: nodes(connection) for field, connection in data.items()}
+
+    def test_query_count_does_not_grow_with_linkers(self):
+        self.add_linkers(3)
+        few, data = self.count_queries()
+        self.assertEqual(len(data["allLinkers"]), 7)
+        self.assertIsNone(data["allLinkers"][-1]["kpi"])
+        self.assertEqual([linker["attributeId"] for linker in data["allLinkers"][0]["asset"]["attributes"]],
+                         ["6", "7"])
+
+        self.add_linkers(30)
+        many, data = self.count_queries()
+        self.assertEqual(len(data["allLinkers"]), 7 + 61)
+        self.assertEqual(few, many)
+        # Linkers, assets, one batch per loader
+        self.assertLessEqual(many, 5)
+
+    def test_loaders_deduplicate_keys(self):
+        loaders = Loaders()
+        asset = Asset.objects.create(asset_id="1", name="A")
+        with self.assertNumQueries(1):
+            loaders.asset.expect([asset.pk, asset.pk, None])
+            self.assertEqual(loaders.asset.load(asset.pk), asset)
+            self.assertEqual(loaders.asset.load(asset.pk), asset)
+            self.assertIsNone(loaders.asset.load(None))
+        self.assertEqual(loaders.asset.batches, 1)
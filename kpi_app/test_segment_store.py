@@ -0,0 +1,104 @@
+import tempfile
+from unittest import mock
+from datetime import datetime, timezone
+import numpy as np
+from django.test import TestCase
+from kpi_app.models import KPI, Asset, Attribute, KPIOutput
+from kpi_app.outputs import OutputBuffer
+from kpi_app.segment_store import Segment, SegmentStore
+
+
+class SegmentStoreTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.store = SegmentStore(self.directory.name)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def timestamps(self, *seconds):
+        return np.datetime64('2022-07-31T00:00:00', 'us') + np.array(seconds, dtype='timedelta64[s]')
+
+    def test_scan_of_one_segment_maps_the_file_without_copying(self):
+        self.store.append(1, 6, self.timestamps(3, 1, 2), [30.0, 10.0, 20.0])
+        timestamps, values = self.store.scan(1, 6, start=self.timestamps(2)[0])
+        self.assertIsInstance(values, np.memmap)
+        self.assertEqual(values.dtype, np.dtype('<f8'))
+        np.testing.assert_array_equal(timestamps, self.timestamps(2, 3))
+        np.testing.assert_array_equal(values, [20.0, 30.0])
+
+    def test_scan_merges_segments_and_keeps_series_apart(self):
+        self.store.append(1, 6, self.timestamps(5, 6), [5.0, 6.0])
+        self.store.append(1, 6, self.timestamps(1, 7), [1.0, 7.0])
+        self.store.append(1, 7, self.timestamps(2), [99.0])
+        _, values = self.store.scan(1, 6, end=self.timestamps(7)[0])
+        np.testing.assert_array_equal(values, [1.0, 5.0, 6.0])
+        self.assertEqual(sorted(self.store.series()), [("1", "6"), ("1", "7")])
+
+    def test_compaction_merges_small_segments(self):
+        for second in range(5):
+            self.store.append(1, 6, self.timestamps(4 - second), [float(4 - second)])
+        self.assertEqual(self.store.compact_all(), 5)
+        [segment] = self.store.segments(1, 6)
+        np.testing.assert_array_equal(segment.values, [0.0, 1.0, 2.0, 3.0, 4.0])
+        self.assertEqual(self.store.compact(1, 6), 0)
+
+    def test_inputs_of_an_unfinished_compaction_are_never_counted_twice(self):
+        first = self.store.append(1, 6, self.timestamps(1), [1.0])
+        second = self.store.append(1, 6, self.timestamps(2), [2.0])
+        # A compaction that published its merged segment but stopped before deleting the inputs
+        merged = self.store.append(1, 6, self.timestamps(1, 2), [1.0, 2.0],
+                                   supersedes=[first.path.name, second.path.name])
+        _, values = self.store.scan(1, 6)
+        np.testing.assert_array_equal(values, [1.0, 2.0])
+        self.assertEqual([segment.path for segment in self.store.segments(1, 6)], [merged.path])
+
+        # The next compaction finishes the cleanup
+        self.assertEqual(self.store.compact(1, 6), 0)
+        self.assertFalse(first.path.exists() or second.path.exists())
+        _, values = self.store.scan(1, 6)
+        np.testing.assert_array_equal(values, [1.0, 2.0])
+
+    def test_scan_maps_only_current_segments_in_range(self):
+        self.store.append(1, 6, self.timestamps(1, 2), [1.0, 2.0])
+        first = self.store.append(1, 6, self.timestamps(5), [5.0])
+        second = self.store.append(1, 6, self.timestamps(6), [6.0])
+        merged = self.store.append(1, 6, self.timestamps(5, 6), [5.0, 6.0],
+                                   supersedes=[first.path.name, second.path.name])
+        mapped = []
+        original_map = Segment.map
+        with mock.patch.object(Segment, "map", autospec=True,
+                               side_effect=lambda segment: mapped.append(segment.path) or original_map(segment)):
+            _, values = self.store.scan(1, 6, start=self.timestamps(4)[0])
+        np.testing.assert_array_equal(values, [5.0, 6.0])
+        self.assertEqual(mapped, [merged.path])
+
+    def test_scan_during_compaction_sees_each_row_once(self):
+        for second in range(4):
+            self.store.append(1, 6, self.timestamps(second), [float(second)])
+        scans = []
+        # Scan where compaction cleans up: before the merge, and after the rename but before any deletion
+        with mock.patch("kpi_app.segment_store.SegmentStore._remove_superseded",
+                        autospec=True, side_effect=lambda store, path: scans.append(store.scan(1, 6)[1])):
+            self.assertEqual(self.store.compact(1, 6), 4)
+        self.assertEqual(len(scans), 2)
+        for values in scans:
+            np.testing.assert_array_equal(values, [0.0, 1.0, 2.0, 3.0])
+
+
+class OutputBufferSegmentTests(TestCase):
+    def test_numeric_outputs_go_to_segments(self):
+        kpi = KPI.objects.create(name="Test KPI", expression="ATTR * 2")
+        asset = Asset.objects.create(asset_id="43", name="Test Asset")
+        attribute = Attribute.objects.create(asset=asset, attribute_id="6", kpi=kpi)
+        with tempfile.TemporaryDirectory() as directory:
+            store = SegmentStore(directory)
+            buffer = OutputBuffer(max_size=100, segment_store=store)
+            buffer.add(asset.pk, attribute.pk, "2022-07-31T23:28:47Z[UTC]", 4.0)
+            buffer.add(asset.pk, attribute.pk, "2022-07-31T23:28:48Z[UTC]", "text")
+            buffer.flush()
+            timestamps, values = store.scan(asset.pk, attribute.pk)
+            self.assertEqual(timestamps[0].astype(datetime).replace(tzinfo=timezone.utc),
+                             datetime(2022, 7, 31, 23, 28, 47, tzinfo=timezone.utc))
+            np.testing.assert_array_equal(values, [4.0])
+        self.assertEqual(list(KPIOutput.objects.values_list("text_value", flat=True)), ["text"])
@@ -1,6 +1,9 @@
+import importlib
+from unittest import mock
+from django.apps import apps
 from django.test import TestCase
 from kpi_app.models import KPI, Asset, Attribute
-from kpi_app.serializers import KPISerializer, AssetSerializer, AttributeSerializer
+from kpi_app.serializers import KPISerializer, AssetSerializer, AttributeSerializer, _compile_bytecode
 
 class KPIAppSerializerTests(TestCase):
 
@@ -15,6 +18,37 @@ class KPIAppSerializerTests(TestCase):
         self.assertEqual(data["name"], "Test KPI")
         self.assertEqual(data["expression"], "ATTR * 2")
 
+    def test_kpi_serializer_compiles_bytecode(self):
+        serializer = KPISerializer(data={"name": "New KPI", "expression": "ATTR + 1", "description": ""})
+        self.assertTrue(serializer.is_valid())
+        kpi = serializer.save()
+        self.assertIn('"code":[["LOAD","ATTR"],["CONST",1],["PLUS",null]]', kpi.bytecode)
+        self.assertNotIn("bytecode", serializer.data)
+
+        serializer = KPISerializer(kpi, data={"expression": "ATTR + 2"}, partial=True)
+        self.assertTrue(serializer.is_valid())
+        self.assertIn('["CONST",2]', serializer.save().bytecode)
+
+    def test_only_parse_errors_leave_bytecode_empty(self):
+        for expression in ["3 + * 5", "1.2.3", '"abc']:
+            with self.subTest(expression=expression):
+                self.assertIsNone(_compile_bytecode(expression))
+        with mock.patch("kpi_app.serializers.IterativeInterpreterFactory.compile_bytecode",
+                        side_effect=MemoryError):
+            with self.assertRaises(MemoryError):
+                _compile_bytecode("ATTR + 1")
+
+    def test_migration_compiles_like_the_serializer(self):
+        migration = importlib.import_module("kpi_app.migrations.0003_kpi_bytecode")
+        deep = KPI.objects.create(name="Deep", expression="(" * 2000 + "ATTR" + " + 1)" * 2000)
+        invalid = KPI.objects.create(name="Invalid", expression="3 + * 5")
+        migration.compile_existing_kpis(apps, None)
+        deep.refresh_from_db()
+        invalid.refresh_from_db()
+        self.assertEqual(deep.bytecode, _compile_bytecode(deep.expression))
+        self.assertIsNotNone(deep.bytecode)
+        self.assertIsNone(invalid.bytecode)
+
     def test_asset_serializer(self):
         serializer = AssetSerializer(self.asset)
         data = serializer.data
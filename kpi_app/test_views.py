@@ -1,5 +1,7 @@
 from rest_framework import status
 from rest_framework.test import APITestCase
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from kpi_app.models import KPI, Asset, Attribute
 
@@ -14,7 +16,7 @@ class KPIAppViewTests(APITestCase):
         url = reverse("kpi-list")
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
+        self.assertEqual(len(response.data["results"]), 1)
 
     def test_create_kpi(self):
         url = reverse("kpi-list")
@@ -26,7 +28,7 @@ class KPIAppViewTests(APITestCase):
         url = reverse("asset-list")
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
+        self.assertEqual(len(response.data["results"]), 1)
 
     def test_create_asset(self):
         url = reverse("asset-list")
@@ -38,10 +40,28 @@ class KPIAppViewTests(APITestCase):
         url = reverse("attribute-list")
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
+        self.assertEqual(len(response.data["results"]), 1)
 
     def test_create_attribute(self):
         url = reverse("attribute-list")
         data = {"asset": self.asset.id, "attribute_id": "attr2", "kpi": self.kpi.id}
         response = self.client.post(url, data, format="json")
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_list_pages_by_cursor(self):
+        for i in range(4):
+            KPI.objects.create(name=f"KPI {i}", expression="ATTR")
+        url = reverse("kpi-list")
+        response = self.client.get(url, {"page_size": 2})
+        self.assertEqual([kpi["name"] for kpi in response.data["results"]], ["Test KPI", "KPI 0"])
+        self.assertIsNone(response.data["previous"])
+
+        names = []
+        with CaptureQueriesContext(connection) as queries:
+            while response.data["next"]:
+                response = self.client.get(response.data["next"])
+                names += [kpi["name"] for kpi in response.data["results"]]
+        self.assertEqual(names, ["KPI 1", "KPI 2", "KPI 3"])
+        # Later pages seek on the primary key instead of skipping rows
+        self.assertFalse(any("OFFSET" in query["sql"] for query in queries))
+
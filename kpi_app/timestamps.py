@@ -0,0 +1,23 @@
+import re
+from datetime import datetime, timezone as dt_timezone
+from zoneinfo import ZoneInfo
+
+_TIMESTAMP_RE = re.compile(r'(?P<instant>[^\[]+?)\s*(?:\[(?P<zone>[^\]]+)\])?')
+
+
+def parse_timestamp(text):
+    """Parses Ingester timestamps such as ``2022-07-31T23:28:47Z[UTC]`` into an aware datetime.
+
+    The bracketed zone name only applies when the instant has no offset of its own.
+    """
+    match = _TIMESTAMP_RE.fullmatch(str(text).strip())
+    if not match:
+        raise ValueError(f"Invalid timestamp: {text}")
+    instant = datetime.fromisoformat(match.group('instant'))
+    if instant.tzinfo is None:
+        zone = match.group('zone')
+        try:
+            instant = instant.replace(tzinfo=ZoneInfo(zone) if zone else dt_timezone.utc)
+        except (KeyError, ValueError):
+            raise ValueError(f"Invalid time zone: {zone}") from None
+    return instant
@@ -1,5 +1,9 @@
 from rest_framework import viewsets
+from rest_framework.decorators import action
+from rest_framework.response import Response
+from .history import RAW, attribute_history, parse_range
 from .models import KPI, Asset, Attribute
+from .outputs import output_buffer
 from .serializers import KPISerializer, AssetSerializer, AttributeSerializer
 
 class KPIViewSet(viewsets.ModelViewSet):
@@ -13,3 +17,15 @@ class AssetViewSet(viewsets.ModelViewSet):
 class AttributeViewSet(viewsets.ModelViewSet):
     queryset = Attribute.objects.all()
     serializer_class = AttributeSerializer
+
+    @action(detail=True, methods=['get'])
+    def history(self, request, pk=None):
+        """KPI output history: ``?resolution=raw|1m|1h|1d&start=...&end=...`` with min/max/avg/count per bucket."""
+        attribute = self.get_object()
+        try:
+            start, end = parse_range(request.query_params.get('start'), request.query_params.get('end'))
+            points = attribute_history(attribute, request.query_params.get('resolution', RAW), start, end,
+                                       segment_store=output_buffer.segment_store)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=400)
+        return Response(points)
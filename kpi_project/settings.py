@@ -47,13 +47,42 @@ INSTALLED_APPS = [
 REST_FRAMEWORK = {
     # Use Spectacular as the default schema generator
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
-    'URL_FORMAT_OVERRIDE': None
+    'URL_FORMAT_OVERRIDE': None,
+    # Keyset (cursor) pages for every list endpoint
+    'DEFAULT_PAGINATION_CLASS': 'kpi_app.pagination.KeysetPagination',
 }
 
 GRAPHENE = {
     'SCHEMA': 'kpi_project.schema.schema',  # Update with your schema path
 }
 
+# Interpreter engine
+KPI_EXPRESSION_CACHE_SIZE = 1024  # Compiled KPI expressions kept per process (LRU)
+KPI_INTERPRETER_BACKEND = 'closure'  # 'tree', 'closure', 'bytecode' or 'iterative'
+KPI_INTERPRETER_LEXER = 'regex'  # 'char' (Lexer) or 'regex' (RegexLexer)
+KPI_ROUTING_CHECK_INTERVAL = 1.0  # Seconds between checks for routing changes made by other processes (None: never)
+KPI_QUEUE_WORKERS = 4  # Threads started by `manage.py run_queue_workers`
+KPI_QUEUE_BATCH_SIZE = 500  # Queued messages claimed per worker batch
+KPI_QUEUE_CLAIM_TIMEOUT = 300  # Seconds before a claimed but unfinished batch is claimed again
+KPI_PARALLEL_WORKERS = None  # Processes for large batch evaluation (None: one per CPU)
+KPI_PARALLEL_CUTOFF = 5000  # Batches smaller than this are evaluated in-process
+KPI_PARALLEL_TIMEOUT = 60  # Seconds to wait for a worker's shard before evaluating the batch in-process (None: forever)
+KPI_OUTPUT_BUFFER_SIZE = 500  # Computed outputs written per bulk insert
+KPI_OUTPUT_BUFFER_MAX_AGE = 5.0  # Seconds an output may wait in the buffer before a flush
+KPI_RECORD_OUTPUTS = True  # Store computed outputs at all (benchmark_ingester turns this off for its run)
+KPI_OUTPUT_BACKEND = 'orm'  # 'orm' (KPIOutput rows) or 'segments' (numeric outputs in the segment store)
+KPI_SEGMENT_STORE_DIR = BASE_DIR / 'segments'  # Root directory of the columnar segment files
+KPI_SEGMENT_COMPACT_BELOW = 1 << 20  # Segments smaller than this (bytes) are merged by compaction
+KPI_GRAPHQL_DOCUMENT_CACHE_SIZE = 256  # Parsed and validated GraphQL documents kept per process (LRU)
+KPI_GRAPHQL_PERSISTED_QUERIES = None  # JSON file of queries clients may send by sha256 hash only
+KPI_GRAPHQL_PERSISTED_QUERY_CACHE_SIZE = 1024  # Queries clients registered by sending them with their hash (LRU)
+KPI_GRAPHQL_MAX_DEPTH = 10  # Deepest field nesting accepted in a GraphQL document
+KPI_GRAPHQL_MAX_COST = 50000  # Highest estimated number of object resolutions per GraphQL document
+KPI_GRAPHQL_LIST_SIZE = 100  # Assumed length of a list field without a first/last argument
+KPI_GRAPHQL_FIELD_WEIGHTS = {}  # 'Type.field' -> cost of resolving it once (object fields default to 1)
+KPI_PAGE_SIZE = 100  # Default page size of the REST list endpoints and the GraphQL connections
+KPI_MAX_PAGE_SIZE = 1000  # Largest page a client may ask for (page_size / first)
+
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
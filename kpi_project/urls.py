@@ -36,7 +36,7 @@ from rest_framework.routers import DefaultRouter
 from rest_framework.response import Response
 from rest_framework.reverse import reverse
 from rest_framework.decorators import api_view
-from graphene_django.views import GraphQLView
+from kpi_app.graphql_view import CachedGraphQLView
 from .schema import schema
 from django.views.decorators.csrf import csrf_exempt
 
@@ -76,7 +76,7 @@ urlpatterns = [
     path('api/', include(router.urls)),
     path('api/', include('interpreter_app.urls')),
     # path('graphql/', GraphQLView.as_view(graphiql=True, schema=schema)),
-    path('graphql/', csrf_exempt(GraphQLView.as_view(graphiql=True, schema=schema))),
+    path('graphql/', csrf_exempt(CachedGraphQLView.as_view(graphiql=True, schema=schema))),
 ]
 
 